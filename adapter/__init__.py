@@ -4,6 +4,7 @@ Converts auto parts data to Amazon format
 """
 from .csv_parser import AutoPartsParser
 from .amazon_transformer import AmazonTransformer
+from .output_writer import CSVOutputWriter
 
-__all__ = ['AutoPartsParser', 'AmazonTransformer']
+__all__ = ['AutoPartsParser', 'AmazonTransformer', 'CSVOutputWriter']
 
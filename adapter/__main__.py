@@ -0,0 +1,10 @@
+"""
+Entry point of `python -m adapter`; see cli.py
+"""
+import sys
+
+from .cli import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
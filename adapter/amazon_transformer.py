@@ -1,8 +1,60 @@
 """
 Amazon Transformer - Converts auto parts data to Amazon upload format
 """
+import numpy as np
 import pandas as pd
-from typing import Dict, Any
+import pyarrow as pa
+import pyarrow.compute as pc
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from .csv_parser import ARROW_STRING, as_text, map_categories
+from .fitment import FitmentTable
+
+
+# Prefix of the placeholder SKUs given to rows without a part number
+PLACEHOLDER_SKU_PREFIX = 'AUTO-PART-'
+
+# Weight and dimensions, written as 10 rather than 10.0 when whole
+MEASUREMENT_COLUMNS = ('item-weight', 'item-length', 'item-width', 'item-height')
+
+# Amazon condition-type values and the source spellings that map to them
+CONDITION_SPELLINGS = {
+    'New': ['new', 'brand new', 'new old stock', 'nos', ''],
+    'Used': ['used', 'pre-owned'],
+    'UsedLikeNew': ['used - like new', 'like new', 'open box'],
+    'UsedVeryGood': ['used - very good', 'very good'],
+    'UsedGood': ['used - good', 'good'],
+    'UsedAcceptable': ['used - acceptable', 'acceptable'],
+    'Refurbished': ['refurbished', 'refurb', 'renewed'],
+    'Remanufactured': ['remanufactured', 'reman', 'rebuilt'],
+}
+
+
+def _condition_key(values: pd.Series) -> pd.Series:
+    """Compare conditions without case, spaces, hyphens or underscores"""
+    return values.str.lower().str.replace(r'[\s_-]+', '', regex=True)
+
+
+# Lookup table from normalized spelling to Amazon condition-type
+CONDITION_TYPES = {
+    key: condition_type
+    for condition_type, spellings in CONDITION_SPELLINGS.items()
+    for key in _condition_key(pd.Series(spellings + [condition_type]))
+}
+
+
+def whole_numbers(values: pd.Series) -> pd.Series:
+    """
+    Type a float column as nullable Int64 if all its numbers are whole, and
+    as float64 otherwise, so that to_csv() writes 10 rather than 10.0
+    """
+    if not pd.api.types.is_float_dtype(values):
+        return values
+    numbers = values.to_numpy(dtype='float64', na_value=np.nan)
+    present = numbers[~np.isnan(numbers)]
+    if ((np.abs(present) < 2 ** 53) & (present == np.floor(present))).all():
+        return values.astype('Int64')
+    return pd.Series(numbers, index=values.index, name=values.name)
 
 
 class AmazonTransformer:
@@ -53,6 +105,9 @@ class AmazonTransformer:
             'item-height',
             'list-price',
         ]
+        
+        # Vehicles of the fitment rows built by transform_fitment(), shared by all chunks
+        self.fitment = FitmentTable()
     
     def transform(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -60,37 +115,14 @@ class AmazonTransformer:
         
         Args:
             df: Input DataFrame with standardized columns
-            
+        
         Returns:
             DataFrame in Amazon upload format
         """
         amazon_df = pd.DataFrame()
         
-        # Map product-id (SKU)
-        amazon_df['product-id'] = self._get_column_or_default(
-            df, ['part_number', 'sku', 'product_id'], 'AUTO-PART-{index}'
-        )
-        
-        # Generate index-based SKUs if needed
-        if amazon_df['product-id'].str.contains('{index}').any():
-            amazon_df['product-id'] = amazon_df['product-id'].apply(
-                lambda x: x.format(index='{:06d}'.format(amazon_df.index[amazon_df['product-id'] == x][0]))
-            )
-        
-        # Product ID type
-        has_upc = 'upc' in df.columns and df['upc'].notna().any()
-        if has_upc:
-            amazon_df['product-id-type'] = df['upc'].apply(
-                lambda x: 'UPC' if pd.notna(x) and str(x).strip() != '' else 'SKU'
-            )
-            # Use UPC as product-id if available
-            original_product_ids = amazon_df['product-id'].copy()
-            amazon_df['product-id'] = df.apply(
-                lambda row: str(row['upc']).strip() if pd.notna(row.get('upc')) and str(row['upc']).strip() != '' 
-                else original_product_ids[row.name], axis=1
-            )
-        else:
-            amazon_df['product-id-type'] = 'SKU'
+        # Map product-id (SKU or UPC) and product-id-type
+        amazon_df['product-id'], amazon_df['product-id-type'] = self.resolve_product_ids(df)
         
         # Item name (title)
         amazon_df['item-name'] = self._build_title(df)
@@ -128,13 +160,9 @@ class AmazonTransformer:
         # Product tax code (auto parts standard)
         amazon_df['product-tax-code'] = 'A_GEN_TAX'
         
-        # Condition type
-        amazon_df['condition-type'] = self._get_column_or_default(
-            df, ['condition'], 'New'
-        )
-        # Standardize condition values
-        amazon_df['condition-type'] = amazon_df['condition-type'].apply(
-            lambda x: self._standardize_condition(str(x))
+        # Condition type, standardized to Amazon's values
+        amazon_df['condition-type'] = self._standardize_condition(
+            self._get_column_or_default(df, ['condition'], 'New')
         )
         
         # Part number (manufacturer part number)
@@ -155,6 +183,8 @@ class AmazonTransformer:
         amazon_df['item-height'] = self._get_column_or_default(
             df, ['height'], ''
         )
+        for col in MEASUREMENT_COLUMNS:
+            amazon_df[col] = whole_numbers(amazon_df[col])
         
         # Fulfillment channel (default to merchant fulfilled)
         amazon_df['fulfillment-channel'] = 'DEFAULT'
@@ -167,6 +197,66 @@ class AmazonTransformer:
         
         return amazon_df
     
+    def transform_chunks(self, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """
+        Transform parsed chunks one at a time
+        
+        Args:
+            chunks: DataFrames with standardized columns, e.g. from AutoPartsParser.parse_chunks
+        
+        Yields:
+            DataFrames in Amazon upload format
+        """
+        for chunk in chunks:
+            yield self.transform(chunk)
+    
+    def transform_fitment(self, df: pd.DataFrame, batch_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        Expand a chunk into fitment file rows, one per product id and vehicle
+        
+        Year ranges and vehicle lists in the year/make/model columns are
+        expanded by the transformer's FitmentTable.
+        
+        Args:
+            df: Input DataFrame with standardized columns
+            batch_size: Fitment rows per DataFrame (see FitmentTable.expand)
+        
+        Yields:
+            DataFrames with the FITMENT_OUTPUT_COLUMNS
+        """
+        product_ids = self.resolve_product_ids(df)[0].to_numpy(dtype=object)
+        for rows, ids in self.fitment.expand(df, batch_size):
+            yield self.fitment.listing(product_ids[rows], ids)
+    
+    def resolve_product_ids(self, df: pd.DataFrame) -> Tuple[pd.Series, pd.Series]:
+        """
+        Resolve product-id and product-id-type in a single column-wise pass
+        
+        Rows without a part number get an AUTO-PART-{index} placeholder SKU built
+        from the row index. A UPC, when present, takes precedence over the SKU.
+        """
+        product_ids = self._get_column_or_default(df, ['part_number', 'sku', 'product_id'], '')
+        
+        # Generate index-based SKUs where needed
+        missing = product_ids == ''
+        if missing.any():
+            index = df.index
+            if not pd.api.types.is_integer_dtype(index):
+                index = pd.RangeIndex(len(df))
+            numbers = pd.Series(index, index=df.index)[missing].astype(str).str.zfill(6)
+            product_ids = product_ids.where(~missing, PLACEHOLDER_SKU_PREFIX + numbers)
+        
+        # Use UPC as product-id if available
+        if 'upc' in df.columns:
+            upc = as_text(df['upc']).str.strip()
+            has_upc = df['upc'].notna() & (upc != '')
+            product_ids = product_ids.where(~has_upc, upc)
+            id_types = pd.Series(np.where(has_upc, 'UPC', 'SKU'), index=df.index)
+        else:
+            id_types = pd.Series('SKU', index=df.index)
+        
+        return product_ids, id_types
+    
     def _get_column_or_default(self, df: pd.DataFrame, column_names: list, default: Any) -> pd.Series:
         """
         Try to get data from multiple possible column names, return default if none exist
@@ -176,119 +266,161 @@ class AmazonTransformer:
                 series = df[col].copy()
                 # Replace empty/null values with default
                 if isinstance(default, str):
-                    series = series.fillna(default)
-                    # Convert to string and replace empty strings
-                    series = series.astype(str)
-                    series = series.apply(lambda x: default if x.strip() == '' or x == 'nan' else x)
+                    if default == '' and pd.api.types.is_numeric_dtype(series):
+                        # Missing numbers are already written as empty fields
+                        pass
+                    elif isinstance(series.dtype, pd.CategoricalDtype):
+                        # Decided once per category
+                        series = map_categories(series, lambda labels: self._fill_text(labels, default))
+                    else:
+                        series = self._fill_text(series, default)
                 elif isinstance(default, (int, float)):
                     series = pd.to_numeric(series, errors='coerce').fillna(default)
                 return series
         
         # No matching column found, return series of defaults
-        return pd.Series([default] * len(df), index=df.index)
+        return pd.Series(default, index=df.index)
+    
+    @staticmethod
+    def _fill_text(series: pd.Series, default: str) -> pd.Series:
+        """
+        Convert to strings, replacing null and blank values with default
+        """
+        missing = series.isna().to_numpy()
+        text = as_text(series)
+        if not pd.api.types.is_numeric_dtype(series):
+            missing |= AmazonTransformer._is_blank(text)
+        return text.mask(missing, default)
+    
+    @staticmethod
+    def _is_blank(text: pd.Series) -> np.ndarray:
+        """
+        Mask of values that are empty once stripped, or the text 'nan'
+        """
+        values = pa.array(text, type=pa.string(), from_pandas=True)
+        blank = pc.or_(pc.equal(pc.utf8_trim_whitespace(values), ''), pc.equal(values, 'nan'))
+        return pc.fill_null(blank, True).to_numpy(zero_copy_only=False)
     
     def _build_title(self, df: pd.DataFrame) -> pd.Series:
         """
         Build product title from available fields
         Format: Brand + Part Number + Description
         """
-        titles = []
-        
-        for idx, row in df.iterrows():
-            parts = []
-            
-            # Add brand if available
-            if 'brand' in df.columns and pd.notna(row.get('brand')) and str(row['brand']).strip():
-                parts.append(str(row['brand']).strip())
-            
-            # Add part number if available
-            if 'part_number' in df.columns and pd.notna(row.get('part_number')) and str(row['part_number']).strip():
-                parts.append(str(row['part_number']).strip())
-            
-            # Add title/description
-            if 'title' in df.columns and pd.notna(row.get('title')) and str(row['title']).strip():
-                parts.append(str(row['title']).strip())
-            
-            # If no title components, use generic
-            if not parts:
-                parts.append('Auto Part')
-            
-            title = ' - '.join(parts)
-            
-            # Limit to Amazon's title length (200 characters)
-            if len(title) > 200:
-                title = title[:197] + '...'
-            
-            titles.append(title)
-        
-        return pd.Series(titles, index=df.index)
+        parts = [
+            self._text_part(df, col, strip=True, require_text=True)
+            for col in ('brand', 'part_number', 'title')
+            if col in df.columns
+        ]
+        
+        title = self._join_parts(parts, ' - ', df.index)
+        
+        # If no title components, use generic
+        title = title.mask(title == '', 'Auto Part')
+        
+        # Limit to Amazon's title length (200 characters)
+        return self._truncate(title, 200)
     
     def _build_description(self, df: pd.DataFrame) -> pd.Series:
         """
         Build product description from available fields
         """
-        descriptions = []
-        
-        for idx, row in df.iterrows():
-            desc_parts = []
-            
-            # Start with main description if available
-            if 'title' in df.columns and pd.notna(row.get('title')):
-                desc_parts.append(str(row['title']).strip())
-            
-            # Add brand and part number info
-            if 'brand' in df.columns and pd.notna(row.get('brand')):
-                desc_parts.append(f"Brand: {row['brand']}")
-            
-            if 'part_number' in df.columns and pd.notna(row.get('part_number')):
-                desc_parts.append(f"Part Number: {row['part_number']}")
-            
-            # Add category if available
-            if 'category' in df.columns and pd.notna(row.get('category')):
-                desc_parts.append(f"Category: {row['category']}")
-            
-            # Add fitment information if available
-            fitment_parts = []
-            if 'year' in df.columns and pd.notna(row.get('year')) and str(row['year']).strip():
-                fitment_parts.append(str(row['year']))
-            if 'make' in df.columns and pd.notna(row.get('make')) and str(row['make']).strip():
-                fitment_parts.append(str(row['make']))
-            if 'model' in df.columns and pd.notna(row.get('model')) and str(row['model']).strip():
-                fitment_parts.append(str(row['model']))
-            
-            if fitment_parts:
-                desc_parts.append(f"Fits: {' '.join(fitment_parts)}")
-            
-            # Add notes if available
-            if 'notes' in df.columns and pd.notna(row.get('notes')) and str(row['notes']).strip():
-                desc_parts.append(str(row['notes']).strip())
-            
-            description = '. '.join(desc_parts)
-            
-            # If no description, use generic
-            if not description or description.strip() == '':
-                description = 'Quality auto part for your vehicle.'
-            
-            # Limit to reasonable length (2000 characters for Amazon)
-            if len(description) > 2000:
-                description = description[:1997] + '...'
-            
-            descriptions.append(description)
-        
-        return pd.Series(descriptions, index=df.index)
+        parts = []
+        
+        # Start with main description if available
+        if 'title' in df.columns:
+            parts.append(self._text_part(df, 'title', strip=True))
+        
+        # Add brand, part number and category info
+        for col, label in (('brand', 'Brand'), ('part_number', 'Part Number'), ('category', 'Category')):
+            if col in df.columns:
+                values, present = self._text_part(df, col)
+                parts.append((self._prepend(f"{label}: ", values), present))
+        
+        # Add fitment information if available
+        fitment_parts = [
+            self._text_part(df, col, require_text=True)
+            for col in ('year', 'make', 'model')
+            if col in df.columns
+        ]
+        if fitment_parts:
+            fitment = self._join_parts(fitment_parts, ' ', df.index)
+            parts.append(("Fits: " + fitment, fitment != ''))
+        
+        # Add notes if available
+        if 'notes' in df.columns:
+            parts.append(self._text_part(df, 'notes', strip=True, require_text=True))
+        
+        description = self._join_parts(parts, '. ', df.index)
+        
+        # If no description, use generic
+        description = description.mask(
+            description.str.strip() == '', 'Quality auto part for your vehicle.'
+        )
+        
+        # Limit to reasonable length (2000 characters for Amazon)
+        return self._truncate(description, 2000)
     
-    def _standardize_condition(self, condition: str) -> str:
+    @staticmethod
+    def _text_part(df: pd.DataFrame, col: str, strip: bool = False,
+                   require_text: bool = False) -> Tuple[pd.Series, pd.Series]:
         """
-        Standardize condition values to Amazon's acceptable values
+        Return a column as strings together with the mask of rows where it is usable
         """
-        condition_lower = condition.lower().strip()
-        
-        if condition_lower in ['new', 'brand new', 'brand-new', '']:
-            return 'New'
-        elif condition_lower in ['used', 'pre-owned', 'preowned']:
-            return 'Used'
-        elif condition_lower in ['refurbished', 'rebuilt', 'remanufactured']:
-            return 'Refurbished'
+        present = df[col].notna()
+        values = as_text(df[col])
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            stripped = map_categories(values, lambda labels: labels.str.strip())
         else:
-            return 'New'  # Default to New
-
+            stripped = values.str.strip()
+        if require_text:
+            present &= stripped != ''
+        return (stripped if strip else values), present
+    
+    @staticmethod
+    def _prepend(prefix: str, values: pd.Series) -> pd.Series:
+        """
+        Prefix every value, once per category for categorical columns
+        """
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            return map_categories(values, lambda labels: prefix + labels)
+        return prefix + values
+    
+    @staticmethod
+    def _join_parts(parts: List[Tuple[pd.Series, pd.Series]], sep: str, index: pd.Index) -> pd.Series:
+        """
+        Column-wise equivalent of sep.join() over the parts present in each row
+        """
+        # Arrow-backed text stays Arrow-backed
+        dtype = ARROW_STRING if any(isinstance(values.dtype, pd.StringDtype) for values, _ in parts) else object
+        joined = pd.Series('', index=index, dtype=dtype)
+        filled = pd.Series(False, index=index)
+        
+        for values, present in parts:
+            prefix = (joined + sep).where(filled, '')
+            joined = joined.where(~present, prefix + values.astype(dtype, copy=False))
+            filled |= present
+        
+        return joined
+    
+    @staticmethod
+    def _truncate(text: pd.Series, max_length: int) -> pd.Series:
+        """
+        Cut values longer than max_length, marking the cut with an ellipsis
+        """
+        too_long = text.str.len() > max_length
+        if too_long.any():
+            text = text.where(~too_long, text.str.slice(0, max_length - 3) + '...')
+        return text
+    
+    def _standardize_condition(self, condition: pd.Series) -> pd.Series:
+        """
+        Standardize condition values to Amazon's acceptable values
+        
+        Each distinct value is looked up once in CONDITION_TYPES; unknown
+        values default to New.
+        """
+        if not isinstance(condition.dtype, pd.CategoricalDtype):
+            condition = condition.astype('category')
+        return map_categories(condition, lambda labels: (
+            _condition_key(labels.astype(str)).map(CONDITION_TYPES).fillna('New')
+        ))
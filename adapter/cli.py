@@ -0,0 +1,318 @@
+"""
+Command-line converter - Converts local catalogs without going through the API
+
+Files, glob patterns and directories are converted by the same pipeline
+the API workers run, one file per process of a process pool, reading from
+and writing to disk directly. '-' reads a catalog from stdin; its output
+goes to stdout.
+
+Usage:
+    python -m adapter /exports/*.csv -o /outgoing
+    python -m adapter /exports --recursive --format flatfile --compression gzip -o /outgoing
+    python -m adapter /exports/daily_inventory.csv --feed daily-inventory -o /outgoing
+    python -m adapter - < catalog.xlsx > amazon.csv
+
+Outputs are named amazon_<input name>.<format suffix>; inputs found in a
+directory keep their path below it. Progress and a summary are printed to
+stderr. The exit status is 1 when any file failed to convert.
+"""
+import argparse
+import glob
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .csv_parser import DEFAULT_CHUNKSIZE, ENGINES
+from .dedup import DEDUPE_POLICIES
+from .delta import DeltaIndex
+from .excel_reader import EXCEL_SUFFIXES, ZIP_MAGIC
+from .output_writer import COMPRESSIONS, OUTPUT_FORMATS, TEXT_FORMATS
+from .pipeline import convert_file
+
+
+# Files picked up from directories
+INPUT_SUFFIXES = ('.csv',) + EXCEL_SUFFIXES
+
+# Output files are named <prefix><input stem>[_fitment]<format suffix>
+OUTPUT_PREFIX = 'amazon_'
+
+# Stands for stdin as an input, and stdout as the output
+STDIO = '-'
+
+
+def find_inputs(patterns: List[str], recursive: bool = False,
+                exclude: Optional[Path] = None) -> List[Tuple[Path, Path]]:
+    """
+    Expand files, glob patterns and directories into the catalogs they name
+    
+    Args:
+        patterns: Paths, glob patterns (** matches any depth) or directories
+        recursive: Also take catalogs from the subdirectories of directories
+        exclude: Output directory; earlier outputs found in it (files named
+            amazon_*) are skipped
+    
+    Returns:
+        (path, relative path) pairs in the order given, without repeats.
+        The relative path is where the output goes below the output
+        directory: a catalog's path below the directory it was found in,
+        otherwise its file name.
+    
+    Raises:
+        FileNotFoundError: If a pattern matches nothing
+    """
+    found: Dict[Path, Path] = {}
+    for pattern in patterns:
+        matches = [Path(pattern)]
+        if not matches[0].exists():
+            matches = [Path(match) for match in sorted(glob.glob(pattern, recursive=True))]
+        if not matches:
+            raise FileNotFoundError(f"No such file or directory: {pattern}")
+        
+        for match in matches:
+            if match.is_dir():
+                files = match.rglob('*') if recursive else match.iterdir()
+                for path in sorted(files):
+                    if not path.is_file() or path.suffix.lower() not in INPUT_SUFFIXES:
+                        continue
+                    if exclude is not None and _is_output(path, exclude):
+                        continue
+                    found.setdefault(path.resolve(), path.relative_to(match))
+            elif match.is_file():
+                found.setdefault(match.resolve(), Path(match.name))
+    
+    return [(path, relative) for path, relative in found.items()]
+
+
+def _is_output(path: Path, output_dir: Path) -> bool:
+    path = path.resolve()
+    return path.name.startswith(OUTPUT_PREFIX) and output_dir.resolve() in path.parents
+
+
+def output_path_for(relative: Path, output_dir: Path, output_format: str = 'csv',
+                    compression: Optional[str] = None, fitment: bool = False) -> Path:
+    """
+    Where the output of a catalog goes, given its path relative to the output directory
+    """
+    name = OUTPUT_PREFIX + relative.stem + ('_fitment' if fitment else '')
+    suffix = OUTPUT_FORMATS[output_format] + COMPRESSIONS.get(compression, '')
+    return output_dir / relative.parent / (name + suffix)
+
+
+def convert_one(input_path: Path, output_path: Path, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert one catalog, creating the output's directory; runs on a pool worker
+    
+    Returns:
+        convert_file()'s row counts plus the seconds the conversion took
+    """
+    start = time.perf_counter()
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    counts = convert_file(input_path, output_path, **options)
+    counts['seconds'] = time.perf_counter() - start
+    return counts
+
+
+def convert_all(jobs: List[Tuple[Path, Path]], options: Dict[str, Any], workers: int = 1,
+                log=None) -> Tuple[List[Dict[str, Any]], List[Tuple[Path, str]]]:
+    """
+    Convert catalogs on a process pool of up to `workers` processes
+    
+    The largest files are started first, so that one large file at the end
+    does not leave the other workers idle. A file that fails is reported
+    and the rest still convert.
+    
+    Args:
+        jobs: (input path, output path) pairs
+        options: Keyword arguments for convert_file()
+        workers: Processes; with 1 (or a single file) files are converted in this process
+        log: Called with a line for each file converted
+    
+    Returns:
+        The counts of the converted files and the (input path, error) of the failed ones
+    """
+    converted, failed = [], []
+    
+    def report(input_path: Path, output_path: Path, counts: Dict[str, Any]) -> None:
+        converted.append(counts)
+        if log is not None:
+            log(f"{input_path} -> {output_path}: {counts['rows_processed']:,} rows in, "
+                f"{counts['rows_output']:,} out ({counts['seconds']:.1f}s)")
+    
+    if workers <= 1 or len(jobs) <= 1:
+        for input_path, output_path in jobs:
+            try:
+                report(input_path, output_path, convert_one(input_path, output_path, options))
+            except Exception as e:
+                failed.append((input_path, str(e)))
+        return converted, failed
+    
+    jobs = sorted(jobs, key=lambda job: job[0].stat().st_size, reverse=True)
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        futures = {pool.submit(convert_one, input_path, output_path, options): (input_path, output_path)
+                   for input_path, output_path in jobs}
+        for future in as_completed(futures):
+            input_path, output_path = futures[future]
+            try:
+                report(input_path, output_path, future.result())
+            except Exception as e:
+                failed.append((input_path, str(e)))
+    return converted, failed
+
+
+def convert_stdio(input_arg: str, output_arg: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert with stdin as the input and/or stdout as the output
+    
+    The parser reads its input more than once (the header first), so stdin
+    is spooled to a temporary file; stdout is written as the output is.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = Path(input_arg)
+        if input_arg == STDIO:
+            source = sys.stdin.buffer
+            head = source.read(len(ZIP_MAGIC))
+            input_path = Path(tmp_dir) / ('stdin.xlsx' if head == ZIP_MAGIC else 'stdin.csv')
+            with open(input_path, 'wb') as f:
+                f.write(head)
+                shutil.copyfileobj(source, f)
+        
+        if output_arg != STDIO:
+            return convert_one(input_path, Path(output_arg), options)
+        
+        start = time.perf_counter()
+        if options['output_format'] in TEXT_FORMATS:
+            stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', newline='', write_through=True)
+            try:
+                counts = convert_file(input_path, stdout, **options)
+            finally:
+                stdout.flush()
+                stdout.detach()
+        else:
+            counts = convert_file(input_path, sys.stdout.buffer, **options)
+            sys.stdout.buffer.flush()
+        counts['seconds'] = time.perf_counter() - start
+        return counts
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m adapter',
+        description="Convert AutoZone-style CSV and Excel catalogs to Amazon format"
+    )
+    parser.add_argument('inputs', nargs='+',
+                        help="Catalog files, glob patterns or directories; - reads a catalog from stdin")
+    parser.add_argument('-o', '--output',
+                        help="Output directory, or - for stdout (default: stdout when reading stdin, "
+                             "otherwise the current directory)")
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help="Also convert the catalogs in subdirectories of directories")
+    parser.add_argument('-f', '--format', dest='output_format', choices=list(OUTPUT_FORMATS), default='csv',
+                        help="Output format (default: csv)")
+    parser.add_argument('-z', '--compression', choices=list(COMPRESSIONS),
+                        help="Compress csv and flatfile outputs")
+    parser.add_argument('--sheet', help="Worksheet of Excel inputs, by name or 0-based position (default: first)")
+    parser.add_argument('--dedupe', choices=DEDUPE_POLICIES, help="List every product id once, by this policy")
+    parser.add_argument('--fitment', action='store_true',
+                        help="Write each listing's vehicle fitment instead of the listings")
+    parser.add_argument('--feed', help="Only write listings changed since this feed's previous conversion "
+                                       "(delta mode; one input only)")
+    parser.add_argument('--delta-dir', default='deltas',
+                        help="Directory of the delta mode indexes (default: deltas, as for the API)")
+    parser.add_argument('--engine', choices=ENGINES, default=os.environ.get('PARSER_ENGINE', 'c'),
+                        help="Parser engine (default: PARSER_ENGINE or c)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f"Rows per chunk (default: {DEFAULT_CHUNKSIZE})")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                        help="Processes (default: the number of CPUs): files are converted in parallel, and "
+                             "with fewer files than processes each file's chunks are split across the rest")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Only report errors")
+    args = parser.parse_args(argv)
+    
+    reads_stdin = STDIO in args.inputs
+    output = args.output or (STDIO if reads_stdin else '.')
+    if (reads_stdin or output == STDIO) and len(args.inputs) > 1:
+        parser.error("stdin and stdout can only be used with a single input")
+    if output == STDIO and args.compression:
+        parser.error("--compression needs an output directory; pipe stdout through gzip or zstd instead")
+    if args.compression and args.output_format not in TEXT_FORMATS:
+        parser.error(f"{args.output_format} output is compressed internally; "
+                     "--compression applies to csv and flatfile")
+    if args.fitment and (args.dedupe or args.feed):
+        parser.error("--fitment cannot be combined with --dedupe or --feed")
+    if args.fitment and args.output_format == 'flatfile':
+        parser.error("fitment files are written as csv, parquet or feather")
+    
+    options = {
+        'chunksize': args.chunksize, 'engine': args.engine, 'compression': args.compression,
+        'output_format': args.output_format, 'sheet': args.sheet, 'dedupe': args.dedupe,
+        'fitment': args.fitment,
+    }
+    if args.feed is not None:
+        try:
+            options['delta'] = DeltaIndex(Path(args.delta_dir), args.feed)
+        except ValueError as e:
+            parser.error(str(e))
+        Path(args.delta_dir).mkdir(parents=True, exist_ok=True)
+    
+    log = None if args.quiet else (lambda line: print(line, file=sys.stderr))
+    start = time.perf_counter()
+    
+    if reads_stdin or output == STDIO:
+        source = args.inputs[0]
+        if source != STDIO and not Path(source).is_file():
+            parser.error(f"stdout output needs a single catalog file, not {source}")
+        target = output if output == STDIO else str(output_path_for(
+            Path('stdin' if source == STDIO else Path(source).name), Path(output),
+            args.output_format, args.compression, args.fitment
+        ))
+        try:
+            counts = convert_stdio(source, target, {**options, 'workers': args.workers})
+        except BrokenPipeError:
+            # The reader went away (e.g. `| head`); nothing more to write
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 1
+        except Exception as e:
+            print(f"{source}: {e}", file=sys.stderr)
+            return 1
+        if log is not None:
+            log(f"{source} -> {target}: {counts['rows_processed']:,} rows in, "
+                f"{counts['rows_output']:,} out ({counts['seconds']:.1f}s)")
+        return 0
+    
+    output_dir = Path(output)
+    try:
+        inputs = find_inputs(args.inputs, args.recursive, exclude=output_dir)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    if not inputs:
+        parser.error("No CSV or Excel catalogs found")
+    if args.feed is not None and len(inputs) > 1:
+        parser.error("--feed converts a single input")
+    
+    jobs = [
+        (path, output_path_for(relative, output_dir, args.output_format, args.compression, args.fitment))
+        for path, relative in inputs
+    ]
+    outputs: Dict[Path, Path] = {}
+    for path, output_path in jobs:
+        if output_path.resolve() in outputs:
+            parser.error(f"{outputs[output_path.resolve()]} and {path} would both be written to {output_path}")
+        outputs[output_path.resolve()] = path
+    
+    # Processes left over when there are fewer files than workers transform each file's chunks
+    options['workers'] = max(1, args.workers // len(jobs))
+    converted, failed = convert_all(jobs, options, args.workers, log)
+    
+    for path, error in failed:
+        print(f"{path}: {error}", file=sys.stderr)
+    if log is not None:
+        rows = sum(counts['rows_processed'] for counts in converted)
+        log(f"Converted {len(converted)} of {len(jobs)} files, {rows:,} rows, "
+            f"in {time.perf_counter() - start:.1f}s")
+    return 1 if failed else 0
@@ -1,9 +1,120 @@
 """
-CSV Parser for AutoZone-style auto parts data
+CSV Parser for AutoZone-style auto parts data, from CSV files or Excel workbooks
 """
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import hashlib
 import io
-from typing import Union
+import os
+import threading
+from collections import OrderedDict
+from contextlib import closing
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .excel_reader import Sheet, cell_text, is_excel, read_excel_chunks, upc_text
+from .metrics import NO_TIMINGS, StageTimings
+
+
+# CSV input: raw content as bytes or string, a file path, or a seekable file
+# object. Paths ending in .xlsx and workbook bytes or binary files are read as
+# Excel (see excel_reader).
+CSVSource = Union[bytes, str, os.PathLike, IO]
+
+# Default number of rows per chunk in streaming mode
+DEFAULT_CHUNKSIZE = 50_000
+
+# Number of distinct header layouts whose resolved column mapping is remembered
+HEADER_CACHE_SIZE = 256
+
+# Parsing engines: pandas' C parser, or Arrow's multi-threaded CSV reader
+ENGINES = ('c', 'pyarrow')
+
+# Text column type of the pyarrow engine
+ARROW_STRING = pd.StringDtype('pyarrow')
+
+# Bytes the pyarrow engine reads at a time in chunked mode
+ARROW_BLOCK_SIZE = 1 << 20
+
+# Values read as missing by pandas; the pyarrow engine is given the same list
+NA_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+]
+
+
+# Declared types of the standardized columns. 'string' columns are read as
+# text and kept in the engine's string type; 'category' columns are read as
+# text and stored as categoricals, since a catalog repeats the same few brands,
+# categories and vehicles on every row.
+SCHEMA = {
+    'part_number': 'string',
+    'upc': 'string',
+    'brand': 'category',
+    'category': 'category',
+    'condition': 'category',
+    'year': 'category',
+    'make': 'category',
+    'model': 'category',
+    'price': 'float64',
+    'quantity': 'int32',
+    'weight': 'float64',
+    'length': 'float64',
+    'width': 'float64',
+    'height': 'float64',
+}
+
+
+# Text that stands for a missing value once stripped. Text columns hold them,
+# like blank cells, as empty strings rather than NA: the feed writes both as
+# empty fields, the transformer gives both its defaults, and a supplier
+# switching between blanks and "null" does not change a delta fingerprint
+NULL_STRINGS = ['nan', 'None', 'NaN', 'null']
+
+# Dollar signs and thousands separators are removed from prices before matching
+PRICE_SYMBOLS = ('$', ',')
+
+# A price once PRICE_SYMBOLS are removed, e.g. "-5", "+1299.99" or ".5" (RE2 syntax)
+PRICE_PATTERN = r'^\s*(?P<number>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*$'
+
+# A weight with an optional unit (RE2 syntax)
+WEIGHT_PATTERN = r'(?i)^\s*(?P<number>\d[\d,]*(?:\.\d*)?|\.\d+)\s*(?P<unit>lbs?|oz|kg|g)?\.?\s*$'
+
+# Pounds per unit for weights given in other units; lb/lbs values are kept as is
+WEIGHT_UNITS = {'oz': 1 / 16, 'kg': 2.20462, 'g': 0.00220462}
+
+
+def as_text(values: pd.Series) -> pd.Series:
+    """
+    Return a column as strings, keeping string[pyarrow] and categorical columns
+    in their compact form
+    """
+    if isinstance(values.dtype, pd.StringDtype):
+        return values
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return map_categories(values, lambda labels: labels.astype(str))
+    return values.astype(str)
+
+
+def map_categories(values: pd.Series, func: Callable[[pd.Series], pd.Series]) -> pd.Series:
+    """
+    Apply a column-wise function to a categorical column once per category
+    
+    Args:
+        values: Categorical Series
+        func: Maps a Series of labels to new labels; it is called with the
+            categories followed by one NaN, which stands for missing values
+    
+    Returns:
+        Categorical Series of the new labels
+    """
+    labels = pd.Series(list(values.cat.categories) + [np.nan], dtype=object)
+    label_codes, uniques = pd.factorize(func(labels).to_numpy(dtype=object))
+    # Missing values have code -1, which picks the trailing NaN label
+    codes = label_codes[values.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, uniques), index=values.index, name=values.name)
 
 
 class AutoPartsParser:
@@ -21,9 +132,41 @@ class AutoPartsParser:
     - Weight
     - Dimensions
     - Year / Make / Model / Fitment (optional)
+    
+    Supplier-specific column names can be added with register_mapping() or
+    the custom_mappings argument.
+    
+    Columns are typed by SCHEMA: identifiers stay text (UPCs keep their
+    leading zeros), repeated values such as brands are categoricals, and
+    columns the schema does not declare numeric are read as text.
+    
+    With engine='pyarrow' files are read by Arrow's multi-threaded CSV reader
+    and text columns stay string[pyarrow] instead of Python objects. Both
+    engines produce the same values, and both read parse_chunks() input a
+    chunk at a time.
+    
+    Excel workbooks (.xlsx) are streamed row by row from the worksheet picked
+    by `sheet` (the first by default) and go through the same column mapping
+    and cleaning as CSV, typed as their CSV export would be.
     """
     
-    def __init__(self):
+    # Resolved column mappings shared by all parsers, keyed by
+    # (mapping index fingerprint, header signature)
+    _header_cache: 'OrderedDict[Tuple[str, str], Dict[str, str]]' = OrderedDict()
+    _header_cache_lock = threading.Lock()
+    
+    def __init__(self, custom_mappings: Optional[Dict[str, List[str]]] = None, engine: str = 'c',
+                 timings: Optional[StageTimings] = None, sheet: Optional[Sheet] = None):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown parser engine: {engine!r} (expected one of {', '.join(ENGINES)})")
+        self.engine = engine
+        
+        # Worksheet read from Excel input: a name or 0-based position
+        self.sheet = sheet
+        
+        # Stage timing hooks (parse, standardize_columns, clean_data); no-ops by default
+        self.timings = timings or NO_TIMINGS
+        
         # Common column name mappings (lowercase for matching)
         self.column_mappings = {
             'part_number': ['part number', 'part_number', 'partnumber', 'sku', 'item number', 
@@ -45,93 +188,457 @@ class AutoPartsParser:
             'condition': ['condition', 'item_condition', 'item condition'],
             'notes': ['notes', 'comments', 'description2', 'additional_info', 'additional info'],
         }
+        
+        for standard_name, variations in (custom_mappings or {}).items():
+            self.register_mapping(standard_name, variations, recompile=False)
+        
+        self._compile_mappings()
     
-    def parse(self, file_content: Union[bytes, str]) -> pd.DataFrame:
+    def register_mapping(self, standard_name: str, variations: Iterable[str], recompile: bool = True) -> None:
+        """
+        Map additional source column names to a standard column
+        
+        Registered names take precedence over the built-in variations, so a
+        supplier's header can also re-route a common name (e.g. 'description'
+        to 'notes').
+        
+        Args:
+            standard_name: Standardized column name, e.g. 'part_number'
+            variations: Source column names (matched case-insensitively)
+            recompile: Rebuild the lookup index right away
+        """
+        variations = [v.lower().strip() for v in variations]
+        
+        for name, existing in self.column_mappings.items():
+            if name != standard_name:
+                self.column_mappings[name] = [v for v in existing if v not in variations]
+        
+        target = self.column_mappings.setdefault(standard_name, [])
+        target.extend(v for v in variations if v not in target)
+        
+        if recompile:
+            self._compile_mappings()
+    
+    @staticmethod
+    def header_signature(columns: Iterable[str]) -> str:
+        """
+        Stable hash identifying a header layout
+        """
+        return hashlib.sha1('\x1f'.join(columns).encode('utf-8')).hexdigest()
+    
+    def _compile_mappings(self) -> None:
+        """
+        Build the reverse lookup (variation -> standard name) from column_mappings
+        """
+        index = {}
+        for standard_name, variations in self.column_mappings.items():
+            for variation in variations:
+                # The first standard name listing a variation wins
+                index.setdefault(variation, standard_name)
+        
+        self._column_index = index
+        self._index_fingerprint = hashlib.sha1(repr(sorted(index.items())).encode('utf-8')).hexdigest()
+    
+    def parse(self, file_content: CSVSource) -> pd.DataFrame:
         """
         Parse CSV file content and return a standardized DataFrame
         
         Args:
-            file_content: CSV file content as bytes or string
-            
+            file_content: CSV file content as bytes or string, a path to a
+                CSV file or Excel workbook, or a seekable file object (read
+                from the start)
+        
         Returns:
             DataFrame with standardized column names
         """
-        # Read CSV with flexible options
-        if isinstance(file_content, bytes):
-            df = pd.read_csv(io.BytesIO(file_content), encoding='utf-8', low_memory=False)
+        # Read CSV with flexible options, and text columns of the schema as text
+        with self.timings.stage('parse'):
+            if is_excel(file_content):
+                with closing(self._read_excel(file_content)) as frames:
+                    df = next(frames)
+            else:
+                header = self._read_csv(file_content, nrows=0)
+                if self.engine == 'pyarrow':
+                    df = self._read_arrow(file_content, header.columns)
+                else:
+                    text_dtypes = dict.fromkeys(self._text_columns(header.columns), str)
+                    df = self._read_csv(file_content, low_memory=False, dtype=text_dtypes)
+        
+        with self.timings.stage('standardize_columns'):
+            # Strip whitespace from column names
+            df.columns = df.columns.str.strip()
+            
+            # Standardize column names
+            df = self._standardize_columns(df)
+        
+        # Clean and validate data
+        with self.timings.stage('clean_data'):
+            df = self._clean_data(df)
+        
+        return df
+    
+    def parse_chunks(self, file_content: CSVSource,
+                     chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+        """
+        Parse CSV file content in chunks of at most `chunksize` rows
+        
+        The column mapping is resolved once from the header, and the file is
+        read in a single pass. Every column is typed by the schema alone
+        (see _text_columns and _read_arrow), so each chunk is typed the way
+        parse() types the whole file; concatenating the chunks gives the same
+        DataFrame as parse().
+        
+        Args:
+            file_content: Any source accepted by parse()
+            chunksize: Maximum number of rows per chunk
+        
+        Yields:
+            DataFrames with standardized column names
+        """
+        if is_excel(file_content):
+            mapping = None
+            for chunk in self.timings.iterate('parse', self._read_excel(file_content, chunksize=chunksize)):
+                if mapping is None:
+                    mapping = self._column_mapping(chunk.columns.str.strip())
+                yield self._clean_chunk(chunk, mapping)
+            return
+        
+        with self.timings.stage('parse'):
+            header = self._read_csv(file_content, nrows=0)
+        mapping = self._column_mapping(header.columns.str.strip())
+        if self.engine == 'pyarrow':
+            reader = self._read_arrow_chunks(file_content, header.columns, chunksize)
         else:
-            df = pd.read_csv(io.StringIO(file_content), low_memory=False)
+            text_dtypes = dict.fromkeys(self._text_columns(header.columns), str)
+            reader = self._read_csv(file_content, chunksize=chunksize, dtype=text_dtypes)
         
-        # Strip whitespace from column names
-        df.columns = df.columns.str.strip()
+        rows = 0
+        for chunk in self.timings.iterate('parse', reader):
+            rows += len(chunk)
+            yield self._clean_chunk(chunk, mapping)
         
-        # Standardize column names
-        df = self._standardize_columns(df)
+        if not rows:
+            # No data rows
+            yield self._clean_chunk(header, mapping)
+    
+    def parse_header(self, file_content: CSVSource) -> pd.DataFrame:
+        """
+        Read only the header row and return an empty DataFrame with standardized columns
         
-        # Clean and validate data
-        df = self._clean_data(df)
+        Args:
+            file_content: Any source accepted by parse()
+        
+        Returns:
+            Empty DataFrame with the columns parse() would return
+        """
+        with self.timings.stage('parse'):
+            if is_excel(file_content):
+                with closing(self._read_excel(file_content, nrows=0)) as frames:
+                    header = next(frames)
+            else:
+                header = self._read_csv(file_content, nrows=0)
+        return self._clean_chunk(header, self._column_mapping(header.columns.str.strip()))
+    
+    def _read_csv(self, file_content: CSVSource, **kwargs):
+        """
+        Run pd.read_csv over any supported CSV source
+        
+        Paths and file objects are read directly, so large files never have
+        to be held in memory as a whole.
+        """
+        if isinstance(file_content, bytes):
+            return pd.read_csv(io.BytesIO(file_content), encoding='utf-8', **kwargs)
+        if isinstance(file_content, str):
+            return pd.read_csv(io.StringIO(file_content), **kwargs)
+        if isinstance(file_content, os.PathLike):
+            return pd.read_csv(file_content, encoding='utf-8', **kwargs)
+        
+        # File object; each pass of parse_chunks starts over from the beginning
+        file_content.seek(0)
+        return pd.read_csv(file_content, encoding='utf-8', **kwargs)
+    
+    def _read_excel(self, file_content: CSVSource, **kwargs) -> Iterator[pd.DataFrame]:
+        """
+        Run read_excel_chunks over a workbook, typing the cells as _read_csv
+        would type the sheet's CSV export
+        
+        Columns the schema reads as numbers keep numeric cells as numbers;
+        all other columns become text, so every chunk is typed the same way.
+        UPCs entered as numbers get back the leading zero Excel dropped.
+        """
+        with closing(read_excel_chunks(file_content, self.sheet, **kwargs)) as chunks:
+            for chunk in chunks:
+                mapping = self._column_mapping(chunk.columns.str.strip())
+                for i, col in enumerate(chunk.columns.str.strip()):
+                    if SCHEMA.get(mapping[col]) not in (None, 'string', 'category'):
+                        chunk.isetitem(i, chunk.iloc[:, i].infer_objects())
+                    else:
+                        text = chunk.iloc[:, i].map(upc_text if mapping[col] == 'upc' else cell_text)
+                        chunk.isetitem(i, text.astype(ARROW_STRING) if self.engine == 'pyarrow' else text)
+                yield chunk
+    
+    def _text_columns(self, columns: pd.Index) -> List[int]:
+        """
+        Positions of the source columns read as text: all but those the schema
+        declares numeric, which _clean_data converts to their declared type
+        
+        A column's type then never depends on the values in it, so chunks of
+        a file are typed alike without looking ahead, and CSV is typed as
+        Excel input is (see _read_excel).
+        """
+        mapping = self._column_mapping(columns.str.strip())
+        return [
+            i for i, col in enumerate(columns.str.strip())
+            if SCHEMA.get(mapping[col]) in (None, 'string', 'category')
+        ]
+    
+    def _read_arrow(self, file_content: CSVSource, columns: pd.Index) -> pd.DataFrame:
+        """
+        Read a CSV source with pyarrow.csv into string[pyarrow] columns
         
+        Every column is read as text, under the names pd.read_csv gives the
+        header (columns); _clean_data converts the ones the schema declares
+        numeric. Arrow infers types from the first block of a file and fails
+        on later values that do not fit them, which text cannot.
+        """
+        table = pa_csv.read_csv(self._arrow_source(file_content), **self._arrow_options(columns))
+        return self._arrow_frame(table)
+    
+    def _read_arrow_chunks(self, file_content: CSVSource, columns: pd.Index,
+                           chunksize: int) -> Iterator[pd.DataFrame]:
+        """
+        Read a CSV source with pyarrow.csv one block at a time, as _read_arrow
+        would read it, in frames of `chunksize` rows
+        
+        Only the rows of one chunk and one block are held at a time. Row
+        labels run on across chunks, as with pd.read_csv's chunked reader.
+        """
+        options = self._arrow_options(columns, block_size=ARROW_BLOCK_SIZE)
+        pending: List[pa.RecordBatch] = []
+        rows = start = 0
+        for batch in pa_csv.open_csv(self._arrow_source(file_content), **options):
+            pending.append(batch)
+            rows += batch.num_rows
+            while rows >= chunksize:
+                table = pa.Table.from_batches(pending)
+                yield self._arrow_frame(table.slice(0, chunksize), start)
+                start += chunksize
+                rest = table.slice(chunksize)
+                pending, rows = rest.to_batches(), rest.num_rows
+        if rows:
+            yield self._arrow_frame(pa.Table.from_batches(pending), start)
+    
+    @staticmethod
+    def _arrow_source(file_content: CSVSource):
+        if isinstance(file_content, bytes):
+            return pa.BufferReader(file_content)
+        if isinstance(file_content, str):
+            return pa.BufferReader(file_content.encode('utf-8'))
+        if isinstance(file_content, os.PathLike):
+            return os.fspath(file_content)
+        file_content.seek(0)
+        if isinstance(file_content, io.TextIOBase):
+            return pa.BufferReader(file_content.read().encode('utf-8'))
+        return file_content
+    
+    @staticmethod
+    def _arrow_options(columns: pd.Index, block_size: Optional[int] = None) -> Dict[str, object]:
+        """
+        pyarrow.csv options reading every column as text, named as in `columns`
+        """
+        read_options = pa_csv.ReadOptions(use_threads=True, column_names=list(columns), skip_rows=1)
+        if block_size is not None:
+            read_options.block_size = block_size
+        return {
+            'read_options': read_options,
+            'convert_options': pa_csv.ConvertOptions(
+                column_types=dict.fromkeys(columns, pa.string()),
+                null_values=NA_VALUES,
+                strings_can_be_null=True,
+            ),
+        }
+    
+    @staticmethod
+    def _arrow_frame(table: pa.Table, start: int = 0) -> pd.DataFrame:
+        df = table.to_pandas(types_mapper={pa.string(): ARROW_STRING}.get)
+        df.index = pd.RangeIndex(start, start + len(df))
         return df
     
+    def _clean_chunk(self, chunk: pd.DataFrame, mapping: Dict[str, str]) -> pd.DataFrame:
+        """
+        Standardize and clean one chunk using a precomputed column mapping
+        """
+        with self.timings.stage('standardize_columns'):
+            chunk.columns = chunk.columns.str.strip()
+            chunk = chunk.rename(columns=mapping)
+        with self.timings.stage('clean_data'):
+            return self._clean_data(chunk)
+    
     def _standardize_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Map various column names to standardized names
         """
+        return df.rename(columns=self._column_mapping(df.columns))
+    
+    def _column_mapping(self, columns) -> Dict[str, str]:
+        """
+        Build the rename map from source column names to standardized names
+        
+        Suppliers send the same header layout with every upload, so the result
+        is cached per header signature.
+        """
+        columns = list(columns)
+        key = (self._index_fingerprint, self.header_signature(columns))
+        
+        cache = AutoPartsParser._header_cache
+        with AutoPartsParser._header_cache_lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return dict(cache[key])
+        
+        new_columns = self._resolve_columns(columns)
+        
+        with AutoPartsParser._header_cache_lock:
+            cache[key] = new_columns
+            while len(cache) > HEADER_CACHE_SIZE:
+                cache.popitem(last=False)
+        
+        return dict(new_columns)
+    
+    def _resolve_columns(self, columns: List[str]) -> Dict[str, str]:
+        """
+        Look each column up in the compiled index
+        """
         new_columns = {}
         used_standard_names = set()
         
-        for col in df.columns:
-            col_lower = col.lower().strip()
-            mapped = False
+        for col in columns:
+            standard_name = self._column_index.get(col.lower().strip())
             
-            # Try to find matching standard column
-            for standard_name, variations in self.column_mappings.items():
-                if col_lower in variations:
-                    # Avoid duplicate column names
-                    if standard_name in used_standard_names:
-                        # If standard name already used, keep original with suffix
-                        new_columns[col] = f"{col}_original"
-                    else:
-                        new_columns[col] = standard_name
-                        used_standard_names.add(standard_name)
-                    mapped = True
-                    break
-            
-            # Keep original if no mapping found
-            if not mapped:
+            if standard_name is None:
+                # Keep original if no mapping found
                 new_columns[col] = col.lower()
+            elif standard_name in used_standard_names:
+                # Avoid duplicate column names: keep original with suffix
+                new_columns[col] = f"{col}_original"
+            else:
+                new_columns[col] = standard_name
+                used_standard_names.add(standard_name)
         
-        df = df.rename(columns=new_columns)
-        
-        return df
+        return new_columns
     
     def _clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Clean and standardize data values
+        
+        Each column is converted to its SCHEMA type in one pass; other text
+        columns are stripped, with missing values and NULL_STRINGS as empty
+        strings.
         """
         # Remove completely empty rows
         df = df.dropna(how='all')
         
-        # Clean price fields
-        if 'price' in df.columns:
-            df['price'] = df['price'].astype(str).str.replace('$', '').str.replace(',', '').str.strip()
-            df['price'] = pd.to_numeric(df['price'], errors='coerce')
+        for col in df.columns.unique():
+            values = df[col]
+            if isinstance(values, pd.DataFrame):
+                # Repeated column name; left as read
+                continue
+            
+            dtype = SCHEMA.get(col)
+            if col == 'price':
+                df[col] = self._parse_prices(values)
+            elif col == 'weight':
+                df[col] = self._parse_weights(values)
+            elif col == 'quantity':
+                df[col] = self._to_numeric(values).fillna(0).astype(dtype)
+            elif dtype == 'category':
+                # Cleaned once per category
+                df[col] = map_categories(values.astype('category'), self._clean_text)
+            elif dtype not in (None, 'string'):
+                df[col] = self._to_numeric(values).astype(dtype)
+            elif pd.api.types.is_object_dtype(values) or isinstance(values.dtype, pd.StringDtype):
+                df[col] = self._clean_text(values)
         
-        # Clean quantity fields
-        if 'quantity' in df.columns:
-            df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce').fillna(0).astype(int)
+        return df
+    
+    @staticmethod
+    def _clean_text(values: pd.Series) -> pd.Series:
+        """
+        Strip whitespace, turning missing values and null markers into empty strings
+        """
+        if pd.api.types.is_object_dtype(values) and pd.api.types.infer_dtype(values) not in ('string', 'empty'):
+            # Mixed values such as booleans are cleaned as their text
+            values = values.astype(str)
         
-        # Clean weight fields
-        if 'weight' in df.columns:
-            df['weight'] = df['weight'].astype(str).str.replace('lbs', '').str.replace('lb', '').str.strip()
-            df['weight'] = pd.to_numeric(df['weight'], errors='coerce')
+        stripped = values.str.strip()
+        stripped[stripped.isna() | stripped.isin(NULL_STRINGS)] = ''
+        return stripped
+    
+    def _parse_prices(self, values: pd.Series) -> pd.Series:
+        """
+        Parse prices such as "$1,299.99", "-$5" or "$-5" with one regex match per value
+        """
+        if pd.api.types.is_numeric_dtype(values):
+            return values.astype('float64')
         
-        # Strip whitespace from string columns
-        for col in df.columns:
-            if pd.api.types.is_object_dtype(df[col]):
-                df[col] = df[col].astype(str).str.strip()
-                # Replace 'nan' strings with empty strings
-                df[col] = df[col].replace(['nan', 'None', 'NaN', 'null'], '')
+        text = self._arrow_text(values)
+        for symbol in PRICE_SYMBOLS:
+            text = pc.replace_substring(text, symbol, '')
+        match = pc.extract_regex(text, PRICE_PATTERN)
+        prices = pc.cast(pc.struct_field(match, 'number'), pa.float64())
+        return pd.Series(prices.to_numpy(zero_copy_only=False), index=values.index, name=values.name)
+    
+    def _parse_weights(self, values: pd.Series) -> pd.Series:
+        """
+        Parse weights such as "3.5 lbs", "12 oz" or "2kg" into pounds
+        """
+        if pd.api.types.is_numeric_dtype(values):
+            return values.astype('float64')
         
-        return df
+        match = self._extract(values, WEIGHT_PATTERN)
+        weights = self._parse_number(pc.struct_field(match, 'number'))
+        
+        units = pc.utf8_lower(pc.struct_field(match, 'unit'))
+        factors = pc.take(pa.array(list(WEIGHT_UNITS.values())), pc.index_in(units, pa.array(list(WEIGHT_UNITS))))
+        # Converted weights are rounded to hundredths of a pound
+        converted = pc.round(pc.multiply(weights, factors), 2)
+        weights = pc.if_else(pc.is_null(factors), weights, converted)
+        return pd.Series(weights.to_numpy(zero_copy_only=False), index=values.index, name=values.name)
+    
+    def _extract(self, values: pd.Series, pattern: str):
+        """
+        Match a text column against a regex with named groups using Arrow's
+        compiled (RE2) matcher; missing and non-matching values give nulls
+        """
+        return pc.extract_regex(self._arrow_text(values), pattern)
+    
+    @staticmethod
+    def _arrow_text(values: pd.Series) -> pa.Array:
+        """
+        A text column as an Arrow string array, with missing values as nulls
+        """
+        try:
+            return pa.array(values, type=pa.string(), from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed values such as booleans are matched as their text
+            return pa.array(values.astype(str), type=pa.string())
+    
+    @staticmethod
+    def _parse_number(numbers):
+        """
+        Convert matched number text, which may contain thousands separators, to float64
+        """
+        return pc.cast(pc.replace_substring(numbers, ',', ''), pa.float64())
+    
+    @staticmethod
+    def _to_numeric(values: pd.Series) -> pd.Series:
+        """
+        pd.to_numeric with NumPy result types for string[pyarrow] input as well
+        """
+        numbers = pd.to_numeric(values, errors='coerce')
+        if isinstance(numbers.dtype, pd.api.extensions.ExtensionDtype):
+            # Nullable Int64/Float64 from Arrow strings; type it as object input would be
+            has_missing = numbers.isna().any()
+            numbers = numbers.astype('float64' if has_missing else numbers.dtype.numpy_dtype)
+        return numbers
 
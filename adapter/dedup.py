@@ -0,0 +1,143 @@
+"""
+Duplicate listings - Hash-indexed detection of repeated product ids and merge policies
+
+Amazon keys listings by product-id, so a feed listing one twice gets one of
+the rows rejected or silently overwritten. DuplicateIndex factorizes the
+product-id column into integer group codes (one hash table pass), and every
+policy is then a linear pass over those codes with NumPy, so the cost stays
+O(n) on million-row feeds.
+"""
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+from .amazon_transformer import PLACEHOLDER_SKU_PREFIX
+
+
+# How the rows of a repeated product-id are combined into one:
+# - first: keep the first row
+# - last: keep the last row
+# - sum_quantity: keep the first row, with the quantity of all rows added up
+# - min_price: keep the cheapest row (the first of equally cheap rows)
+DEDUPE_POLICIES = ('first', 'last', 'sum_quantity', 'min_price')
+
+# Columns DuplicateIndex is built from
+KEY_COLUMNS = ['product-id', 'product-id-type', 'part-number', 'quantity', 'standard-price']
+
+# Repeated product ids and part numbers listed by name in a report
+REPORT_LIMIT = 20
+
+
+class DuplicateIndex:
+    """
+    Finds the rows of a feed that repeat a product-id and decides which to keep.
+    
+    Built from the KEY_COLUMNS of all rows in feed order. Placeholder SKUs
+    are numbered per file, so they never count as duplicates.
+    
+    A part number listed under several different product ids (say once with
+    its UPC and once without) is not merged, since the rows may be distinct
+    variants, but is reported as a part-number collision.
+    
+    Usage:
+        index = DuplicateIndex(keys, 'sum_quantity')
+        rows = slice(start, start + len(chunk))
+        chunk = index.apply(chunk, rows)
+    """
+    
+    def __init__(self, keys: pd.DataFrame, policy: str = 'first'):
+        if policy not in DEDUPE_POLICIES:
+            raise ValueError(
+                f"Unknown dedupe policy: {policy!r} (expected one of {', '.join(DEDUPE_POLICIES)})"
+            )
+        self.policy = policy
+        self._keys = keys
+        
+        product_ids = keys['product-id'].astype(str)
+        codes, uniques = pd.factorize(product_ids)
+        placeholder = (keys['product-id-type'] == 'SKU') & product_ids.str.startswith(PLACEHOLDER_SKU_PREFIX)
+        self.placeholder = placeholder.to_numpy()
+        if self.placeholder.any():
+            # A group of their own for each placeholder row
+            codes[self.placeholder] = len(uniques) + np.arange(self.placeholder.sum())
+        self.codes = codes
+        self.group_sizes = np.bincount(codes)
+        
+        if policy == 'last':
+            self.keep = ~pd.Series(codes).duplicated(keep='last').to_numpy()
+        elif policy == 'min_price':
+            prices = pd.to_numeric(keys['standard-price'], errors='coerce').fillna(np.inf).to_numpy(dtype='float64')
+            lowest = np.full(len(self.group_sizes), np.inf)
+            np.minimum.at(lowest, codes, prices)
+            # Rows at their group's lowest price (every row if none has a price); the first one wins
+            candidates = np.flatnonzero(prices == lowest[codes])
+            winners = candidates[~pd.Series(codes[candidates]).duplicated().to_numpy()]
+            self.keep = np.zeros(len(codes), dtype=bool)
+            self.keep[winners] = True
+        else:
+            self.keep = ~pd.Series(codes).duplicated().to_numpy()
+        
+        self.quantities = None
+        if policy == 'sum_quantity':
+            quantities = pd.to_numeric(keys['quantity'], errors='coerce').fillna(0).to_numpy()
+            self.quantities = np.bincount(codes, weights=quantities, minlength=len(self.group_sizes))
+    
+    @property
+    def rows_removed(self) -> int:
+        return int(len(self.keep) - self.keep.sum())
+    
+    def apply(self, df: pd.DataFrame, rows: slice) -> pd.DataFrame:
+        """
+        Drop the duplicate rows of a chunk and combine the kept ones per the policy
+        
+        Args:
+            df: Chunk of the feed
+            rows: Positions of the chunk's rows in the feed
+        """
+        keep = self.keep[rows]
+        df = df[keep]
+        if self.quantities is not None and len(df):
+            totals = self.quantities[self.codes[rows][keep]]
+            df = df.assign(quantity=totals.astype(df['quantity'].dtype))
+        return df
+    
+    def report(self, limit: int = REPORT_LIMIT) -> Dict[str, Any]:
+        """
+        Duplicate product ids and part-number collisions as a JSON-serializable dict
+        
+        Returns:
+            The policy, the number of repeated product ids (duplicate_groups)
+            and of rows_removed, up to `limit` of the repeated product ids
+            with their row counts, and the part numbers listed under more
+            than one product id
+        """
+        # First row of each product-id listed more than once, in feed order
+        first_rows = np.flatnonzero(~pd.Series(self.codes).duplicated().to_numpy())
+        first_rows = first_rows[self.group_sizes[self.codes[first_rows]] > 1]
+        product_ids = self._keys['product-id'].astype(str).to_numpy()
+        
+        # Part numbers of kept rows with more than one product-id
+        pairs = pd.DataFrame({
+            'part-number': self._keys['part-number'].fillna('').astype(str).to_numpy()[self.keep],
+            'product-id': product_ids[self.keep],
+        })
+        pairs = pairs[pairs['part-number'] != ''].drop_duplicates()
+        pairs = pairs[pairs['part-number'].duplicated(keep=False)]
+        part_numbers = pairs['part-number'].unique()
+        listed = pairs[pairs['part-number'].isin(part_numbers[:limit])]
+        
+        return {
+            'policy': self.policy,
+            'duplicate_groups': int(len(first_rows)),
+            'rows_removed': self.rows_removed,
+            'duplicates': [
+                {'product-id': product_ids[row], 'rows': int(self.group_sizes[self.codes[row]])}
+                for row in first_rows[:limit]
+            ],
+            'part_number_collisions': int(len(part_numbers)),
+            'part_numbers': [
+                {'part-number': part_number, 'product_ids': group.tolist()}
+                for part_number, group in listed.groupby('part-number', sort=False)['product-id']
+            ],
+        }
@@ -0,0 +1,177 @@
+"""
+Delta conversion - Emit only new, changed and deleted listings since the last run
+
+Each feed keeps an index of (product-id, fingerprint) pairs from its last
+successful conversion. A fingerprint is a 64-bit hash of the parsed input
+row, so unchanged rows are dropped before any title or description is built.
+"""
+import json
+import re
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .amazon_transformer import AmazonTransformer
+from .result_cache import conversion_version
+
+
+# Value of Amazon's update-delete column for each kind of delta row
+UPDATE = 'Update'
+DELETE = 'Delete'
+
+FEED_NAME_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}$')
+
+
+class DeltaIndex:
+    """
+    Persistent per-SKU fingerprints of a feed's last successful conversion.
+    
+    Stored as `<feed>.parquet` plus `<feed>.json` (metadata) in `directory`.
+    An index written by a different version of the conversion code is
+    ignored, so a code change re-emits the full catalog once.
+    """
+    
+    def __init__(self, directory: Path, feed: str):
+        if not FEED_NAME_PATTERN.match(feed):
+            raise ValueError(f"Invalid feed name: {feed!r}")
+        self.directory = Path(directory)
+        self.feed = feed
+    
+    @property
+    def path(self) -> Path:
+        return self.directory / f"{self.feed}.parquet"
+    
+    @property
+    def meta_path(self) -> Path:
+        return self.directory / f"{self.feed}.json"
+    
+    def load(self) -> Optional[pd.DataFrame]:
+        """
+        Read the previous run's index
+        
+        Returns:
+            DataFrame with product-id, product-id-type and fingerprint columns,
+            or None if the feed has no usable index
+        """
+        try:
+            metadata = json.loads(self.meta_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        if metadata.get('version') != conversion_version():
+            return None
+        return pd.read_parquet(self.path)
+    
+    def save(self, index: pd.DataFrame) -> None:
+        """
+        Replace the stored index with the current run's
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.parquet.tmp')
+        index.to_parquet(tmp_path, index=False)
+        tmp_path.replace(self.path)
+        self.meta_path.write_text(json.dumps({
+            'version': conversion_version(),
+            'rows': len(index),
+            'updated_at': time.time(),
+        }), encoding='utf-8')
+
+
+class DeltaTracker:
+    """
+    Filters the parsed chunks of one conversion down to new and changed rows,
+    and works out which listings were deleted once all chunks have been seen.
+    
+    Usage:
+        tracker = DeltaTracker(DeltaIndex(directory, feed))
+        for df in parser.parse_chunks(path):
+            writer.write(tracker.mark(transformer.transform(tracker.filter(df))))
+        writer.write(tracker.deletions(columns))
+        tracker.commit()
+    """
+    
+    def __init__(self, index: DeltaIndex, transformer: Optional[AmazonTransformer] = None):
+        self.index = index
+        self.transformer = transformer or AmazonTransformer()
+        
+        previous = index.load()
+        if previous is None:
+            previous = pd.DataFrame({
+                'product-id': pd.Series(dtype=object),
+                'product-id-type': pd.Series(dtype=object),
+                'fingerprint': pd.Series(dtype='uint64'),
+            })
+        self._previous = previous.drop_duplicates('product-id', keep='last').set_index('product-id')
+        # Rows match on (product-id, fingerprint), so duplicate SKUs compare row for row
+        self._previous_rows = pd.Index(self._row_keys(previous['product-id'], previous['fingerprint']))
+        self._seen: List[pd.DataFrame] = []
+        self.counts = {'rows_new': 0, 'rows_changed': 0, 'rows_unchanged': 0, 'rows_deleted': 0}
+    
+    def filter(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Return the rows of a parsed chunk that are new or changed since the last run
+        """
+        product_ids, id_types = self.transformer.resolve_product_ids(df)
+        fingerprints = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        
+        self._seen.append(pd.DataFrame({
+            'product-id': product_ids.values,
+            'product-id-type': id_types.values,
+            'fingerprint': fingerprints,
+        }))
+        
+        is_new = ~product_ids.isin(self._previous.index).to_numpy()
+        is_unchanged = pd.Index(self._row_keys(product_ids, fingerprints)).isin(self._previous_rows)
+        is_changed = ~is_new & ~is_unchanged
+        
+        self.counts['rows_new'] += int(is_new.sum())
+        self.counts['rows_changed'] += int(is_changed.sum())
+        self.counts['rows_unchanged'] += int(is_unchanged.sum())
+        
+        return df[is_new | is_changed]
+    
+    @staticmethod
+    def _row_keys(product_ids, fingerprints) -> np.ndarray:
+        """
+        Combine product ids and row fingerprints into one 64-bit key per row
+        """
+        keys = pd.DataFrame({'product-id': np.asarray(product_ids, dtype=object),
+                             'fingerprint': np.asarray(fingerprints, dtype='uint64')})
+        return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+    
+    @staticmethod
+    def mark(amazon_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Flag transformed rows for Amazon's update operation
+        """
+        amazon_df['update-delete'] = UPDATE
+        return amazon_df
+    
+    def deletions(self, columns: List[str]) -> pd.DataFrame:
+        """
+        Delete rows for listings in the previous run that are missing from this one
+        
+        Args:
+            columns: Output columns; everything but the id columns is left blank
+        """
+        seen = pd.concat(self._seen)['product-id'] if self._seen else pd.Series(dtype=object)
+        deleted = self._previous[~self._previous.index.isin(seen)]
+        self.counts['rows_deleted'] = len(deleted)
+        
+        rows = pd.DataFrame(index=range(len(deleted)), columns=columns)
+        rows['product-id'] = deleted.index.values
+        rows['product-id-type'] = deleted['product-id-type'].values
+        rows['update-delete'] = DELETE
+        return rows
+    
+    def commit(self) -> None:
+        """
+        Save this run's fingerprints as the feed's new index
+        """
+        if self._seen:
+            current = pd.concat(self._seen, ignore_index=True)
+        else:
+            current = self._previous.iloc[0:0].reset_index()
+        self.index.save(current)
@@ -0,0 +1,161 @@
+"""
+Excel reader - Streams the rows of .xlsx workbooks into DataFrame chunks
+
+Workbooks are opened with openpyxl in read-only mode, which parses the
+worksheet XML as it is iterated instead of loading every cell, so memory
+use depends on the chunk size rather than the size of the workbook.
+"""
+import datetime
+import io
+import os
+from itertools import islice
+from typing import IO, Any, Dict, Iterator, List, Optional, Union
+
+import pandas as pd
+from openpyxl import load_workbook
+
+
+# Workbook suffixes read as Excel input
+EXCEL_SUFFIXES = ('.xlsx', '.xlsm')
+
+# .xlsx files are zip archives
+ZIP_MAGIC = b'PK\x03\x04'
+
+# A worksheet name, or its 0-based position in the workbook
+Sheet = Union[str, int]
+
+# Digits of a UPC-A code; stored as a number, one starting with 0 loses a digit
+UPC_DIGITS = 12
+
+
+def is_excel(source: Any) -> bool:
+    """
+    Whether a parser source is an Excel workbook rather than CSV
+    
+    Paths are told apart by suffix; bytes and binary file objects by the
+    zip signature every .xlsx file starts with.
+    """
+    if isinstance(source, os.PathLike):
+        return os.fspath(source).lower().endswith(EXCEL_SUFFIXES)
+    if isinstance(source, bytes):
+        return source.startswith(ZIP_MAGIC)
+    if isinstance(source, str) or isinstance(source, io.TextIOBase):
+        return False
+    
+    source.seek(0)
+    signature = source.read(len(ZIP_MAGIC))
+    source.seek(0)
+    return signature == ZIP_MAGIC
+
+
+def cell_text(value: Any) -> Optional[str]:
+    """
+    Text of a cell value as it would appear in a CSV export
+    
+    Whole numbers lose the .0 Excel stores them with (so UPCs and years stay
+    digits), and dates at midnight are written without a time.
+    """
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime.datetime) and value.time() == datetime.time():
+        return value.date().isoformat()
+    return str(value)
+
+
+def upc_text(value: Any) -> Optional[str]:
+    """
+    Text of a UPC cell
+    
+    Excel stores UPCs typed into a cell as numbers, so a UPC-A code
+    starting with 0 (e.g. 012345678901) comes out with 11 digits; the
+    leading zero is put back. Text cells are taken as they are.
+    """
+    text = cell_text(value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and text.isdigit() \
+            and len(text) == UPC_DIGITS - 1:
+        return text.zfill(UPC_DIGITS)
+    return text
+
+
+def read_excel_chunks(source: Union[bytes, os.PathLike, IO], sheet: Optional[Sheet] = None,
+                      chunksize: Optional[int] = None, nrows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    Read a worksheet into DataFrames of object columns holding the raw cell values
+    
+    The first row is the header. Blank header cells are named "Unnamed: <i>"
+    and repeated names are suffixed as pd.read_csv does.
+    
+    Args:
+        source: Workbook content as bytes, a path, or a binary file object
+        sheet: Worksheet name or 0-based position; the first sheet by default
+        chunksize: Rows per DataFrame; all rows in one DataFrame by default
+        nrows: Stop after this many data rows, e.g. 0 for the header only
+    
+    Yields:
+        DataFrames of at most `chunksize` rows; one empty DataFrame with the
+        header's columns when the sheet has no data rows
+    
+    Raises:
+        ValueError: If the sheet does not exist
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    elif not isinstance(source, os.PathLike):
+        source.seek(0)
+    
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = _select_sheet(workbook, sheet).iter_rows(values_only=True)
+        columns = _header(next(rows, ()))
+        width = len(columns)
+        if nrows is not None:
+            rows = islice(rows, nrows)
+        
+        start = 0
+        while True:
+            # Read-only rows can be ragged; pad or cut them to the header
+            batch = [
+                row[:width] if len(row) >= width else row + (None,) * (width - len(row))
+                for row in islice(rows, chunksize)
+            ]
+            if not batch:
+                break
+            # Row labels run on across chunks, as in pd.read_csv's chunks
+            index = pd.RangeIndex(start, start + len(batch))
+            start += len(batch)
+            yield pd.DataFrame(batch, columns=columns, index=index, dtype=object)
+            if chunksize is None:
+                break
+        
+        if not start:
+            yield pd.DataFrame(columns=columns, dtype=object)
+    finally:
+        workbook.close()
+
+
+def _select_sheet(workbook, sheet: Optional[Sheet]):
+    if sheet is None:
+        return workbook.worksheets[0]
+    if isinstance(sheet, str) and sheet in workbook.sheetnames:
+        return workbook[sheet]
+    if isinstance(sheet, int) or sheet.isdigit():
+        if int(sheet) < len(workbook.worksheets):
+            return workbook.worksheets[int(sheet)]
+    raise ValueError(f"Unknown sheet: {sheet!r} (workbook has {', '.join(workbook.sheetnames)})")
+
+
+def _header(row: tuple) -> List[str]:
+    """
+    Column names of a header row, named and de-duplicated the way pd.read_csv does
+    """
+    seen: Dict[str, int] = {}
+    names = []
+    for i, value in enumerate(row):
+        name = cell_text(value)
+        name = f"Unnamed: {i}" if name is None or not name.strip() else name
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        names.append(f"{name}.{count}" if count else name)
+    return names
@@ -0,0 +1,205 @@
+"""
+Vehicle fitment - Expands year ranges and vehicle lists into interned fitment tuples
+
+Supplier catalogs pack a part's fitment into its year/make/model cells:
+year ranges such as "2015-2020" and lists such as "Camry; Corolla". The
+FitmentTable parses each distinct combination of cells once, with
+vectorized string operations, expands it into one (year, make, model)
+vehicle per fitment, and interns the vehicles, so an expanded catalog is
+two integer arrays (row, vehicle id) however many vehicles a part fits.
+"""
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Standardized columns a part's fitment is read from
+FITMENT_COLUMNS = ('year', 'make', 'model')
+
+# Columns of a fitment file: one row per product id and vehicle
+FITMENT_OUTPUT_COLUMNS = ['product-id', 'fitment-year', 'fitment-make', 'fitment-model']
+
+# Separators of the entries of a vehicle list, e.g. "Camry; Corolla"; not commas,
+# which some model names contain
+LIST_SEPARATOR = r'\s*[;|\n]\s*'
+
+# A year range, e.g. "2015-2020", "2015 - 20" or "2015 to 2020"
+YEAR_RANGE_PATTERN = r'^(?P<start>\d{4})\s*(?:-|–|to)\s*(?P<end>\d{2}|\d{4})$'
+
+# Longer year ranges are taken for typos and kept as they are written
+MAX_YEAR_SPAN = 100
+
+
+class FitmentTable:
+    """
+    Lookup table of distinct (year, make, model) vehicles, shared by all
+    chunks of a conversion.
+    
+    Entries of the year, make and model lists are paired by position, and a
+    cell holding a single entry applies to every vehicle of its row:
+    
+        year "2015-2016", make "Toyota", model "Camry; Corolla"
+        -> 2015 Toyota Camry, 2016 Toyota Camry, 2015 Toyota Corolla, 2016 Toyota Corolla
+    
+    Each vehicle gets an integer id the first time it is seen, and the year,
+    make and model of a fitment file are categoricals over the table's
+    labels, so a part fitting 300 vehicles costs 300 integer pairs rather
+    than 300 copies of its row.
+    
+    Usage:
+        table = FitmentTable()
+        for rows, ids in table.expand(chunk, batch_size=50_000):
+            fitment = table.listing(product_ids[rows], ids)
+    """
+    
+    def __init__(self):
+        self._ids: Dict[Tuple[str, str, str], int] = {}
+        # Distinct years, makes and models, and each vehicle's codes into them
+        self._labels: List[Dict[str, int]] = [{} for _ in FITMENT_COLUMNS]
+        self._codes: List[Tuple[int, int, int]] = []
+        self._codes_array = np.empty((0, len(FITMENT_COLUMNS)), dtype=np.int32)
+    
+    def __len__(self) -> int:
+        return len(self._ids)
+    
+    def expand(self, df: pd.DataFrame, batch_size: Optional[int] = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Vehicles each row of a chunk fits
+        
+        Args:
+            df: Chunk with standardized columns
+            batch_size: Vehicles per batch; all of the chunk's in one by
+                default. A row's vehicles are never split across batches.
+        
+        Yields:
+            Pairs of int32 arrays of equal length, in row order: the
+            positions of rows in df and the ids of the vehicles they fit.
+            Rows without fitment do not appear.
+        """
+        present = [col for col in FITMENT_COLUMNS if col in df.columns]
+        if not present or not len(df):
+            return
+        
+        # Each distinct combination of cells is parsed once
+        sources = df[present].reset_index(drop=True)
+        groups = sources.groupby(present, sort=False, dropna=False, observed=True).ngroup().to_numpy()
+        first_rows = np.flatnonzero(~pd.Series(groups).duplicated().to_numpy())
+        combos, ids = self._parse(sources.iloc[first_rows])
+        
+        # Vehicles of each combination, as ranges of `ids`
+        counts = np.bincount(combos, minlength=len(first_rows))
+        starts = (np.cumsum(counts) - counts)[groups]
+        counts = counts[groups]
+        
+        # Rows are expanded a batch at a time, so memory use is bounded by batch_size
+        ends = np.cumsum(counts)
+        batches = (ends - counts) // (batch_size or max(int(ends[-1]), 1))
+        bounds = np.concatenate([[0], np.flatnonzero(np.diff(batches)) + 1, [len(df)]])
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            rows = np.repeat(np.arange(first, last, dtype=np.int32), counts[first:last])
+            if len(rows):
+                yield rows, ids[_ranges(starts[first:last], counts[first:last])]
+    
+    def listing(self, product_ids: Sequence, ids: np.ndarray) -> pd.DataFrame:
+        """
+        Fitment file rows: product ids with the year, make and model of vehicle ids
+        
+        Args:
+            product_ids: Product id of each row
+            ids: Vehicle id of each row, from expand()
+        """
+        if len(self._codes_array) != len(self._codes):
+            self._codes_array = np.array(self._codes, dtype=np.int32).reshape(-1, len(FITMENT_COLUMNS))
+        codes = self._codes_array[np.asarray(ids, dtype=np.int32)]
+        columns = {'product-id': np.asarray(product_ids, dtype=object)}
+        for i, name in enumerate(FITMENT_OUTPUT_COLUMNS[1:]):
+            columns[name] = pd.Categorical.from_codes(codes[:, i], categories=list(self._labels[i]))
+        return pd.DataFrame(columns)
+    
+    def _parse(self, sources: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Expand distinct combinations of fitment cells into interned vehicles
+        
+        Returns:
+            The combination (position in sources) and vehicle id of each
+            vehicle, ordered by combination
+        """
+        n = len(sources)
+        lists = {}
+        for col in sources.columns:
+            values = sources[col].astype(object)
+            text = values.where(values.notna(), '').astype(str).str.strip()
+            lists[col] = text.mask(text == 'nan', '').str.split(LIST_SEPARATOR, regex=True)
+        
+        # As many vehicles as the longest list; shorter lists of one entry are repeated
+        lengths = {col: entries.str.len().to_numpy() for col, entries in lists.items()}
+        width = np.maximum.reduce(list(lengths.values()))
+        combos = np.repeat(np.arange(n), width)
+        positions = _ranges(np.zeros(n, dtype=np.int64), width)
+        
+        entries = {}
+        for col in FITMENT_COLUMNS:
+            if col not in lists:
+                entries[col] = np.full(len(combos), '', dtype=object)
+                continue
+            flat = lists[col].explode().to_numpy(dtype=object)
+            length = lengths[col][combos]
+            offset = (np.cumsum(lengths[col]) - lengths[col])[combos]
+            valid = (positions < length) | (length == 1)
+            index = offset + np.where(length == 1, 0, np.minimum(positions, length - 1))
+            entries[col] = np.where(valid, flat[index], '')
+        
+        # One vehicle per model year of a range
+        years = pd.Series(entries['year'], dtype=object)
+        bounds = years.str.extract(YEAR_RANGE_PATTERN)
+        start = pd.to_numeric(bounds['start']).to_numpy()
+        end = pd.to_numeric(bounds['end']).to_numpy()
+        # "2015-20" ends in 2020, "1998-02" in 2002
+        short = bounds['end'].str.len().to_numpy() == 2
+        end = np.where(short, start // 100 * 100 + end, end)
+        end = np.where(short & (end < start), end + 100, end)
+        start, end = np.fmin(start, end), np.fmax(start, end)
+        is_range = ~np.isnan(start) & (end - start < MAX_YEAR_SPAN)
+        span = np.where(is_range, end - start + 1, 1).astype(np.int64)
+        
+        repeat = np.repeat(np.arange(len(combos)), span)
+        offset = _ranges(np.zeros(len(span), dtype=np.int64), span)
+        year_numbers = (np.nan_to_num(start)[repeat] + offset).astype(np.int64).astype(str).astype(object)
+        entries['year'] = np.where(is_range[repeat], year_numbers, entries['year'][repeat])
+        entries['make'] = entries['make'][repeat]
+        entries['model'] = entries['model'][repeat]
+        combos = combos[repeat]
+        
+        # Cells without any fitment give no vehicle
+        fits = (entries['year'] != '') | (entries['make'] != '') | (entries['model'] != '')
+        ids = self._intern([entries[col][fits] for col in FITMENT_COLUMNS])
+        vehicles = pd.DataFrame({'combo': combos[fits], 'id': ids}).drop_duplicates()
+        return vehicles['combo'].to_numpy(), vehicles['id'].to_numpy(dtype=np.int32)
+    
+    def _intern(self, columns: List[np.ndarray]) -> np.ndarray:
+        """
+        Ids of (year, make, model) vehicles, adding the ones not seen before
+        """
+        if not len(columns[0]):
+            return np.empty(0, dtype=np.int32)
+        codes, vehicles = pd.MultiIndex.from_arrays(columns).factorize()
+        ids = np.empty(len(vehicles), dtype=np.int32)
+        for i, vehicle in enumerate(vehicles):
+            vehicle_id = self._ids.get(vehicle)
+            if vehicle_id is None:
+                vehicle_id = self._ids[vehicle] = len(self._ids)
+                self._codes.append(tuple(
+                    labels.setdefault(label, len(labels)) for labels, label in zip(self._labels, vehicle)
+                ))
+            ids[i] = vehicle_id
+        return ids[codes]
+
+
+def _ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Concatenation of arange(start, start + count) for each start and count
+    """
+    total = int(counts.sum())
+    ends = np.cumsum(counts)
+    return np.repeat(starts - (ends - counts), counts) + np.arange(total)
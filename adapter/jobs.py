@@ -0,0 +1,199 @@
+"""
+Conversion jobs - Bounded asynchronous queue for background conversions
+"""
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class ConversionJob:
+    """
+    State of one background conversion.
+    
+    Job states:
+    - queued: waiting for a free worker
+    - running: being converted
+    - completed: output written to output_path
+    - failed: conversion raised an error (see error)
+    """
+    
+    def __init__(self, filename: str, input_path: Path, output_path: Path,
+                 job_id: Optional[str] = None, sheet: Optional[str] = None,
+                 dedupe: Optional[str] = None, fitment: bool = False):
+        self.id = job_id or uuid.uuid4().hex
+        self.filename = filename
+        self.input_path = input_path
+        self.output_path = output_path
+        # Worksheet converted from an Excel upload; the first by default
+        self.sheet = sheet
+        # Policy for repeated product ids (see DEDUPE_POLICIES); None keeps them all
+        self.dedupe = dedupe
+        # Write the listings' vehicle fitment instead of the listings
+        self.fitment = fitment
+        self.state = 'queued'
+        self.error: Optional[str] = None
+        
+        # Set by the runner; any object whose `value` is the number of rows parsed so far
+        self.progress: Any = None
+        self.rows_output: Optional[int] = None
+        # Duplicate report of a completed job converted with a dedupe policy
+        self.duplicates: Optional[Dict[str, Any]] = None
+        # Distinct vehicles of a completed fitment job
+        self.vehicles: Optional[int] = None
+        self._rows_processed = 0
+        
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+    
+    @property
+    def rows_processed(self) -> int:
+        """Rows parsed so far; live while the job is running"""
+        if self.state == 'running' and self.progress is not None:
+            try:
+                return self.progress.value
+            except (OSError, EOFError):
+                # Progress lives in another process that has gone away
+                pass
+        return self._rows_processed
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Job status as a JSON-serializable dict
+        """
+        now = time.time()
+        status = {
+            'job_id': self.id,
+            'filename': self.filename,
+            'state': self.state,
+            'rows_processed': self.rows_processed,
+            'rows_output': self.rows_output,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'queued_seconds': round((self.started_at or now) - self.created_at, 3),
+            'elapsed_seconds': (
+                round((self.finished_at or now) - self.started_at, 3) if self.started_at else None
+            ),
+        }
+        if self.state == 'completed':
+            status['output_file'] = self.output_path.name
+        if self.duplicates is not None:
+            status['duplicates'] = self.duplicates
+        if self.vehicles is not None:
+            status['vehicles'] = self.vehicles
+        if self.error is not None:
+            status['error'] = self.error
+        return status
+    
+    def _mark_finished(self, state: str, rows_processed: int) -> None:
+        self.state = state
+        self._rows_processed = rows_processed
+        self.progress = None
+        self.finished_at = time.time()
+
+
+class JobQueue:
+    """
+    Runs conversion jobs with at most `max_concurrent` in flight.
+    
+    Jobs wait in a FIFO queue of at most `max_queued` entries; submitting to
+    a full queue raises JobQueueFull. Finished jobs are kept for status
+    polling, oldest evicted first beyond `max_finished`.
+    
+    Args:
+        runner: Coroutine function that converts a job and returns its row
+            counts ({'rows_processed': ..., 'rows_output': ...})
+    """
+    
+    def __init__(self, runner: Callable[[ConversionJob], Awaitable[Dict[str, int]]],
+                 max_concurrent: int = 2, max_queued: int = 500, max_finished: int = 1000):
+        self.runner = runner
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self._jobs: 'OrderedDict[str, ConversionJob]' = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+    
+    def submit(self, job: ConversionJob) -> ConversionJob:
+        """
+        Queue a job; must be called from the event loop
+        """
+        if self._queue is None:
+            self._start()
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFull(f"Job queue is full ({self.max_queued} jobs waiting)")
+        self._jobs[job.id] = job
+        return job
+    
+    def get(self, job_id: str) -> Optional[ConversionJob]:
+        """
+        Look up a job by id
+        """
+        return self._jobs.get(job_id)
+    
+    @property
+    def queued(self) -> int:
+        """Number of jobs waiting for a worker"""
+        return self._queue.qsize() if self._queue is not None else 0
+    
+    @property
+    def running(self) -> int:
+        """Number of jobs being converted"""
+        return sum(1 for job in self._jobs.values() if job.state == 'running')
+    
+    def unfinished(self) -> List[ConversionJob]:
+        """Jobs queued or running, whose uploads are still needed"""
+        return [job for job in self._jobs.values() if job.state in ('queued', 'running')]
+    
+    async def stop(self) -> None:
+        """
+        Cancel the workers; queued jobs are left unprocessed
+        """
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+    
+    def _start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.max_concurrent)]
+    
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.state = 'running'
+            job.started_at = time.time()
+            try:
+                counts = await self.runner(job)
+            except asyncio.CancelledError:
+                job.error = 'Cancelled'
+                job._mark_finished('failed', job.rows_processed)
+                raise
+            except Exception as e:
+                job.error = str(e)
+                job._mark_finished('failed', job.rows_processed)
+            else:
+                job.rows_output = counts['rows_output']
+                job.duplicates = counts.get('duplicates')
+                job.vehicles = counts.get('vehicles')
+                job._mark_finished('completed', counts['rows_processed'])
+            finally:
+                self._queue.task_done()
+            self._evict_finished()
+    
+    def _evict_finished(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
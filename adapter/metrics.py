@@ -0,0 +1,336 @@
+"""
+Metrics - Per-stage timing hooks and Prometheus-format conversion metrics
+
+StageTimings is handed to the parser and pipeline, which wrap each stage of
+a conversion in `timings.stage(name)`. When timing is off they get
+NO_TIMINGS instead, whose hooks do nothing, so an uninstrumented conversion
+pays one attribute lookup and an empty with-block per stage and chunk.
+"""
+import bisect
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+
+# Stages of a conversion, in pipeline order
+STAGES = ('upload', 'parse', 'standardize_columns', 'clean_data', 'transform', 'dedupe', 'write')
+
+# Histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+ROWS_PER_SECOND_BUCKETS = (1e3, 5e3, 1e4, 2.5e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6)
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(11))  # 1 KB to 1 GB
+
+
+class _Stage:
+    """
+    Context manager timing one run of a stage; see StageTimings.stage()
+    """
+    __slots__ = ('timings', 'name', 'start')
+    
+    def __init__(self, timings: 'StageTimings', name: str):
+        self.timings = timings
+        self.name = name
+    
+    def __enter__(self):
+        if self.timings.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.timings.add(self.name, time.perf_counter() - self.start)
+        if self.timings.memory:
+            self.timings.add_memory(self.name, tracemalloc.get_traced_memory()[1])
+        if exc is not None and getattr(exc, 'stage', None) is None:
+            # Tells error metrics where a conversion failed; survives pickling
+            # back from a worker process along with the exception
+            exc.stage = self.name
+        return False
+
+
+class StageTimings:
+    """
+    Wall time, and optionally peak traced memory, per conversion stage.
+    
+    Repeated runs of a stage (e.g. one per chunk) add up. Instances are
+    plain picklable objects, so a worker process can fill one in and send
+    it back with its result.
+    
+    Memory tracking uses tracemalloc, which slows conversions down noticeably
+    and is process-wide: stages of concurrent conversions in the same
+    process see each other's allocations.
+    
+    Usage:
+        timings = StageTimings()
+        with timings.stage('parse'):
+            df = parser.parse(path)
+        timings.seconds  # {'parse': 0.42}
+    """
+    
+    enabled = True
+    
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        self.seconds: Dict[str, float] = {}
+        self.peak_memory: Dict[str, int] = {}
+    
+    def stage(self, name: str) -> _Stage:
+        """
+        Context manager that adds the time spent in its block to stage `name`
+        """
+        return _Stage(self, name)
+    
+    def iterate(self, name: str, iterable: Iterable) -> Iterator:
+        """
+        Yield from an iterable, adding the time spent producing each item to stage `name`
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+    
+    def add(self, name: str, seconds: float) -> None:
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+    
+    def add_memory(self, name: str, peak_bytes: int) -> None:
+        self.peak_memory[name] = max(self.peak_memory.get(name, 0), peak_bytes)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Timings as a JSON-serializable dict: seconds per stage and their total,
+        plus peak_memory_mb per stage when memory is tracked
+        """
+        order = {name: i for i, name in enumerate(STAGES)}
+        names = sorted(self.seconds, key=lambda name: order.get(name, len(STAGES)))
+        timings: Dict[str, Any] = {name: round(self.seconds[name], 4) for name in names}
+        timings['total'] = round(sum(self.seconds.values()), 4)
+        if self.memory:
+            timings['peak_memory_mb'] = {
+                name: round(peak / 2**20, 2) for name, peak in self.peak_memory.items()
+            }
+        return timings
+
+
+class _NoTimings:
+    """
+    Stand-in for StageTimings when timing is disabled; every hook is a no-op
+    """
+    
+    enabled = False
+    memory = False
+    seconds: Dict[str, float] = {}
+    peak_memory: Dict[str, int] = {}
+    
+    _null = nullcontext()
+    
+    def stage(self, name: str):
+        return self._null
+    
+    def iterate(self, name: str, iterable: Iterable) -> Iterable:
+        return iterable
+    
+    def add(self, name: str, seconds: float) -> None:
+        pass
+    
+    def add_memory(self, name: str, peak_bytes: int) -> None:
+        pass
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {}
+
+
+NO_TIMINGS = _NoTimings()
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(names: Sequence[str], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    """
+    Base of the Prometheus metric types: a name, help text and label names
+    """
+    
+    kind = ''
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+    
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        if not self.labelnames:
+            self._values[()] = 0
+    
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        # Per label set: (count per bucket, sum of observations)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float]] = {}
+    
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * len(self.buckets), 0.0)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+    
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+    
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+                lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class ConversionMetrics:
+    """
+    Conversion metrics of one server process, rendered in the Prometheus
+    text exposition format by render().
+    
+    Usage (main.py wraps these calls in track_conversion() and observe_conversion()):
+        with metrics.track():
+            timings = StageTimings()
+            counts = convert_file(input_path, output_path, timings=timings)
+            metrics.observe(timings, counts['rows_processed'], bytes_in, bytes_out)
+    """
+    
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+    
+    def __init__(self, prefix: str = 'amazon_adapter'):
+        self.latency = Histogram(
+            f'{prefix}_conversion_duration_seconds', 'Wall time of a conversion, upload included'
+        )
+        self.stage_latency = Histogram(
+            f'{prefix}_stage_duration_seconds', 'Wall time spent in each conversion stage', ['stage']
+        )
+        self.rows_per_second = Histogram(
+            f'{prefix}_conversion_rows_per_second', 'Parsed rows per second of conversion time',
+            buckets=ROWS_PER_SECOND_BUCKETS
+        )
+        self.bytes_in = Histogram(
+            f'{prefix}_conversion_input_bytes', 'Size of converted uploads', buckets=BYTES_BUCKETS
+        )
+        self.bytes_out = Histogram(
+            f'{prefix}_conversion_output_bytes', 'Size of converted outputs', buckets=BYTES_BUCKETS
+        )
+        self.in_flight = Gauge(
+            f'{prefix}_conversions_in_flight', 'Conversions currently running'
+        )
+        self.errors = Counter(
+            f'{prefix}_conversion_errors_total', 'Failed conversions by the stage that failed', ['stage']
+        )
+        self._metrics = [
+            self.latency, self.stage_latency, self.rows_per_second,
+            self.bytes_in, self.bytes_out, self.in_flight, self.errors,
+        ]
+    
+    @contextmanager
+    def track(self):
+        """
+        Count a conversion as in flight, record its latency, and count it as
+        an error of the failing stage if it raises
+        """
+        self.in_flight.inc()
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            # The stage is set on the original error, which may since have been
+            # wrapped, e.g. in an HTTPException
+            stage = getattr(e, 'stage', None) or getattr(e.__context__, 'stage', None)
+            self.errors.inc(stage=stage or 'unknown')
+            raise
+        else:
+            self.latency.observe(time.perf_counter() - start)
+        finally:
+            self.in_flight.dec()
+    
+    def observe(self, timings: StageTimings, rows: int, bytes_in: int, bytes_out: int) -> None:
+        """
+        Record the stage timings, throughput and sizes of a finished conversion
+        """
+        for name, seconds in timings.seconds.items():
+            self.stage_latency.observe(seconds, stage=name)
+        conversion_seconds = sum(s for name, s in timings.seconds.items() if name != 'upload')
+        if rows and conversion_seconds > 0:
+            self.rows_per_second.observe(rows / conversion_seconds)
+        self.bytes_in.observe(bytes_in)
+        self.bytes_out.observe(bytes_out)
+    
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,441 @@
+"""
+Output writers - Write Amazon-formatted data incrementally, one chunk at a time
+
+Formats:
+- csv: comma-separated, the default
+- flatfile: Amazon's tab-delimited inventory flat file, with the three
+  template header rows Seller Central expects
+- parquet, feather: columnar copies for archiving and analytics
+"""
+import csv
+import gzip
+import io
+import os
+import uuid
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from pathlib import Path
+from typing import IO, Dict, Iterable, Iterator, Optional, Union
+
+from .amazon_transformer import MEASUREMENT_COLUMNS
+from .csv_parser import map_categories
+
+
+# Output compression codecs and the suffix each adds to the file name
+COMPRESSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+
+# Output formats and their file suffixes; only text formats can be compressed
+OUTPUT_FORMATS = {'csv': '.csv', 'flatfile': '.txt', 'parquet': '.parquet', 'feather': '.feather'}
+TEXT_FORMATS = ('csv', 'flatfile')
+
+# Flat file template settings; match them to the template downloaded from Seller Central
+FLAT_FILE_TEMPLATE_TYPE = os.environ.get('FLAT_FILE_TEMPLATE_TYPE', 'AutoAccessory')
+FLAT_FILE_VERSION = os.environ.get('FLAT_FILE_VERSION', '1.0')
+
+# Human-readable flat file labels (second template row); other columns get title-cased names
+FLAT_FILE_LABELS = {
+    'product-id': 'Product ID',
+    'product-id-type': 'Product ID Type',
+    'item-name': 'Product Name',
+    'brand-name': 'Brand Name',
+    'manufacturer': 'Manufacturer',
+    'product-description': 'Product Description',
+    'item-type': 'Item Type Keyword',
+    'standard-price': 'Standard Price',
+    'list-price': 'List Price',
+    'quantity': 'Quantity',
+    'product-tax-code': 'Product Tax Code',
+    'condition-type': 'Condition Type',
+    'part-number': 'Manufacturer Part Number',
+    'item-weight': 'Item Weight',
+    'item-length': 'Item Length',
+    'item-width': 'Item Width',
+    'item-height': 'Item Height',
+    'fulfillment-channel': 'Fulfillment Channel',
+    'update-delete': 'Update Delete',
+}
+
+# Tabs and line breaks cannot appear inside flat file values
+LINE_BREAKS = r'[\t\r\n]+'
+
+# Column compression inside Parquet and Feather files
+PARQUET_COMPRESSION = 'zstd'
+FEATHER_COMPRESSION = 'lz4'
+
+# gzip level 6 compresses converted catalogs about 15x at close to plain write speed
+GZIP_LEVEL = 6
+
+
+def compression_of(path: Union[str, Path]) -> Optional[str]:
+    """
+    Codec an output file is compressed with, going by its suffix, or None
+    """
+    suffix = Path(path).suffix
+    for compression, compressed_suffix in COMPRESSIONS.items():
+        if suffix == compressed_suffix:
+            return compression
+    return None
+
+
+def output_format_of(path: Union[str, Path]) -> Optional[str]:
+    """
+    Output format of a file, going by its suffix after any compression suffix, or None
+    """
+    path = Path(path)
+    if compression_of(path) is not None:
+        path = path.with_suffix('')
+    for output_format, suffix in OUTPUT_FORMATS.items():
+        if path.suffix == suffix:
+            return output_format
+    return None
+
+
+def open_output(path: Union[str, Path], compression: Optional[str] = None) -> IO[str]:
+    """
+    Open a text file for writing, compressed with gzip or zstd if given
+    """
+    if compression is None:
+        return open(path, 'w', newline='', encoding='utf-8')
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', compresslevel=GZIP_LEVEL, newline='', encoding='utf-8')
+    if compression == 'zstd':
+        return io.TextIOWrapper(pa.output_stream(str(path), compression='zstd'), newline='', encoding='utf-8')
+    raise ValueError(f"Unknown compression: {compression!r} (expected one of {', '.join(COMPRESSIONS)})")
+
+
+def iter_decompressed(path: Union[str, Path], compression: str,
+                      block_size: int = 1024 * 1024) -> Iterator[bytes]:
+    """
+    Yield the decompressed content of a compressed output file block by block
+    """
+    with pa.input_stream(str(path), compression=compression) as stream:
+        while block := stream.read(block_size):
+            yield block
+
+
+class OutputWriter:
+    """
+    Appends DataFrame chunks to one output file.
+    
+    Subclasses implement write(). Files written to a path are written under
+    a hidden temporary name and renamed into place by close(), so a reader
+    never sees a partial file; if the writer exits on an error, the partial
+    file is deleted and an existing file is left as it was. Streams are
+    written directly and left open.
+    
+    Usage:
+        with CSVOutputWriter(path) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+    """
+    
+    # Whether the output can be compressed with gzip or zstd
+    compressible = True
+    
+    def __init__(self, target: Union[str, Path, IO], compression: Optional[str] = None):
+        if compression is not None and compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression: {compression!r} (expected one of {', '.join(COMPRESSIONS)})")
+        if compression is not None and not self.compressible:
+            raise ValueError(f"{type(self).__name__} output cannot be compressed")
+        self.target = target
+        self.compression = compression
+        self.rows_written = 0
+        self._file = None
+        self._owns_file = False
+        self._tmp_path: Optional[Path] = None
+    
+    def write(self, df: pd.DataFrame) -> None:
+        """
+        Append a chunk to the output
+        """
+        raise NotImplementedError
+    
+    def write_all(self, chunks: Iterable[pd.DataFrame]) -> int:
+        """
+        Write every chunk of an iterable and return the number of rows written
+        """
+        for chunk in chunks:
+            self.write(chunk)
+        return self.rows_written
+    
+    def close(self) -> None:
+        """
+        Flush and close the output file if this writer opened it, moving it into place
+        """
+        if self._file is not None and self._owns_file:
+            self._file.close()
+            os.replace(self._tmp_path, self.target)
+        self._file = None
+    
+    def discard(self) -> None:
+        """
+        Close the output file if this writer opened it, deleting what was written
+        """
+        if self._file is not None and self._owns_file:
+            try:
+                self._file.close()
+            finally:
+                self._tmp_path.unlink(missing_ok=True)
+        self._file = None
+    
+    def _open(self) -> None:
+        if isinstance(self.target, (str, Path)):
+            # A new file rather than the existing one truncated: that may be a
+            # hard link shared with a cached result
+            target = Path(self.target)
+            self._tmp_path = target.with_name(f'.{target.name}.{uuid.uuid4().hex}.tmp')
+            if self.compressible:
+                self._file = open_output(self._tmp_path, self.compression)
+            else:
+                self._file = open(self._tmp_path, 'wb')
+            self._owns_file = True
+        else:
+            self._file = self.target
+    
+    def __enter__(self) -> 'OutputWriter':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class CSVOutputWriter(OutputWriter):
+    """
+    Appends DataFrame chunks to a single CSV file.
+    
+    The header is written with the first chunk only, so writing the chunks of
+    a DataFrame one after another gives the same file as writing it at once.
+    Whole-number measurements are written without a decimal point.
+    
+    Files written to a path can be compressed with compression='gzip' or
+    'zstd'; streams are written as they are.
+    """
+    
+    def __init__(self, target: Union[str, Path, IO[str]], compression: Optional[str] = None):
+        super().__init__(target, compression)
+        self._header_written = False
+    
+    def write(self, df: pd.DataFrame) -> None:
+        """
+        Append a chunk to the output
+        """
+        if self._file is None:
+            self._open()
+        _format_measurements(df).to_csv(self._file, index=False, header=not self._header_written)
+        self._header_written = True
+        self.rows_written += len(df)
+
+
+class FlatFileWriter(OutputWriter):
+    """
+    Appends DataFrame chunks to an Amazon inventory flat file.
+    
+    The file starts with the three rows of Amazon's templates: the template
+    type and version, human-readable labels, and the attribute names (the
+    DataFrame's columns). Values are tab-separated and never quoted, so tabs
+    and line breaks inside values are replaced with spaces.
+    """
+    
+    def __init__(self, target: Union[str, Path, IO[str]], compression: Optional[str] = None,
+                 template_type: str = FLAT_FILE_TEMPLATE_TYPE, version: str = FLAT_FILE_VERSION):
+        super().__init__(target, compression)
+        self.template_type = template_type
+        self.version = version
+        self._header_written = False
+    
+    def write(self, df: pd.DataFrame) -> None:
+        """
+        Append a chunk to the output
+        """
+        if self._file is None:
+            self._open()
+        if not self._header_written:
+            self._file.write(self._preamble(df.columns))
+            self._header_written = True
+        
+        text_columns = {
+            col: _single_line(df[col]) for col in df.columns
+            if df[col].dtype == object or isinstance(df[col].dtype, (pd.StringDtype, pd.CategoricalDtype))
+        }
+        _format_measurements(df).assign(**text_columns).to_csv(
+            self._file, sep='\t', index=False, header=False, quoting=csv.QUOTE_NONE
+        )
+        self.rows_written += len(df)
+    
+    def _preamble(self, columns: pd.Index) -> str:
+        rows = [
+            [f'TemplateType={self.template_type}', f'Version={self.version}',
+             'The top 3 rows are for Amazon.com use only. Do not modify or delete the top 3 rows.'],
+            [FLAT_FILE_LABELS.get(col, col.replace('-', ' ').title()) for col in columns],
+            list(columns),
+        ]
+        return ''.join('\t'.join(row) + '\n' for row in rows)
+
+
+def _format_measurements(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Write the whole numbers of MEASUREMENT_COLUMNS as integers, also in
+    chunks that mix them with fractions
+    """
+    columns = {}
+    for col in MEASUREMENT_COLUMNS:
+        if col not in df.columns or not pd.api.types.is_float_dtype(df[col]):
+            continue
+        numbers = df[col].to_numpy(dtype='float64', na_value=np.nan)
+        # NaN compares unequal, so missing values stay missing
+        whole = (np.abs(numbers) < 2 ** 53) & (numbers == np.floor(numbers))
+        if whole.any():
+            values = df[col].astype(object)
+            values[whole] = numbers[whole].astype(np.int64).tolist()
+            columns[col] = values
+    return df.assign(**columns) if columns else df
+
+
+def _single_line(values: pd.Series) -> pd.Series:
+    """
+    Replace tabs and line breaks in a text column with single spaces
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return map_categories(values, _single_line)
+    try:
+        array = pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed-type column; only strings could hold line breaks
+        return values
+    if not (pa.types.is_string(array.type) or pa.types.is_large_string(array.type)):
+        return values
+    if not pc.any(pc.match_substring_regex(array, LINE_BREAKS)).as_py():
+        return values
+    cleaned = pc.replace_substring_regex(array, LINE_BREAKS, ' ').to_pandas()
+    return pd.Series(cleaned.to_numpy(), index=values.index, name=values.name).astype(values.dtype)
+
+
+def _arrow_table(df: pd.DataFrame) -> pa.Table:
+    """
+    Convert a chunk to an Arrow table with plain column types
+    
+    Categoricals are decoded and Arrow-backed strings narrowed to `string`,
+    so that every chunk of a conversion has the same schema. Columns with
+    no values at all are typed as strings, and measurements as floats even
+    in chunks where they are all whole.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    columns = []
+    for name, column in zip(table.column_names, table.columns):
+        if name in MEASUREMENT_COLUMNS and pa.types.is_integer(column.type):
+            column = column.cast(pa.float64())
+        if pa.types.is_dictionary(column.type):
+            column = column.cast(column.type.value_type)
+        if pa.types.is_large_string(column.type) or pa.types.is_null(column.type):
+            column = column.cast(pa.string())
+        columns.append(column)
+    return pa.table(columns, names=table.column_names)
+
+
+class _ArrowOutputWriter(OutputWriter):
+    """
+    Base of the columnar writers: converts each chunk to Arrow and casts it
+    to the schema of the first non-empty chunk
+    """
+    
+    compressible = False
+    
+    def __init__(self, target: Union[str, Path, IO[bytes]], compression: Optional[str] = None):
+        super().__init__(target, compression)
+        self._writer = None
+        self._schema: Optional[pa.Schema] = None
+        # Schema of an empty chunk, used if no chunk has any rows
+        self._empty_schema: Optional[pa.Schema] = None
+    
+    def write(self, df: pd.DataFrame) -> None:
+        """
+        Append a chunk to the output
+        """
+        table = _arrow_table(df)
+        if self._writer is None:
+            if len(table) == 0:
+                # Empty chunks type their columns as strings; wait for data
+                self._empty_schema = self._empty_schema or table.schema
+                return
+            self._open()
+            self._schema = table.schema
+            self._writer = self._new_writer(self._file, self._schema)
+        elif table.schema != self._schema:
+            table = table.select(self._schema.names).cast(self._schema)
+        self._writer.write_table(table)
+        self.rows_written += len(table)
+    
+    def close(self) -> None:
+        """
+        Finish the file and close it if this writer opened it
+        """
+        if self._writer is None and self._empty_schema is not None:
+            self._open()
+            self._writer = self._new_writer(self._file, self._empty_schema)
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        super().close()
+    
+    def discard(self) -> None:
+        """
+        Stop writing, deleting what was written
+        """
+        try:
+            if self._writer is not None:
+                self._writer.close()
+        finally:
+            self._writer = None
+            super().discard()
+    
+    def _new_writer(self, sink, schema: pa.Schema):
+        raise NotImplementedError
+
+
+class ParquetOutputWriter(_ArrowOutputWriter):
+    """
+    Appends DataFrame chunks to a Parquet file, one row group per chunk
+    """
+    
+    def _new_writer(self, sink, schema: pa.Schema):
+        return pq.ParquetWriter(sink, schema, compression=PARQUET_COMPRESSION)
+
+
+class FeatherOutputWriter(_ArrowOutputWriter):
+    """
+    Appends DataFrame chunks to a Feather (Arrow IPC) file, one record batch per chunk
+    """
+    
+    def _new_writer(self, sink, schema: pa.Schema):
+        options = pa.ipc.IpcWriteOptions(compression=FEATHER_COMPRESSION)
+        return pa.ipc.new_file(sink, schema, options=options)
+
+
+WRITERS: Dict[str, type] = {
+    'csv': CSVOutputWriter,
+    'flatfile': FlatFileWriter,
+    'parquet': ParquetOutputWriter,
+    'feather': FeatherOutputWriter,
+}
+
+
+def create_writer(output_format: str, target: Union[str, Path, IO],
+                  compression: Optional[str] = None) -> OutputWriter:
+    """
+    Create the writer for an output format
+    
+    Args:
+        output_format: One of OUTPUT_FORMATS
+        target: Output path or file object (text for csv and flatfile,
+            binary for parquet and feather)
+        compression: 'gzip' or 'zstd'; text formats only
+    """
+    if output_format not in WRITERS:
+        raise ValueError(f"Unknown output format: {output_format!r} (expected one of {', '.join(WRITERS)})")
+    return WRITERS[output_format](target, compression)
@@ -0,0 +1,194 @@
+"""
+Parallel transform - Runs AmazonTransformer over row ranges on worker processes
+
+Partitions travel between processes as Arrow IPC streams in shared memory
+rather than as pickles: the sender writes the stream straight into a
+shared-memory block, and the receiver reads it in place instead of reading
+and unpickling it from a pipe.
+
+convert_file() uses transform_partitioned() for each chunk when given
+workers > 1, as the command-line converter does for its spare workers.
+"""
+import math
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from .amazon_transformer import MEASUREMENT_COLUMNS, AmazonTransformer, whole_numbers
+
+
+# Smallest partition worth sending to another process; handing a partition
+# and its result over costs about half as much as transforming it
+MIN_PARTITION_ROWS = 10_000
+
+
+class SharedFrame:
+    """
+    Handle to a DataFrame stored as an Arrow IPC stream in shared memory.
+    
+    Only the block name and size are pickled when a handle is sent to another
+    process. The receiver calls load(); whoever loads it last calls unlink().
+    """
+    
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+    
+    @classmethod
+    def create(cls, df: pd.DataFrame) -> 'SharedFrame':
+        """
+        Copy a DataFrame into a new shared-memory block
+        """
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        
+        # Measure the stream first so the block can be sized exactly
+        sink = pa.MockOutputStream()
+        cls._write_table(sink, table)
+        
+        shm = SharedMemory(create=True, size=max(sink.size(), 1))
+        try:
+            buffer = pa.py_buffer(shm.buf)
+            cls._write_table(pa.FixedSizeBufferWriter(buffer), table)
+            del buffer
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        shm.close()
+        
+        return cls(shm.name, sink.size())
+    
+    def load(self) -> pd.DataFrame:
+        """
+        Read the DataFrame back from shared memory, without copying the stream
+        
+        Columns that to_pandas() does not convert keep pointing into the
+        block, which stays mapped until the last of them is freed, even
+        after unlink().
+        """
+        shm = SharedMemory(name=self.name)
+        # The Arrow buffer holds a reference to shm rather than an export of
+        # shm.buf, so the mapping is closed when the buffer is freed
+        address = np.frombuffer(shm.buf, dtype=np.uint8).ctypes.data
+        data = pa.foreign_buffer(address, self.size, base=shm)
+        return pa.ipc.open_stream(data).read_all().to_pandas()
+    
+    def unlink(self) -> None:
+        """
+        Free the shared-memory block
+        """
+        shm = SharedMemory(name=self.name)
+        shm.close()
+        shm.unlink()
+    
+    @staticmethod
+    def _write_table(sink, table: pa.Table) -> None:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def _share(df: pd.DataFrame) -> Union[SharedFrame, pd.DataFrame]:
+    """
+    Put a frame in shared memory, falling back to the frame itself (pickled)
+    when it holds values Arrow cannot represent, e.g. mixed-type object columns
+    """
+    try:
+        return SharedFrame.create(df)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return df
+
+
+def _receive(frame: Union[SharedFrame, pd.DataFrame]) -> pd.DataFrame:
+    if isinstance(frame, SharedFrame):
+        try:
+            return frame.load()
+        finally:
+            frame.unlink()
+    return frame
+
+
+def _discard(shared: list, futures: list) -> None:
+    """
+    Free the shared-memory blocks of an aborted run
+    """
+    for future in futures:
+        future.cancel()
+    blocks = [frame for frame in shared if isinstance(frame, SharedFrame)]
+    for future in futures:
+        if not future.cancelled() and future.exception() is None:
+            blocks.append(future.result())
+    for frame in blocks:
+        if isinstance(frame, SharedFrame):
+            try:
+                frame.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _transform_partition(frame: Union[SharedFrame, pd.DataFrame]) -> Union[SharedFrame, pd.DataFrame]:
+    """
+    Worker task: transform one partition and hand the result back
+    """
+    return _share(AmazonTransformer().transform(_receive(frame)))
+
+
+def transform_partitioned(df: pd.DataFrame, workers: Optional[int] = None,
+                          executor: Optional[Executor] = None,
+                          min_partition_rows: int = MIN_PARTITION_ROWS) -> pd.DataFrame:
+    """
+    Transform a parsed DataFrame on several worker processes
+    
+    The frame is split into contiguous row ranges, one per worker, and the
+    results are concatenated in the original order. Integer row labels
+    travel with each partition, and any other index is numbered by position
+    across the whole frame, so AUTO-PART-{index} SKUs are numbered exactly as
+    AmazonTransformer.transform numbers them on the whole frame.
+    
+    Args:
+        df: Input DataFrame with standardized columns
+        workers: Number of partitions/processes (defaults to one per CPU core)
+        executor: Process pool to run on; a temporary one is created if omitted
+        min_partition_rows: Frames smaller than two partitions of this size
+            are transformed in the calling process
+    
+    Returns:
+        DataFrame in Amazon upload format
+    """
+    workers = workers or os.cpu_count() or 1
+    partitions = min(workers, math.ceil(len(df) / max(min_partition_rows, 1)))
+    if partitions <= 1:
+        return AmazonTransformer().transform(df)
+    
+    index = df.index
+    if not pd.api.types.is_integer_dtype(index):
+        # transform() numbers such rows by position, which each partition would restart at 0
+        df = df.reset_index(drop=True)
+    
+    bounds = np.linspace(0, len(df), partitions + 1).astype(int)
+    
+    pool = executor or ProcessPoolExecutor(max_workers=partitions)
+    shared = []
+    futures = []
+    try:
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            shared.append(_share(df.iloc[start:stop]))
+        futures = [pool.submit(_transform_partition, frame) for frame in shared]
+        results = [_receive(future.result()) for future in futures]
+    except BaseException:
+        _discard(shared, futures)
+        raise
+    finally:
+        if executor is None:
+            pool.shutdown()
+    
+    result = pd.concat(results)
+    result.index = index
+    for col in MEASUREMENT_COLUMNS:
+        # Int64 and float64 partitions concatenate to Float64
+        result[col] = whole_numbers(result[col])
+    return result
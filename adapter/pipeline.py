@@ -0,0 +1,255 @@
+"""
+Conversion pipeline - Converts a CSV or Excel file on disk to an Amazon-formatted file
+
+The functions here only take and return picklable values, so they can be
+submitted to a ProcessPoolExecutor as well as called directly.
+"""
+import io
+import os
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from .csv_parser import AutoPartsParser, DEFAULT_CHUNKSIZE
+from .excel_reader import Sheet
+from .amazon_transformer import AmazonTransformer, PLACEHOLDER_SKU_PREFIX
+from .output_writer import CSVOutputWriter, create_writer
+from .dedup import KEY_COLUMNS, DuplicateIndex
+from .delta import DeltaIndex, DeltaTracker
+from .metrics import NO_TIMINGS, StageTimings
+from .parallel import transform_partitioned
+
+
+def convert_file(input_path: Path, output_path: Path, chunksize: int = DEFAULT_CHUNKSIZE,
+                 progress: Any = None, delta: Optional[DeltaIndex] = None,
+                 engine: str = 'c', timings: Optional[StageTimings] = None,
+                 compression: Optional[str] = None, output_format: str = 'csv',
+                 sheet: Optional[Sheet] = None, dedupe: Optional[str] = None,
+                 fitment: bool = False, workers: int = 1) -> Dict[str, Any]:
+    """
+    Parse, transform and write a catalog chunk by chunk
+    
+    With dedupe set, the chunks are written to a Parquet part in the
+    temporary directory first, and merge_files() writes the output from it with each
+    product-id listed once.
+    
+    Args:
+        input_path: Path to the source CSV or Excel workbook
+        output_path: Path the Amazon-formatted output is written to, or a
+            file object (text for csv and flatfile, binary otherwise)
+        chunksize: Rows per chunk
+        progress: Optional object whose `value` is set to the number of rows
+            parsed after each chunk, e.g. a multiprocessing.Manager().Value
+        delta: Feed index for delta mode; only new, changed and deleted
+            listings are written, flagged in an update-delete column, and the
+            index is updated once the output is complete
+        engine: Parser engine, 'c' or 'pyarrow' (see AutoPartsParser)
+        timings: Collects the time spent in each stage (parse,
+            standardize_columns, clean_data, transform, write)
+        compression: Compress the output with 'gzip' or 'zstd' (see COMPRESSIONS)
+        output_format: 'csv', 'flatfile', 'parquet' or 'feather' (see OUTPUT_FORMATS)
+        sheet: Worksheet of an Excel input, by name or 0-based position
+        dedupe: Policy for repeated product ids (see DEDUPE_POLICIES); by
+            default they are written as they are
+        fitment: Write the vehicle fitment of the listings instead, one row
+            per product id and vehicle (see FitmentTable); not in delta or
+            dedupe mode
+        workers: Processes each chunk's transform is split across (see
+            transform_partitioned); chunks of fewer than two partitions of
+            MIN_PARTITION_ROWS rows, and fitment, are transformed in this process
+    
+    Returns:
+        Row counts: rows_processed (parsed rows) and rows_output (written rows),
+        plus rows_new, rows_changed, rows_unchanged and rows_deleted in delta mode.
+        With dedupe, the DuplicateIndex report is returned under 'duplicates'.
+        With fitment, rows_output counts fitment rows, and 'vehicles' the
+        distinct vehicles among them.
+        If timings were passed, the filled-in StageTimings is returned under
+        'timings'; when run on a worker process it is a copy of the one passed.
+    """
+    if fitment and (delta is not None or dedupe is not None):
+        raise ValueError('Fitment files cannot be written in delta or dedupe mode')
+    if dedupe is not None:
+        # Staged outside the output directory, where it could be downloaded or evicted mid-conversion
+        part_path = Path(tempfile.gettempdir()) / f'{uuid.uuid4().hex}.part.parquet'
+        try:
+            counts = convert_file(input_path, part_path, chunksize, progress, delta, engine, timings,
+                                  None, 'parquet', sheet, workers=workers)
+            merged = merge_files([part_path], output_path, compression, output_format, chunksize, dedupe, timings)
+        finally:
+            part_path.unlink(missing_ok=True)
+        counts.update(rows_output=merged['rows_output'], duplicates=merged['duplicates'])
+        return counts
+    
+    hooks = timings or NO_TIMINGS
+    parser = AutoPartsParser(engine=engine, timings=hooks, sheet=sheet)
+    transformer = AmazonTransformer()
+    tracker = DeltaTracker(delta, transformer) if delta is not None else None
+    
+    rows_processed = 0
+    columns = list(transformer.transform(parser.parse_header(Path(input_path))).columns)
+    parallel = ProcessPoolExecutor(max_workers=workers) if workers > 1 and not fitment else nullcontext()
+    with parallel as pool, create_writer(output_format, output_path, compression) as writer:
+        if fitment:
+            # Gives the header even if no row has any fitment
+            writer.write(transformer.fitment.listing([], []))
+        for df in parser.parse_chunks(Path(input_path), chunksize=chunksize):
+            rows_processed += len(df)
+            if fitment:
+                # At most chunksize fitment rows are held at a time, however many vehicles a part fits
+                for fitment_df in hooks.iterate('transform', transformer.transform_fitment(df, chunksize)):
+                    with hooks.stage('write'):
+                        writer.write(fitment_df)
+            else:
+                with hooks.stage('transform'):
+                    if tracker is not None:
+                        # Unchanged rows are dropped before they are transformed
+                        df = tracker.filter(df)
+                    if pool is not None:
+                        amazon_df = transform_partitioned(df, workers, pool)
+                    else:
+                        amazon_df = transformer.transform(df)
+                    if tracker is not None:
+                        amazon_df = tracker.mark(amazon_df)
+                with hooks.stage('write'):
+                    writer.write(amazon_df)
+            if progress is not None:
+                progress.value = rows_processed
+        
+        if tracker is not None:
+            with hooks.stage('write'):
+                writer.write(tracker.deletions(columns + ['update-delete']))
+    
+    counts = {
+        'rows_processed': rows_processed,
+        'rows_output': writer.rows_written,
+    }
+    if tracker is not None:
+        tracker.commit()
+        counts.update(tracker.counts)
+    if fitment:
+        counts['vehicles'] = len(transformer.fitment)
+    if hooks.enabled:
+        counts['timings'] = hooks
+    
+    return counts
+
+
+def iter_converted_csv(input_path: Path, chunksize: int = DEFAULT_CHUNKSIZE,
+                       engine: str = 'c', sheet: Optional[Sheet] = None) -> Iterator[str]:
+    """
+    Convert a catalog lazily, yielding the Amazon-formatted CSV piece by piece
+    
+    The header is yielded as soon as the source header has been read, then
+    one block of rows per transformed chunk. Nothing is written to disk.
+    
+    Args:
+        input_path: Path to the source CSV or Excel workbook
+        chunksize: Rows per chunk
+        engine: Parser engine, 'c' or 'pyarrow' (see AutoPartsParser)
+        sheet: Worksheet of an Excel input, by name or 0-based position
+    
+    Yields:
+        CSV text; concatenated, the same file convert_file() writes
+    """
+    parser = AutoPartsParser(engine=engine, sheet=sheet)
+    transformer = AmazonTransformer()
+    buffer = io.StringIO()
+    writer = CSVOutputWriter(buffer)
+    
+    def flush() -> str:
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+    
+    writer.write(transformer.transform(parser.parse_header(Path(input_path))))
+    yield flush()
+    
+    for df in parser.parse_chunks(Path(input_path), chunksize=chunksize):
+        writer.write(transformer.transform(df))
+        yield flush()
+
+
+def merge_files(part_paths: List[Path], output_path: Path, compression: Optional[str] = None,
+                output_format: str = 'csv', chunksize: int = DEFAULT_CHUNKSIZE, policy: str = 'first',
+                timings: Optional[StageTimings] = None) -> Dict[str, Any]:
+    """
+    Merge converted catalogs into one feed with each product-id listed once
+    
+    The parts are Parquet files written by convert_file(), merged in the
+    order given, so with the 'first' policy a listing repeated across files
+    comes from the earliest file. Duplicates are found by a DuplicateIndex
+    over the key columns alone before any rows are read. When several parts
+    are merged, placeholder SKUs (numbered per file) are renumbered by their
+    position in the merged feed.
+    
+    Args:
+        part_paths: Parquet outputs of convert_file(), in merge order
+        output_path: Path the merged feed is written to
+        compression: Compress the output with 'gzip' or 'zstd' (see COMPRESSIONS)
+        output_format: 'csv', 'flatfile', 'parquet' or 'feather' (see OUTPUT_FORMATS)
+        chunksize: Rows read from a part at a time
+        policy: How repeated product ids are combined (see DEDUPE_POLICIES)
+        timings: Collects the time spent in the dedupe and write stages
+    
+    Returns:
+        rows_output and rows_duplicate in total and per part (under 'parts'),
+        and the DuplicateIndex report under 'duplicates'
+    """
+    hooks = timings or NO_TIMINGS
+    with hooks.stage('dedupe'):
+        keys = pd.concat(
+            [pq.read_table(path, columns=KEY_COLUMNS).to_pandas() for path in part_paths], ignore_index=True
+        )
+        index = DuplicateIndex(keys, policy)
+    renumber_placeholders = len(part_paths) > 1 and index.placeholder.any()
+    
+    parts = []
+    offset = 0
+    with hooks.stage('write'), create_writer(output_format, output_path, compression) as writer:
+        # Gives the header even if no part has any rows
+        writer.write(pq.read_schema(part_paths[0]).empty_table().to_pandas())
+        for path in part_paths:
+            rows_before = writer.rows_written
+            rows_read = 0
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+                rows = slice(offset + rows_read, offset + rows_read + len(batch))
+                rows_read += len(batch)
+                df = index.apply(batch.to_pandas(), rows)
+                
+                renumber = index.placeholder[rows][index.keep[rows]]
+                if renumber_placeholders and renumber.any():
+                    numbers = pd.Series(
+                        range(writer.rows_written, writer.rows_written + len(df)), index=df.index
+                    ).astype(str).str.zfill(6)
+                    df = df.assign(**{'product-id': df['product-id'].where(~renumber, PLACEHOLDER_SKU_PREFIX + numbers)})
+                writer.write(df)
+            offset += rows_read
+            parts.append({
+                'rows_output': writer.rows_written - rows_before,
+                'rows_duplicate': rows_read - (writer.rows_written - rows_before),
+            })
+    
+    return {
+        'rows_output': writer.rows_written,
+        'rows_duplicate': index.rows_removed,
+        'parts': parts,
+        'duplicates': index.report(),
+    }
+
+
+def warm_up() -> int:
+    """
+    No-op task used to start pool workers ahead of the first conversion
+    
+    Returns:
+        The worker's process id
+    """
+    return os.getpid()
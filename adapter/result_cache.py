@@ -0,0 +1,143 @@
+"""
+Result cache - On-disk LRU cache of converted outputs keyed by upload content
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+
+# Modules whose source determines the converted output
+CONVERSION_MODULES = (
+    'csv_parser.py', 'excel_reader.py', 'amazon_transformer.py', 'fitment.py', 'dedup.py',
+    'output_writer.py', 'pipeline.py',
+)
+
+
+def conversion_version() -> str:
+    """
+    Fingerprint of the conversion code
+    
+    Changes whenever the parser, transformer or writer source changes, or
+    pandas or pyarrow is upgraded, so cached results from older code are
+    never served.
+    """
+    digest = hashlib.sha256(pd.__version__.encode('utf-8'))
+    digest.update(pa.__version__.encode('utf-8'))
+    package_dir = Path(__file__).parent
+    for module in CONVERSION_MODULES:
+        digest.update((package_dir / module).read_bytes())
+    return digest.hexdigest()
+
+
+def link_or_copy(source: Path, target: Path) -> None:
+    """
+    Hard-link source to target, copying when the filesystem cannot link
+    
+    The target is replaced atomically if it already exists.
+    """
+    tmp_path = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, target)
+    finally:
+        # Left behind on error, or when target already was a link to source
+        tmp_path.unlink(missing_ok=True)
+
+
+class ResultCache:
+    """
+    Stores converted files under `directory`, keyed by the SHA-256 of the
+    upload, the conversion options and the conversion code version.
+    
+    Each entry is a data file plus a small JSON metadata file. Reading an
+    entry marks it as recently used; once the data files exceed `max_bytes`,
+    the least recently used entries are evicted.
+    """
+    
+    def __init__(self, directory: Path, max_bytes: int, version: Optional[str] = None):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.version = version or conversion_version()
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+    
+    def key(self, content_hash: str, **options: Any) -> str:
+        """
+        Cache key for an upload's SHA-256 hex digest and conversion options
+        """
+        material = json.dumps(
+            {'version': self.version, 'content': content_hash, 'options': options},
+            sort_keys=True,
+        )
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[Tuple[Path, Dict[str, Any]]]:
+        """
+        Look up an entry and mark it as recently used
+        
+        Returns:
+            (data file path, metadata) or None on a miss
+        """
+        if not self.enabled:
+            return None
+        
+        data_path, meta_path = self._paths(key)
+        with self._lock:
+            try:
+                metadata = json.loads(meta_path.read_text(encoding='utf-8'))
+                os.utime(data_path)
+            except (OSError, ValueError):
+                return None
+        return data_path, metadata
+    
+    def put(self, key: str, source: Path, metadata: Dict[str, Any]) -> None:
+        """
+        Add a converted file to the cache and evict old entries if over the size cap
+        """
+        if not self.enabled:
+            return
+        
+        data_path, meta_path = self._paths(key)
+        
+        with self._lock:
+            link_or_copy(source, data_path)
+            meta_path.write_text(json.dumps(metadata), encoding='utf-8')
+            self._evict()
+    
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        return self.directory / f"{key}.data", self.directory / f"{key}.json"
+    
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.data'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.name[:-len('.data')]))
+                    total += stat.st_size
+        
+        # Least recently used first
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for path in self._paths(key):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+            total -= size
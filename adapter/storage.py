@@ -0,0 +1,112 @@
+"""
+Storage janitor - Keeps the service's output and upload directories bounded
+
+Converted files are kept for /download and uploads are deleted once
+converted, but both pile up on a long-running node: outputs nobody
+downloads, and uploads left behind by interrupted conversions. A
+StorageJanitor sweeps one directory by age and by total size.
+"""
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+
+def directory_usage(directory: Path) -> Dict[str, int]:
+    """
+    Number and total size of the files directly in a directory
+    """
+    files = size = 0
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_file(follow_symlinks=False):
+                files += 1
+                size += entry.stat(follow_symlinks=False).st_size
+    return {'files': files, 'bytes': size}
+
+
+class StorageJanitor:
+    """
+    Deletes the files of `directory` that outlived their time-to-live or
+    do not fit in its size budget.
+    
+    A sweep first deletes the files not modified for `ttl` seconds, then,
+    while the remaining files add up to more than `max_bytes`, the least
+    recently modified ones. Only files directly in the directory are swept,
+    so subdirectories such as the result cache (which has its own budget)
+    are left alone. Hidden files are outputs still being written (see
+    OutputWriter); they only expire by age, which a file being written
+    never reaches.
+    
+    Args:
+        directory: Directory to sweep
+        ttl: Seconds a file is kept after it was last modified; 0 or None keeps files forever
+        max_bytes: Total size of the directory's files; 0 or None for no limit
+    """
+    
+    def __init__(self, directory: Path, ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        self.directory = Path(directory)
+        self.ttl = ttl or None
+        self.max_bytes = max_bytes or None
+    
+    def sweep(self, keep: Iterable[Path] = (), now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Delete expired files, then the oldest files beyond the size budget
+        
+        Args:
+            keep: Files in use (e.g. the uploads of queued jobs), never deleted
+            now: Current time, for tests
+        
+        Returns:
+            files_removed and bytes_removed
+        """
+        now = time.time() if now is None else now
+        keep = {Path(path).name for path in keep}
+        
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file(follow_symlinks=False) and entry.name not in keep:
+                    stat = entry.stat(follow_symlinks=False)
+                    entries.append((stat.st_mtime, stat.st_size, entry.name))
+        total = sum(size for _, size, _ in entries)
+        
+        removed = {'files_removed': 0, 'bytes_removed': 0}
+        
+        def remove(name: str, size: int) -> None:
+            try:
+                (self.directory / name).unlink()
+            except FileNotFoundError:
+                return
+            removed['files_removed'] += 1
+            removed['bytes_removed'] += size
+        
+        # Oldest first
+        entries.sort()
+        remaining = []
+        for mtime, size, name in entries:
+            if self.ttl is not None and now - mtime > self.ttl:
+                remove(name, size)
+                total -= size
+            else:
+                remaining.append((mtime, size, name))
+        
+        if self.max_bytes is not None:
+            for _, size, name in remaining:
+                if total <= self.max_bytes:
+                    break
+                if not name.startswith('.'):
+                    remove(name, size)
+                    total -= size
+        
+        return removed
+    
+    def usage(self) -> Dict[str, Any]:
+        """
+        The directory's files, their total size and the janitor's limits, as a JSON-serializable dict
+        """
+        return {
+            **directory_usage(self.directory),
+            'ttl_seconds': self.ttl,
+            'max_bytes': self.max_bytes,
+        }
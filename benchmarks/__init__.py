@@ -0,0 +1,3 @@
+"""
+Benchmarks - Synthetic catalogs and per-stage timings for the conversion pipeline
+"""
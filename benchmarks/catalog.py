@@ -0,0 +1,160 @@
+"""
+Synthetic catalog generator - Seeded AutoZone-style CSVs for benchmarking
+
+Rows follow sample_autozone.csv: the same columns, brands, categories and
+vehicles, with the mess real supplier exports have: missing UPCs and part
+numbers, fitment gaps, prices with currency symbols and thousands
+separators, weights with units and free-form condition values.
+
+Usage:
+    python -m benchmarks.catalog 100000 --seed 42 > catalog.csv
+"""
+import argparse
+import sys
+from pathlib import Path
+from typing import IO, Union
+
+import numpy as np
+import pandas as pd
+
+
+COLUMNS = [
+    'Part Number', 'Description', 'Brand', 'Price', 'Quantity', 'Category', 'UPC',
+    'Weight', 'Length', 'Width', 'Height', 'Year', 'Make', 'Model', 'Condition',
+]
+
+# Category -> (part number prefix, descriptions)
+CATEGORIES = {
+    'Brakes': ('BRK', ['Brake Pad Set - Ceramic Front', 'Brake Rotor - Rear', 'Brake Caliper - Front Left']),
+    'Filters': ('FLT', ['Engine Air Filter', 'Oil Filter', 'Cabin Air Filter']),
+    'Oils & Fluids': ('OIL', ['Synthetic Motor Oil 5W-30 - 5 Quart', 'Power Steering Fluid - 32oz']),
+    'Ignition': ('SPK', ['Iridium Spark Plugs (Set of 4)', 'Ignition Coil']),
+    'Batteries': ('BAT', ['Automotive Battery 800 CCA']),
+    'Wipers': ('WPR', ['Premium Windshield Wiper Blade Set']),
+    'Electrical': ('ALT', ['Alternator 130 Amp', 'Starter Motor']),
+    'Tires': ('TIR', ['All-Season Tire P215/60R16']),
+    'Cooling': ('RDT', ['Radiator - Aluminum', 'Thermostat with Gasket']),
+}
+
+BRANDS = [
+    'AutoZone', 'K&N', 'Mobil 1', 'NGK', 'DieHard', 'Bosch', 'Duralast',
+    'Goodyear', 'Lucas Oil', 'Spectra Premium',
+]
+
+VEHICLES = [
+    ('Toyota', 'Camry'), ('Honda', 'Civic'), ('Ford', 'F-150'), ('Chevrolet', 'Silverado'),
+    ('Nissan', 'Altima'), ('Mazda', 'CX-5'), ('Jeep', 'Wrangler'), ('Subaru', 'Outback'),
+]
+
+CONDITIONS = ['New', 'New', 'New', 'new', 'Used', 'Pre-Owned', 'Refurbished', 'Rebuilt', '']
+
+# Share of rows with each kind of gap or mess
+MISSING_UPC = 0.3
+MISSING_PART_NUMBER = 0.1
+MISSING_FITMENT = 0.4
+MESSY_PRICE = 0.2
+WEIGHT_WITH_UNIT = 0.15
+
+
+def generate_catalog(rows: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Build a synthetic catalog as raw CSV text columns
+    
+    Args:
+        rows: Number of rows
+        seed: Random seed; the same seed always gives the same catalog
+    
+    Returns:
+        DataFrame with the source columns of sample_autozone.csv, all strings
+    """
+    rng = np.random.default_rng(seed)
+    
+    def choose(values, size=rows):
+        return np.asarray(values, dtype=object)[rng.integers(0, len(values), size)]
+    
+    def blank(values, share):
+        values = values.astype(object)
+        values[rng.random(rows) < share] = ''
+        return values
+    
+    categories = list(CATEGORIES)
+    category_codes = rng.integers(0, len(categories), rows)
+    category = np.asarray(categories, dtype=object)[category_codes]
+    prefixes = np.asarray([CATEGORIES[c][0] for c in categories], dtype=object)[category_codes]
+    # Each category's descriptions, cycled to a fixed width so they can be indexed together
+    description_table = np.asarray([
+        [CATEGORIES[c][1][k % len(CATEGORIES[c][1])] for k in range(6)] for c in categories
+    ], dtype=object)
+    descriptions = description_table[category_codes, rng.integers(0, 6, rows)]
+    
+    part_numbers = prefixes + '-' + pd.Series(rng.integers(0, 1_000_000, rows)).astype(str).str.zfill(6).to_numpy()
+    
+    prices = rng.gamma(2.0, 40.0, rows).round(2) + 0.99
+    price_text = pd.Series(prices).map('{:.2f}'.format).to_numpy(dtype=object)
+    messy = rng.random(rows) < MESSY_PRICE
+    styles = rng.integers(0, 4, rows)
+    price_text = np.where(messy & (styles == 0), '$' + price_text, price_text)
+    price_text = np.where(
+        messy & (styles == 1), pd.Series(prices * 12).map('${:,.2f}'.format).to_numpy(dtype=object), price_text
+    )
+    price_text = np.where(messy & (styles == 2), ' ' + price_text + ' ', price_text)
+    price_text = np.where(messy & (styles == 3), '', price_text)
+    
+    upcs = pd.Series(rng.integers(0, 10**11, rows)).astype(str).str.zfill(12).to_numpy()
+    
+    weights = (rng.gamma(2.0, 3.0, rows) + 0.1).round(1)
+    weight_text = pd.Series(weights).astype(str).to_numpy(dtype=object)
+    with_unit = rng.random(rows) < WEIGHT_WITH_UNIT
+    units = choose([' lbs', 'lb', ' oz', ' kg'])
+    weight_text = np.where(with_unit, weight_text + units, weight_text)
+    
+    vehicle_codes = rng.integers(0, len(VEHICLES), rows)
+    makes = np.asarray([make for make, _ in VEHICLES], dtype=object)[vehicle_codes]
+    models = np.asarray([model for _, model in VEHICLES], dtype=object)[vehicle_codes]
+    years = rng.integers(2005, 2025, rows).astype(str).astype(object)
+    no_fitment = rng.random(rows) < MISSING_FITMENT
+    years[no_fitment] = ''
+    makes[no_fitment] = ''
+    models[no_fitment] = 'Any'
+    
+    def dimension(low, high):
+        return rng.integers(low, high, rows).astype(str).astype(object)
+    
+    return pd.DataFrame({
+        'Part Number': blank(part_numbers, MISSING_PART_NUMBER),
+        'Description': descriptions,
+        'Brand': choose(BRANDS),
+        'Price': price_text,
+        'Quantity': rng.integers(0, 200, rows).astype(str).astype(object),
+        'Category': category,
+        'UPC': blank(upcs, MISSING_UPC),
+        'Weight': weight_text,
+        'Length': dimension(2, 30),
+        'Width': dimension(2, 20),
+        'Height': dimension(1, 30),
+        'Year': years,
+        'Make': makes,
+        'Model': models,
+        'Condition': choose(CONDITIONS),
+    }, columns=COLUMNS)
+
+
+def write_catalog(rows: int, target: Union[str, Path, IO], seed: int = 42) -> None:
+    """
+    Write a synthetic catalog as CSV to a path or text stream
+    """
+    generate_catalog(rows, seed).to_csv(target, index=False)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Write a synthetic AutoZone-style catalog as CSV")
+    parser.add_argument('rows', type=int, help="Number of rows")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed (default: 42)")
+    parser.add_argument('-o', '--output', help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+    
+    write_catalog(args.rows, args.output or sys.stdout, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Benchmark runner - Times each conversion stage on synthetic catalogs
+
+Every stage is timed on its own: parsing, the AmazonTransformer steps
+(product ids, titles, descriptions, conditions and the full transform) and
+writing the output CSV. Each timing is the best of --repeat runs. Peak
+memory is measured in a separate pass under tracemalloc, so the tracing
+overhead never shows up in the timings.
+
+Usage:
+    python -m benchmarks.run --rows 10000 100000 1000000 --save baseline.json
+    python -m benchmarks.run --rows 10000 100000 --compare baseline.json --threshold 0.2
+
+With --compare, the exit status is 1 when any stage's throughput (rows per
+second) falls more than --threshold below the baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+from adapter.csv_parser import AutoPartsParser, ENGINES
+from adapter.amazon_transformer import AmazonTransformer
+from adapter.output_writer import CSVOutputWriter
+
+from .catalog import write_catalog
+
+
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+DEFAULT_THRESHOLD = 0.2
+
+
+def _stages(catalog: Path, output: Path, engine: str) -> Dict[str, Callable[[Any], Any]]:
+    """
+    Benchmarked stages in pipeline order; each takes the previous stage's result
+    """
+    parser = AutoPartsParser(engine=engine)
+    transformer = AmazonTransformer()
+    
+    def write(amazon_df):
+        with CSVOutputWriter(output) as writer:
+            writer.write(amazon_df)
+        return amazon_df
+    
+    def condition(df):
+        return transformer._standardize_condition(
+            transformer._get_column_or_default(df, ['condition'], 'New')
+        )
+    
+    return {
+        'parse': lambda _: parser.parse(catalog),
+        # Transformer steps on their own; each passes the parsed frame on
+        'product_ids': _keep_input(transformer.resolve_product_ids),
+        'title': _keep_input(transformer._build_title),
+        'description': _keep_input(transformer._build_description),
+        'condition': _keep_input(condition),
+        'transform': transformer.transform,
+        'write': write,
+    }
+
+
+def _keep_input(func: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    def stage(value):
+        func(value)
+        return value
+    return stage
+
+
+def _time(func: Callable[[Any], Any], arg: Any, repeat: int):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _peak_memory(func: Callable[[Any], Any], arg: Any):
+    tracemalloc.start()
+    try:
+        result = func(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, result
+
+
+def run_benchmarks(rows: List[int], engine: str = 'c', repeat: int = 3, seed: int = 42,
+                   memory: bool = True, log: Callable[[str], None] = print) -> Dict[str, Any]:
+    """
+    Generate a catalog of each size and benchmark every stage on it
+    
+    Args:
+        rows: Catalog sizes to benchmark
+        engine: Parser engine, 'c' or 'pyarrow'
+        repeat: Timed runs per stage; the fastest counts
+        seed: Catalog generator seed
+        memory: Also measure each stage's peak traced memory
+        log: Called with a progress line after each stage
+    
+    Returns:
+        Report with a `metadata` section and `results[rows][stage]` holding
+        seconds, rows_per_second and peak_memory_mb
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in rows:
+            catalog = Path(tmp_dir) / f"catalog_{count}.csv"
+            write_catalog(count, catalog, seed)
+            stages = _stages(catalog, Path(tmp_dir) / 'output.csv', engine)
+            
+            results[str(count)] = {}
+            value = None
+            for name, func in stages.items():
+                seconds, result = _time(func, value, repeat)
+                entry = {
+                    'seconds': round(seconds, 6),
+                    'rows_per_second': round(count / seconds, 1) if seconds > 0 else None,
+                }
+                if memory:
+                    peak, _ = _peak_memory(func, value)
+                    entry['peak_memory_mb'] = round(peak / 2**20, 2)
+                results[str(count)][name] = entry
+                log(f"{count:>9} rows  {name:<12} {seconds:9.4f}s  "
+                    f"{entry['rows_per_second'] or 0:>12,.0f} rows/s"
+                    + (f"  {entry['peak_memory_mb']:9.1f} MB" if memory else ''))
+                value = result
+    
+    return {
+        'metadata': {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'pyarrow': pa.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'engine': engine,
+            'repeat': repeat,
+            'seed': seed,
+            # KB on Linux, bytes on macOS
+            'max_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        'results': results,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any],
+            threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    Find stages whose throughput regressed against a baseline report
+    
+    Only sizes and stages present in both reports are compared.
+    
+    Args:
+        report: Current run, as returned by run_benchmarks()
+        baseline: Earlier run to compare against
+        threshold: Allowed slowdown as a fraction, e.g. 0.2 for 20%
+    
+    Returns:
+        One message per regressed stage; empty if none regressed
+    """
+    regressions = []
+    for count, stages in report['results'].items():
+        for name, entry in stages.items():
+            previous = baseline.get('results', {}).get(count, {}).get(name)
+            if not previous or not previous.get('rows_per_second') or not entry.get('rows_per_second'):
+                continue
+            ratio = entry['rows_per_second'] / previous['rows_per_second']
+            if ratio < 1 - threshold:
+                regressions.append(
+                    f"{count} rows {name}: {entry['rows_per_second']:,.0f} rows/s is "
+                    f"{1 - ratio:.0%} below the baseline {previous['rows_per_second']:,.0f} rows/s"
+                )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the conversion pipeline stage by stage")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS,
+                        help="Catalog sizes (default: 10000 100000 1000000)")
+    parser.add_argument('--engine', choices=ENGINES, default='c', help="Parser engine (default: c)")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per stage (default: 3)")
+    parser.add_argument('--seed', type=int, default=42, help="Catalog seed (default: 42)")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the peak memory pass")
+    parser.add_argument('--save', help="Write the report to this JSON file")
+    parser.add_argument('--compare', help="Baseline JSON report to check for regressions")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed throughput drop before --compare fails (default: 0.2)")
+    args = parser.parse_args(argv)
+    
+    report = run_benchmarks(args.rows, args.engine, max(args.repeat, 1), args.seed,
+                            memory=not args.no_memory)
+    
+    if args.save:
+        Path(args.save).write_text(json.dumps(report, indent=2) + '\n', encoding='utf-8')
+        print(f"Saved report to {args.save}")
+    
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"Throughput regressed more than {args.threshold:.0%}:", file=sys.stderr)
+            for message in regressions:
+                print(f"  {message}", file=sys.stderr)
+            return 1
+        print(f"No stage regressed more than {args.threshold:.0%} against {args.compare}")
+    
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,24 +2,180 @@
 Amazon Adapter - FastAPI Application
 Converts AutoZone-style auto parts CSV to Amazon upload format
 """
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import pandas as pd
+import aiofiles
+import asyncio
+import hashlib
 import io
+import multiprocessing
 import os
-from datetime import datetime
+import shutil
+import tempfile
+import uuid
+import zipfile
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager, nullcontext
+from multiprocessing.managers import SyncManager
 from pathlib import Path
-from typing import Optional
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+from adapter.csv_parser import ENGINES, AutoPartsParser
+from adapter.dedup import DEDUPE_POLICIES
+from adapter.delta import DeltaIndex
+from adapter.excel_reader import EXCEL_SUFFIXES
+from adapter.jobs import ConversionJob, JobQueue, JobQueueFull
+from adapter.metrics import NO_TIMINGS, ConversionMetrics, StageTimings
+from adapter.output_writer import (
+    COMPRESSIONS, OUTPUT_FORMATS, TEXT_FORMATS, compression_of, iter_decompressed, output_format_of
+)
+from adapter.pipeline import convert_file, iter_converted_csv, merge_files, warm_up
+from adapter.result_cache import ResultCache, link_or_copy
+from adapter.storage import StorageJanitor, directory_usage
+
+# Worker processes used for conversions (defaults to one per CPU core)
+CONVERT_WORKERS = int(os.environ.get("CONVERT_WORKERS", os.cpu_count() or 1))
+
+# Uploads up to this size are converted on a thread instead of a worker process
+THREAD_POOL_MAX_BYTES = int(os.environ.get("THREAD_POOL_MAX_KB", "512")) * 1024
+
+# Background jobs converted at the same time, and jobs allowed to wait in the queue
+MAX_CONCURRENT_JOBS = int(os.environ.get("MAX_CONCURRENT_JOBS", "2"))
+MAX_QUEUED_JOBS = int(os.environ.get("MAX_QUEUED_JOBS", "500"))
+
+# Files of one /convert/batch request converted at the same time, and files allowed per batch
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", CONVERT_WORKERS))
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", "100"))
+
+# CSV parser engine: "c" (pandas default) or "pyarrow" (multi-threaded, Arrow-backed strings)
+PARSER_ENGINE = os.environ.get("PARSER_ENGINE", "c")
+if PARSER_ENGINE not in ENGINES:
+    raise ValueError(f"PARSER_ENGINE must be one of {', '.join(ENGINES)}, got {PARSER_ENGINE!r}")
+
+# Per-stage timing hooks and the /metrics endpoint; METRICS_ENABLED=0 turns both off
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+# Also record each stage's peak memory with tracemalloc (slows conversions down)
+METRICS_TRACK_MEMORY = os.environ.get("METRICS_TRACK_MEMORY", "0") == "1"
+
+metrics = ConversionMetrics()
+
+# Executors are created on first use and reused for every conversion
+process_pool: Optional[ProcessPoolExecutor] = None
+thread_pool: Optional[ThreadPoolExecutor] = None
+
+# Shares job progress counters with worker processes
+progress_manager: Optional[SyncManager] = None
+
+
+def get_executor(upload_size: int) -> Executor:
+    """
+    Pick the executor for a conversion: threads for small uploads, processes otherwise
+    """
+    global process_pool, thread_pool
+    
+    if upload_size <= THREAD_POOL_MAX_BYTES:
+        if thread_pool is None:
+            thread_pool = ThreadPoolExecutor(max_workers=CONVERT_WORKERS, thread_name_prefix="convert")
+        return thread_pool
+    
+    if process_pool is None:
+        process_pool = ProcessPoolExecutor(max_workers=CONVERT_WORKERS)
+    return process_pool
+
+
+def new_progress_counter(executor: Executor):
+    """
+    Create a row counter that the given executor's workers can update
+    """
+    global progress_manager
+    
+    if not isinstance(executor, ProcessPoolExecutor):
+        return SimpleNamespace(value=0)
+    
+    if progress_manager is None:
+        progress_manager = multiprocessing.Manager()
+    return progress_manager.Value('q', 0)
+
+
+def new_timings(requested: bool = False):
+    """
+    Stage timings for one conversion, or no-op hooks when metrics are off
+    and the request did not ask for timings
+    """
+    if METRICS_ENABLED or requested:
+        return StageTimings(memory=METRICS_TRACK_MEMORY)
+    return NO_TIMINGS
+
+
+def track_conversion():
+    """Count a conversion in the in-flight, latency and error metrics"""
+    return metrics.track() if METRICS_ENABLED else nullcontext()
+
+
+def observe_conversion(timings, rows: int, input_size: int, output_path: Path) -> None:
+    """Record a finished conversion's stage timings, throughput and sizes"""
+    if METRICS_ENABLED:
+        metrics.observe(timings, rows, input_size, output_path.stat().st_size)
+
+
+async def run_job(job: ConversionJob) -> dict:
+    """Convert a queued job's upload on the conversion executors"""
+    try:
+        with track_conversion():
+            input_size = job.input_path.stat().st_size
+            executor = get_executor(input_size)
+            job.progress = new_progress_counter(executor)
+            counts = await asyncio.get_running_loop().run_in_executor(
+                executor, convert_file, job.input_path, job.output_path, CHUNK_SIZE, job.progress,
+                None, PARSER_ENGINE, new_timings(), compression_of(job.output_path),
+                output_format_of(job.output_path), job.sheet, job.dedupe, job.fitment
+            )
+            observe_conversion(counts.pop("timings", NO_TIMINGS), counts["rows_processed"],
+                               input_size, job.output_path)
+            return counts
+    finally:
+        job.input_path.unlink(missing_ok=True)
+
+
+job_queue = JobQueue(run_job, max_concurrent=MAX_CONCURRENT_JOBS, max_queued=MAX_QUEUED_JOBS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and warm up the conversion workers and the storage janitor, and shut them down on exit"""
+    loop = asyncio.get_running_loop()
+    executor = get_executor(THREAD_POOL_MAX_BYTES + 1)
+    await asyncio.gather(*(loop.run_in_executor(executor, warm_up) for _ in range(CONVERT_WORKERS)))
+    janitor = asyncio.create_task(run_janitor()) if JANITOR_INTERVAL_SECONDS > 0 else None
+    
+    yield
+    
+    if janitor is not None:
+        janitor.cancel()
+        await asyncio.gather(janitor, return_exceptions=True)
+    await job_queue.stop()
+    
+    global process_pool, thread_pool, progress_manager
+    for pool in (process_pool, thread_pool):
+        if pool is not None:
+            pool.shutdown(wait=False)
+    process_pool = thread_pool = None
+    
+    if progress_manager is not None:
+        progress_manager.shutdown()
+        progress_manager = None
 
-from adapter.csv_parser import AutoPartsParser
-from adapter.amazon_transformer import AmazonTransformer
 
 app = FastAPI(
     title="Amazon Auto Parts Adapter",
     description="Convert AutoZone-style auto parts CSV to Amazon upload format",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware for web interface
@@ -37,6 +193,301 @@ OUTPUT_DIR = Path("outputs")
 UPLOAD_DIR.mkdir(exist_ok=True)
 OUTPUT_DIR.mkdir(exist_ok=True)
 
+# Rows per chunk when converting; bounds memory use for large catalogs
+CHUNK_SIZE = 50_000
+
+# Uploads are spooled to UPLOAD_DIR in blocks of this size
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+
+# Optional upload size limit in megabytes (unset = no limit)
+MAX_UPLOAD_BYTES = (
+    int(os.environ["MAX_UPLOAD_MB"]) * 1024 * 1024 if os.environ.get("MAX_UPLOAD_MB") else None
+)
+
+# Converted files are cached by upload content; 0 disables the cache
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_MB", "1024")) * 1024 * 1024
+result_cache = ResultCache(OUTPUT_DIR / "cache", RESULT_CACHE_MAX_BYTES)
+
+# Converted files are deleted this many hours after they were written (0 keeps them)
+OUTPUT_TTL_HOURS = float(os.environ.get("OUTPUT_TTL_HOURS", "24"))
+
+# Oldest converted files are deleted once OUTPUT_DIR holds more than this (0 = no limit)
+OUTPUT_MAX_BYTES = int(os.environ.get("OUTPUT_MAX_MB", "10240")) * 1024 * 1024
+
+# Uploads left behind by interrupted conversions are deleted after this many hours
+UPLOAD_TTL_HOURS = float(os.environ.get("UPLOAD_TTL_HOURS", "24"))
+
+# Seconds between storage sweeps; 0 turns the janitor off
+JANITOR_INTERVAL_SECONDS = float(os.environ.get("JANITOR_INTERVAL_SECONDS", "300"))
+
+output_janitor = StorageJanitor(OUTPUT_DIR, OUTPUT_TTL_HOURS * 3600, OUTPUT_MAX_BYTES)
+upload_janitor = StorageJanitor(UPLOAD_DIR, UPLOAD_TTL_HOURS * 3600)
+
+# Compressed outputs, preferred first when the client accepts several
+ENCODING_PREFERENCE = ("zstd", "gzip")
+
+# Accepted upload types: CSV, and Excel workbooks read sheet by sheet
+INPUT_SUFFIXES = (".csv",) + EXCEL_SUFFIXES
+
+# Media types of downloadable files by suffix
+MEDIA_TYPES = {
+    ".csv": "text/csv",
+    ".txt": "text/tab-separated-values",
+    ".parquet": "application/vnd.apache.parquet",
+    ".feather": "application/vnd.apache.arrow.file",
+    ".gz": "application/gzip",
+    ".zst": "application/zstd",
+}
+
+# Fingerprint indexes of each feed's last conversion, for delta mode
+DELTA_DIR = Path("deltas")
+DELTA_DIR.mkdir(exist_ok=True)
+
+# One delta conversion per feed at a time
+feed_locks: dict = {}
+
+
+async def run_janitor():
+    """Sweep OUTPUT_DIR and UPLOAD_DIR every JANITOR_INTERVAL_SECONDS, starting right away"""
+    while True:
+        in_use = [job.input_path for job in job_queue.unfinished()]
+        try:
+            await asyncio.to_thread(output_janitor.sweep)
+            await asyncio.to_thread(upload_janitor.sweep, in_use)
+        except OSError:
+            # A directory that cannot be swept now may be sweepable next time
+            pass
+        await asyncio.sleep(JANITOR_INTERVAL_SECONDS)
+
+
+def storage_usage() -> dict:
+    """Files and bytes held in the output, upload and result cache directories, and free disk space"""
+    disk = shutil.disk_usage(OUTPUT_DIR)
+    return {
+        "outputs": output_janitor.usage(),
+        "uploads": upload_janitor.usage(),
+        "cache": {**directory_usage(result_cache.directory), "max_bytes": result_cache.max_bytes or None},
+        "disk": {"total_bytes": disk.total, "free_bytes": disk.free},
+    }
+
+
+async def spool_upload(file: UploadFile, max_bytes: Optional[int] = None,
+                       digest=None) -> Path:
+    """
+    Stream an uploaded file to a temporary file in UPLOAD_DIR, one block at a time
+    
+    Raises HTTP 413 as soon as the upload grows past max_bytes, by default
+    MAX_UPLOAD_BYTES. If a hashlib object is passed as digest, it is updated
+    with every block.
+    """
+    if max_bytes is None:
+        max_bytes = MAX_UPLOAD_BYTES
+    fd, name = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=Path(file.filename).suffix)
+    os.close(fd)
+    spool_path = Path(name)
+    
+    try:
+        size = 0
+        async with aiofiles.open(spool_path, 'wb') as spool:
+            while block := await file.read(UPLOAD_BLOCK_SIZE):
+                size += len(block)
+                if max_bytes is not None and size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File exceeds the maximum upload size of {max_bytes // (1024 * 1024)} MB"
+                    )
+                if digest is not None:
+                    digest.update(block)
+                await spool.write(block)
+    except BaseException:
+        spool_path.unlink(missing_ok=True)
+        raise
+    
+    return spool_path
+
+
+def check_input_name(filename: str) -> None:
+    """Reject uploads that are neither CSV files nor Excel workbooks"""
+    if not filename.lower().endswith(INPUT_SUFFIXES):
+        raise HTTPException(status_code=400, detail="Only CSV and Excel (.xlsx) files are accepted")
+
+
+def check_dedupe_policy(dedupe: Optional[str]) -> None:
+    """Reject unknown duplicate policies"""
+    if dedupe is not None and dedupe not in DEDUPE_POLICIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown dedupe policy: {dedupe} (expected {', '.join(DEDUPE_POLICIES)})"
+        )
+
+
+def check_fitment_options(output_format: str, dedupe: Optional[str] = None,
+                          feed: Optional[str] = None, stream: bool = False) -> None:
+    """Reject options that do not apply to fitment files"""
+    if output_format == "flatfile":
+        raise HTTPException(status_code=400, detail="Fitment files are written as csv, parquet or feather")
+    if dedupe is not None or feed is not None or stream:
+        raise HTTPException(
+            status_code=400, detail="Fitment files cannot be deduplicated, streamed or written in delta mode"
+        )
+
+
+def check_catalog_header(upload_path: Path, sheet: Optional[str] = None) -> None:
+    """Reject a file whose header names none of the catalog columns the parser knows"""
+    parser = AutoPartsParser(engine=PARSER_ENGINE, sheet=sheet)
+    if not parser.column_mappings.keys() & set(parser.parse_header(upload_path).columns):
+        raise ValueError("Not a parts catalog: the header has none of the known columns")
+
+
+def extract_archive(archive_path: Path,
+                    max_bytes: Optional[int] = None) -> Tuple[List[Tuple[str, Path]], List[str]]:
+    """
+    Extract the CSV and Excel members of a zip archive to UPLOAD_DIR, one block at a time
+    
+    Folders, hidden files and macOS resource forks are ignored. Raises HTTP
+    400 for an invalid archive, and 413 for a member that extracts to more
+    than max_bytes (MAX_UPLOAD_BYTES by default), however small its
+    compressed size.
+    
+    Returns:
+        (member name, extracted path) pairs in archive order, and the names
+        of members that are neither CSV nor Excel
+    """
+    if max_bytes is None:
+        max_bytes = MAX_UPLOAD_BYTES
+    extracted: List[Tuple[str, Path]] = []
+    skipped: List[str] = []
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            for member in archive.infolist():
+                name = member.filename
+                if member.is_dir() or name.startswith("__MACOSX/") or Path(name).name.startswith("."):
+                    continue
+                if not name.lower().endswith(INPUT_SUFFIXES):
+                    skipped.append(name)
+                    continue
+                
+                fd, spool_name = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=Path(name).suffix)
+                extracted.append((name, Path(spool_name)))
+                with os.fdopen(fd, "wb") as spool, archive.open(member) as source:
+                    size = 0
+                    while block := source.read(UPLOAD_BLOCK_SIZE):
+                        size += len(block)
+                        if max_bytes is not None and size > max_bytes:
+                            raise HTTPException(
+                                status_code=413,
+                                detail=f"{name} exceeds the maximum upload size of {max_bytes // (1024 * 1024)} MB"
+                            )
+                        spool.write(block)
+    except BaseException as e:
+        for _, path in extracted:
+            path.unlink(missing_ok=True)
+        if isinstance(e, (zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError)):
+            raise HTTPException(status_code=400, detail=f"Invalid zip archive: {e}")
+        raise
+    
+    return extracted, skipped
+
+
+async def spool_batch(files: List[UploadFile]) -> Tuple[List[Tuple[str, Path]], List[str]]:
+    """
+    Spool the files of a batch upload, extracting zip archives into their members
+    
+    Returns:
+        (filename, spooled path) pairs in upload order, and the names of
+        archive members that were skipped
+    """
+    inputs: List[Tuple[str, Path]] = []
+    skipped: List[str] = []
+    try:
+        for file in files:
+            upload_path = await spool_upload(file)
+            if not file.filename.lower().endswith(".zip"):
+                inputs.append((file.filename, upload_path))
+                continue
+            try:
+                members, skipped_members = await asyncio.to_thread(extract_archive, upload_path)
+            finally:
+                upload_path.unlink(missing_ok=True)
+            inputs.extend(members)
+            skipped.extend(skipped_members)
+            if len(inputs) > BATCH_MAX_FILES:
+                raise HTTPException(status_code=400, detail=f"A batch can hold at most {BATCH_MAX_FILES} files")
+    except BaseException:
+        for _, path in inputs:
+            path.unlink(missing_ok=True)
+        raise
+    
+    return inputs, skipped
+
+
+def accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """
+    Parse an Accept-Encoding header into {coding: q-value}
+    """
+    encodings = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        encodings[coding.strip().lower()] = q
+    return encodings
+
+
+def preferred_encoding(accept_encoding: str, available=ENCODING_PREFERENCE) -> Optional[str]:
+    """
+    The available compression the client accepts with the highest q-value, or None
+    """
+    encodings = accepted_encodings(accept_encoding)
+    wildcard = encodings.get("*", 0.0)
+    best, best_q = None, 0.0
+    for compression in ENCODING_PREFERENCE:
+        q = encodings.get(compression, wildcard)
+        if compression in available and q > best_q:
+            best, best_q = compression, q
+    return best
+
+
+def output_compression(compression: Optional[str], request: Request,
+                       output_format: str = "csv") -> Optional[str]:
+    """
+    Validate the format and compression query parameters of a conversion request
+    
+    "gzip" or "zstd" compress the stored output, "none" (or no parameter)
+    leaves it plain, and "auto" picks the best codec in the request's
+    Accept-Encoding header. Only text formats are compressed this way.
+    
+    Returns:
+        The output compression, or None
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown format: {output_format} (expected {', '.join(OUTPUT_FORMATS)})"
+        )
+    if compression is None or compression == "none":
+        return None
+    if output_format not in TEXT_FORMATS:
+        if compression == "auto":
+            return None
+        raise HTTPException(status_code=400, detail=f"{output_format} output is compressed internally")
+    if compression == "auto":
+        return preferred_encoding(request.headers.get("accept-encoding", ""))
+    if compression not in COMPRESSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown compression: {compression} (expected none, auto, {', '.join(COMPRESSIONS)})"
+        )
+    return compression
+
 
 @app.get("/", response_class=HTMLResponse)
 async def root():
@@ -222,7 +673,7 @@ async def root():
                     Drag & drop your CSV file here
                 </p>
                 <p style="color: #999; font-size: 14px;">or click to browse</p>
-                <input type="file" id="fileInput" accept=".csv" />
+                <input type="file" id="fileInput" accept=".csv,.xlsx,.xlsm" />
             </div>
             
             <div class="file-info" id="fileInfo"></div>
@@ -279,8 +730,8 @@ async def root():
             });
             
             function handleFile(file) {
-                if (!file.name.endsWith('.csv')) {
-                    showStatus('Please select a CSV file', 'error');
+                if (!['.csv', '.xlsx', '.xlsm'].some(ext => file.name.toLowerCase().endsWith(ext))) {
+                    showStatus('Please select a CSV or Excel (.xlsx) file', 'error');
                     return;
                 }
                 
@@ -352,65 +803,460 @@ async def root():
 
 
 @app.post("/convert")
-async def convert_csv(file: UploadFile = File(...)):
+async def convert_csv(request: Request, file: UploadFile = File(...), stream: bool = False,
+                      feed: Optional[str] = None, timings: bool = False,
+                      compression: Optional[str] = None,
+                      output_format: str = Query("csv", alias="format"),
+                      sheet: Optional[str] = None, dedupe: Optional[str] = None, fitment: bool = False):
     """
-    Convert uploaded AutoZone-style CSV to Amazon format
+    Convert an uploaded AutoZone-style CSV or Excel workbook to Amazon format
+    
+    With stream=true the Amazon CSV is returned directly in the response body,
+    streamed as each chunk is transformed, instead of being saved for /download.
+    
+    With feed=<name> only listings that are new, changed or deleted since the
+    feed's previous conversion are written (delta mode).
+    
+    With timings=true the response includes the seconds spent in each stage.
+    
+    With compression=gzip, zstd or auto (picked from Accept-Encoding) the
+    output is stored compressed, as .csv.gz or .csv.zst.
+    
+    format selects the output: csv (default), flatfile (Amazon's
+    tab-delimited template), parquet or feather.
+    
+    For .xlsx uploads, sheet picks the worksheet by name or 0-based
+    position (the first sheet by default).
+    
+    With dedupe=first, last, sum_quantity or min_price every product-id is
+    written once, its rows combined by that policy, and the response reports
+    the duplicates found.
+    
+    With fitment=true the vehicle fitment of the listings is written instead:
+    one row per product id and vehicle, with year ranges and vehicle lists
+    expanded.
     """
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="Only CSV files are accepted")
+    check_input_name(file.filename)
+    check_dedupe_policy(dedupe)
+    if fitment:
+        check_fitment_options(output_format, dedupe, feed, stream)
     
-    try:
-        # Read uploaded file
-        contents = await file.read()
+    codec = output_compression(compression, request, output_format)
+    if stream and (codec is not None or output_format != "csv"):
+        raise HTTPException(status_code=400, detail="Only uncompressed CSV output can be streamed")
+    if stream and dedupe is not None:
+        raise HTTPException(status_code=400, detail="Deduplicated conversions cannot be streamed")
+    
+    if feed is not None:
+        if stream:
+            raise HTTPException(status_code=400, detail="Delta conversions cannot be streamed")
+        try:
+            delta = DeltaIndex(DELTA_DIR, feed)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        with track_conversion():
+            return await convert_delta(file, delta, timings, codec, output_format, sheet, dedupe)
+    
+    if stream:
+        # Streamed conversions run after the response has started and are not measured
+        return await convert_streamed(file, sheet)
+    
+    with track_conversion():
+        stage_timings = new_timings(timings)
         
-        # Parse the AutoZone CSV
-        parser = AutoPartsParser()
-        df = parser.parse(contents)
+        # Spool the upload to disk instead of holding it in memory, hashing it on the way
+        digest = hashlib.sha256()
+        with stage_timings.stage("upload"):
+            upload_path = await spool_upload(file, digest=digest)
+        
+        # Identical uploads are served from the result cache
+        cache_key = conversion_cache_key(digest.hexdigest(), output_format, codec, sheet, dedupe, fitment)
+        cached = result_cache.get(cache_key)
+        
+        try:
+            # Generate output filename
+            output_filename = output_name(codec, output_format, tag="fitment" if fitment else None)
+            output_path = OUTPUT_DIR / output_filename
+            input_size = upload_path.stat().st_size
+            
+            if cached is not None:
+                link_or_copy(cached[0], output_path)
+                counts = cached[1]
+            else:
+                # Parse, transform and save the Amazon-formatted CSV off the event loop
+                executor = get_executor(input_size)
+                counts = await asyncio.get_running_loop().run_in_executor(
+                    executor, convert_file, upload_path, output_path, CHUNK_SIZE, None, None, PARSER_ENGINE,
+                    stage_timings, codec, output_format, sheet, dedupe, fitment
+                )
+                # A worker process sends back a filled-in copy of the timings
+                stage_timings = counts.pop("timings", stage_timings)
+                result_cache.put(cache_key, output_path, counts)
+            
+            observe_conversion(stage_timings, counts["rows_processed"], input_size, output_path)
+            
+            response = {
+                "message": "File converted successfully",
+                "output_file": output_filename,
+                "rows_processed": counts["rows_processed"],
+                "rows_output": counts["rows_output"],
+                "cached": cached is not None
+            }
+            if "duplicates" in counts:
+                response["duplicates"] = counts["duplicates"]
+            if "vehicles" in counts:
+                response["vehicles"] = counts["vehicles"]
+            if timings:
+                response["timings"] = stage_timings.to_dict()
+            return response
         
-        # Transform to Amazon format
-        transformer = AmazonTransformer()
-        amazon_df = transformer.transform(df)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
         
-        # Generate output filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_filename = f"amazon_auto_parts_{timestamp}.csv"
+        finally:
+            upload_path.unlink(missing_ok=True)
+
+
+async def convert_streamed(file: UploadFile, sheet: Optional[str] = None):
+    """
+    Stream the conversion of an upload, or its cached result
+    """
+    digest = hashlib.sha256()
+    upload_path = await spool_upload(file, digest=digest)
+    
+    cached = result_cache.get(conversion_cache_key(digest.hexdigest(), sheet=sheet))
+    if cached is not None:
+        upload_path.unlink(missing_ok=True)
+        return FileResponse(path=cached[0], filename=output_name(), media_type="text/csv")
+    return stream_conversion(upload_path, sheet)
+
+
+async def convert_delta(file: UploadFile, delta: DeltaIndex, timings: bool = False,
+                        compression: Optional[str] = None, output_format: str = "csv",
+                        sheet: Optional[str] = None, dedupe: Optional[str] = None) -> dict:
+    """
+    Convert an upload against its feed's previous run, bypassing the result cache
+    """
+    stage_timings = new_timings(timings)
+    with stage_timings.stage("upload"):
+        upload_path = await spool_upload(file)
+    
+    try:
+        output_filename = output_name(compression, output_format)
         output_path = OUTPUT_DIR / output_filename
+        input_size = upload_path.stat().st_size
         
-        # Save the Amazon-formatted CSV
-        amazon_df.to_csv(output_path, index=False)
+        lock = feed_locks.setdefault(delta.feed, asyncio.Lock())
+        async with lock:
+            executor = get_executor(input_size)
+            counts = await asyncio.get_running_loop().run_in_executor(
+                executor, convert_file, upload_path, output_path, CHUNK_SIZE, None, delta, PARSER_ENGINE,
+                stage_timings, compression, output_format, sheet, dedupe
+            )
+        stage_timings = counts.pop("timings", stage_timings)
+        observe_conversion(stage_timings, counts["rows_processed"], input_size, output_path)
         
-        return {
+        response = {
             "message": "File converted successfully",
             "output_file": output_filename,
-            "rows_processed": len(df),
-            "rows_output": len(amazon_df)
+            "feed": delta.feed,
+            **counts,
+            "cached": False
         }
+        if timings:
+            response["timings"] = stage_timings.to_dict()
+        return response
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+    
+    finally:
+        upload_path.unlink(missing_ok=True)
+
+
+def conversion_cache_key(content_hash: str, output_format: str = "csv", compression: Optional[str] = None,
+                         sheet: Optional[str] = None, dedupe: Optional[str] = None, fitment: bool = False) -> str:
+    """
+    Result cache key of a conversion, shared by /convert and its streamed form
+    
+    The parser engine is part of the key, as it decides dtypes and number formatting.
+    """
+    return result_cache.key(
+        content_hash, format=output_format + COMPRESSIONS.get(compression, ""), sheet=sheet,
+        dedupe=dedupe, fitment=fitment, engine=PARSER_ENGINE
+    )
+
+
+def output_name(compression: Optional[str] = None, output_format: str = "csv",
+                output_id: Optional[str] = None, tag: Optional[str] = None) -> str:
+    """
+    Unique name for a converted file
+    
+    output_id defaults to a random UUID, so concurrent conversions never share
+    a name; tag tells apart the files of one job or batch (e.g. "fitment").
+    """
+    name = f"amazon_auto_parts_{output_id or uuid.uuid4().hex}"
+    if tag is not None:
+        name = f"{name}_{tag}"
+    return f"{name}{OUTPUT_FORMATS[output_format]}{COMPRESSIONS.get(compression, '')}"
+
+
+def stream_conversion(upload_path: Path, sheet: Optional[str] = None) -> StreamingResponse:
+    """
+    Build a streaming response that converts a spooled upload chunk by chunk
+    """
+    def body():
+        try:
+            yield from iter_converted_csv(upload_path, CHUNK_SIZE, PARSER_ENGINE, sheet)
+        finally:
+            upload_path.unlink(missing_ok=True)
+    
+    return StreamingResponse(
+        body(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{output_name()}"'}
+    )
+
+
+@app.post("/convert/batch")
+async def convert_batch(request: Request, response: Response, files: List[UploadFile] = File(...),
+                        merge: bool = False,
+                        compression: Optional[str] = None,
+                        output_format: str = Query("csv", alias="format"),
+                        sheet: Optional[str] = None, dedupe: Optional[str] = None):
+    """
+    Convert several CSV or Excel files, or the members of zip archives, in one request
+    
+    Files are converted in parallel, at most BATCH_CONCURRENCY at a time, each
+    to its own output. With merge=true they are combined into one feed
+    instead, in upload order, with every product-id listed once: its first
+    row, or its rows combined by the dedupe policy.
+    A file that fails to convert, or whose header has none of the known
+    catalog columns, is reported in its summary without failing the rest of
+    the batch; if none converts, the status is 422.
+    
+    The format, compression, sheet and dedupe parameters work as for /convert.
+    """
+    check_dedupe_policy(dedupe)
+    codec = output_compression(compression, request, output_format)
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"A batch can hold at most {BATCH_MAX_FILES} files")
+    for file in files:
+        if not file.filename.lower().endswith(".zip"):
+            check_input_name(file.filename)
+    
+    inputs, skipped = await spool_batch(files)
+    if not inputs:
+        raise HTTPException(status_code=400, detail="The batch holds no CSV or Excel files")
+    
+    batch_id = uuid.uuid4().hex
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def convert_member(number: int, filename: str, upload_path: Path) -> dict:
+        # Merged batches convert each file to a Parquet part first
+        if merge:
+            output_path = UPLOAD_DIR / f"batch_{batch_id}_{number}.parquet"
+        else:
+            output_path = OUTPUT_DIR / output_name(codec, output_format, batch_id, str(number))
+        
+        async with semaphore:
+            try:
+                with track_conversion():
+                    stage_timings = new_timings()
+                    input_size = upload_path.stat().st_size
+                    # Without a known column the file would "convert" to an empty feed
+                    await asyncio.get_running_loop().run_in_executor(None, check_catalog_header, upload_path, sheet)
+                    counts = await asyncio.get_running_loop().run_in_executor(
+                        get_executor(input_size), convert_file, upload_path, output_path, CHUNK_SIZE,
+                        None, None, PARSER_ENGINE, stage_timings,
+                        None if merge else codec, "parquet" if merge else output_format, sheet,
+                        None if merge else dedupe
+                    )
+                    observe_conversion(counts.pop("timings", stage_timings), counts["rows_processed"],
+                                       input_size, output_path)
+            except Exception as e:
+                output_path.unlink(missing_ok=True)
+                return {"filename": filename, "error": str(e)}
+            finally:
+                upload_path.unlink(missing_ok=True)
+        
+        return {"filename": filename, "output_file": output_path.name, **counts}
+    
+    try:
+        summaries = await asyncio.gather(*(
+            convert_member(number, filename, path) for number, (filename, path) in enumerate(inputs, 1)
+        ))
+    finally:
+        for _, path in inputs:
+            path.unlink(missing_ok=True)
+    
+    converted = [summary for summary in summaries if "error" not in summary]
+    if not converted:
+        response.status_code = 422
+    result = {
+        "message": "Batch converted" if converted else "No file in the batch could be converted",
+        "files_converted": len(converted),
+        "files_failed": len(summaries) - len(converted),
+        "rows_processed": sum(summary["rows_processed"] for summary in converted),
+        "rows_output": sum(summary["rows_output"] for summary in converted),
+    }
+    
+    if merge and converted:
+        part_paths = [UPLOAD_DIR / summary.pop("output_file") for summary in converted]
+        output_filename = output_name(codec, output_format, batch_id)
+        try:
+            merged = await asyncio.get_running_loop().run_in_executor(
+                get_executor(sum(path.stat().st_size for path in part_paths)), merge_files,
+                part_paths, OUTPUT_DIR / output_filename, codec, output_format, CHUNK_SIZE, dedupe or "first"
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error merging files: {str(e)}")
+        finally:
+            for path in part_paths:
+                path.unlink(missing_ok=True)
+        
+        for summary, part in zip(converted, merged["parts"]):
+            summary.update(part)
+        result.update(
+            output_file=output_filename, rows_output=merged["rows_output"],
+            rows_duplicate=merged["rows_duplicate"], duplicates=merged["duplicates"]
+        )
+    
+    result["files"] = summaries
+    if skipped:
+        result["skipped"] = skipped
+    return result
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: Request, file: UploadFile = File(...), compression: Optional[str] = None,
+                     output_format: str = Query("csv", alias="format"), sheet: Optional[str] = None,
+                     dedupe: Optional[str] = None, fitment: bool = False):
+    """
+    Queue an uploaded AutoZone-style CSV or Excel workbook for background conversion
+    
+    Returns a job id right away; poll GET /jobs/{job_id} for the result.
+    The format, compression, sheet, dedupe and fitment parameters work as for /convert.
+    """
+    check_input_name(file.filename)
+    check_dedupe_policy(dedupe)
+    if fitment:
+        check_fitment_options(output_format, dedupe)
+    
+    codec = output_compression(compression, request, output_format)
+    upload_path = await spool_upload(file)
+    
+    job_id = uuid.uuid4().hex
+    output_path = OUTPUT_DIR / output_name(codec, output_format, job_id, "fitment" if fitment else None)
+    job = ConversionJob(file.filename, upload_path, output_path, job_id,
+                        sheet=sheet, dedupe=dedupe, fitment=fitment)
+    
+    try:
+        job_queue.submit(job)
+    except JobQueueFull as e:
+        upload_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    return {
+        "message": "Conversion job queued",
+        "job_id": job.id,
+        "status_url": f"/jobs/{job.id}"
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Report the state, progress and timing of a conversion job
+    """
+    job = job_queue.get(job_id)
+    
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    status = job.to_dict()
+    if job.state == 'completed':
+        status["download_url"] = f"/download/{status['output_file']}"
+    
+    return status
 
 
 @app.get("/download/{filename}")
-async def download_file(filename: str):
+async def download_file(filename: str, request: Request):
     """
-    Download the converted Amazon CSV file
+    Download a converted file
+    
+    Compressed outputs (.csv.gz, .txt.zst, ...) can be downloaded under their
+    own name, or under the plain name: clients that accept the codec get the
+    stored bytes with a Content-Encoding header, others get them decompressed.
+    Files are served with an ETag and support If-None-Match and Range requests.
     """
+    if filename.startswith("."):
+        # Hidden files are outputs still being written
+        raise HTTPException(status_code=404, detail="File not found")
+    
     file_path = OUTPUT_DIR / filename
+    headers = {}
     
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="File not found")
+    if not file_path.is_file():
+        # Look for a compressed copy of a plain .csv name
+        stored = {
+            compression: OUTPUT_DIR / f"{filename}{suffix}"
+            for compression, suffix in COMPRESSIONS.items()
+            if output_format_of(filename) in TEXT_FORMATS and (OUTPUT_DIR / f"{filename}{suffix}").is_file()
+        }
+        if not stored:
+            raise HTTPException(status_code=404, detail="File not found")
+        
+        encoding = preferred_encoding(request.headers.get("accept-encoding", ""), stored)
+        if encoding is None:
+            compression, path = next(iter(stored.items()))
+            return StreamingResponse(
+                iter_decompressed(path, compression),
+                media_type=MEDIA_TYPES[Path(filename).suffix],
+                headers={"Content-Disposition": f'attachment; filename="{filename}"', "Vary": "Accept-Encoding"}
+            )
+        file_path = stored[encoding]
+        headers = {"Content-Encoding": encoding, "Vary": "Accept-Encoding"}
     
+    stat_result = file_path.stat()
+    etag = f'"{stat_result.st_ino:x}-{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+    headers.update({"ETag": etag, "Accept-Ranges": "bytes"})
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" in tags or etag in tags:
+            return Response(status_code=304, headers=headers)
+    
+    # FileResponse answers Range and If-Range requests with partial content
     return FileResponse(
         path=file_path,
         filename=filename,
-        media_type="text/csv"
+        media_type=MEDIA_TYPES.get(Path(filename).suffix, "application/octet-stream"),
+        headers=headers,
+        stat_result=stat_result
     )
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Conversion metrics in the Prometheus text exposition format
+    """
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type=ConversionMetrics.CONTENT_TYPE)
+
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy", "service": "Amazon Auto Parts Adapter"}
+    """Health check endpoint, with the storage used by converted files and uploads"""
+    return {
+        "status": "healthy",
+        "service": "Amazon Auto Parts Adapter",
+        "storage": await asyncio.to_thread(storage_usage)
+    }
 
 
 if __name__ == "__main__":
@@ -2,9 +2,23 @@
 """
 Test script for Amazon Auto Parts Adapter
 """
+import asyncio
+import io
+import time
+from pathlib import Path
+
 import pandas as pd
+import pyarrow as pa
+import pytest
 from adapter.csv_parser import AutoPartsParser
 from adapter.amazon_transformer import AmazonTransformer
+from adapter.output_writer import CSVOutputWriter
+from adapter.parallel import transform_partitioned
+from adapter.delta import DeltaIndex
+from adapter.pipeline import convert_file
+
+# The API tests run in a temporary directory
+SAMPLE_CATALOG = Path(__file__).with_name('sample_autozone.csv')
 
 
 def test_conversion():
@@ -46,8 +60,803 @@ def test_conversion():
     print("=" * 60)
     print("✓ Test completed successfully!")
     print(f"\nYou can now upload '{output_file}' to Amazon.")
+
+
+def test_title_and_description_builders():
+    """Test title/description assembly, fitment clause and truncation"""
+    df = pd.DataFrame({
+        'part_number': ['BRK-001', '', 'X' * 250],
+        'title': ['Brake Pad Set', '', ''],
+        'brand': ['AutoZone', '', ''],
+        'year': [2020.0, None, None],
+        'make': ['Toyota', '', ''],
+        'model': ['Camry', '', ''],
+    })
+    
+    transformer = AmazonTransformer()
+    titles = transformer._build_title(df)
+    descriptions = transformer._build_description(df)
+    
+    assert titles[0] == 'AutoZone - BRK-001 - Brake Pad Set'
+    assert titles[1] == 'Auto Part'
+    assert len(titles[2]) == 200 and titles[2].endswith('...')
+    assert descriptions[0] == (
+        'Brake Pad Set. Brand: AutoZone. Part Number: BRK-001. Fits: 2020.0 Toyota Camry'
+    )
+
+
+def test_product_id_resolution():
+    """Test placeholder SKUs and UPC precedence"""
+    df = pd.DataFrame({
+        'part_number': ['', 'BRK-001', '', 'FLT-234'],
+        'upc': ['012345678901', '', None, ''],
+    })
+    
+    amazon_df = AmazonTransformer().transform(df)
+    
+    assert amazon_df['product-id'].tolist() == [
+        '012345678901', 'BRK-001', 'AUTO-PART-000002', 'FLT-234'
+    ]
+    assert amazon_df['product-id-type'].tolist() == ['UPC', 'SKU', 'SKU', 'SKU']
+
+
+def test_chunked_conversion_matches_single_shot():
+    """Test that the chunked pipeline writes the same CSV as a single-shot conversion"""
+    with open('sample_autozone.csv', 'rb') as f:
+        contents = f.read()
+    
+    expected = io.StringIO()
+    with CSVOutputWriter(expected) as writer:
+        writer.write(AmazonTransformer().transform(AutoPartsParser().parse(contents)))
+    
+    output = io.StringIO()
+    with CSVOutputWriter(output) as writer:
+        chunks = AutoPartsParser().parse_chunks(contents, chunksize=3)
+        writer.write_all(AmazonTransformer().transform_chunks(chunks))
+    
+    assert writer.rows_written == 10
+    assert output.getvalue() == expected.getvalue()
+    
+    # Columns whose values would be inferred differently in each chunk are typed alike
+    contents = b'Part Number,Length,Supplier Code\nBRK-001,10,7\nBRK-002,,8\nBRK-003,10.5,A-7\n'
+    chunks = list(AutoPartsParser().parse_chunks(contents, chunksize=1))
+    pd.testing.assert_frame_equal(pd.concat(chunks), AutoPartsParser().parse(contents))
+    assert [chunk['supplier code'].dtype for chunk in chunks] == [object] * 3
+
+
+def test_streaming_yields_rows_before_source_is_read(tmp_path):
+    """Test that streamed conversion sends its first rows before reading the whole source"""
+    from adapter.pipeline import iter_converted_csv
+    
+    # A malformed row past the parsers' first read buffer (1 MB); it is only reached at the end
+    rows = ''.join(f'P-{i:06d},Brake Pad {i},Bosch,19.99,5\n' for i in range(40000))
+    source = tmp_path / 'catalog.csv'
+    source.write_text('Part Number,Description,Brand,Price,Quantity\n' + rows + 'BAD,"unterminated\n')
+    
+    for engine in ('c', 'pyarrow'):
+        blocks = iter_converted_csv(source, chunksize=5000, engine=engine)
+        assert next(blocks).startswith('product-id,')
+        assert next(blocks).startswith('P-000000,')
+        try:
+            for _ in blocks:
+                pass
+            assert False, "expected the malformed row to fail the stream"
+        except (pd.errors.ParserError, pa.ArrowInvalid):
+            pass
+
+
+def test_partitioned_transform_matches_single_process():
+    """Test that the multi-process transform stitches partitions back in order"""
+    df = AutoPartsParser().parse(b'Part Number,Description,UPC\n' + b',Brake Pad,\nFLT-234,Air Filter,012345678902\n' * 20)
+    
+    expected = AmazonTransformer().transform(df)
+    result = transform_partitioned(df, workers=3, min_partition_rows=5)
+    
+    pd.testing.assert_frame_equal(result, expected)
+    assert result['product-id'].iloc[2] == 'AUTO-PART-000002'
+    
+    # Rows labelled by something other than integers are numbered by position across partitions
+    df.index = [f'row{i}' for i in range(len(df))]
+    result = transform_partitioned(df, workers=3, min_partition_rows=5)
+    pd.testing.assert_frame_equal(result, AmazonTransformer().transform(df))
+    assert result['product-id'].iloc[-2] == 'AUTO-PART-000038'
+
+
+def test_convert_file_with_workers(tmp_path):
+    """Test that splitting each chunk's transform across processes writes the same file"""
+    from benchmarks.catalog import write_catalog
+    
+    write_catalog(25_000, tmp_path / 'catalog.csv')
+    convert_file(tmp_path / 'catalog.csv', tmp_path / 'single.csv', 25_000)
+    counts = convert_file(tmp_path / 'catalog.csv', tmp_path / 'parallel.csv', 25_000, workers=2)
+    
+    assert counts['rows_output'] == 25_000
+    assert (tmp_path / 'parallel.csv').read_bytes() == (tmp_path / 'single.csv').read_bytes()
+
+
+def test_custom_column_mappings():
+    """Test registering supplier column names"""
+    parser = AutoPartsParser(custom_mappings={'part_number': ['Vendor SKU']})
+    parser.register_mapping('notes', ['Description'])
+    
+    df = parser.parse(b'Vendor SKU,Description,Product Name\nBRK-001,Ceramic pads,Brake Pad Set\n')
+    
+    assert list(df.columns) == ['part_number', 'notes', 'title']
+    assert AutoPartsParser()._column_mapping(['Description']) == {'Description': 'title'}
+
+
+def test_delta_conversion(tmp_path):
+    """Test that delta mode emits only new, changed and deleted listings"""
+    index = DeltaIndex(tmp_path / 'deltas', 'test-feed')
+    rows = 'Part Number,Brand,Price,Quantity\nBRK-001,Bosch,39.99,5\nFLT-234,K&N,19.99,7\nBAT-123,DieHard,129.99,2\n'
+    
+    source = tmp_path / 'inventory.csv'
+    source.write_text(rows)
+    counts = convert_file(source, tmp_path / 'first.csv', delta=index)
+    assert counts['rows_new'] == 3 and counts['rows_output'] == 3
+    
+    counts = convert_file(source, tmp_path / 'unchanged.csv', delta=index)
+    assert counts['rows_unchanged'] == 3 and counts['rows_output'] == 0
+    
+    source.write_text(rows.replace('19.99', '17.99').replace('BAT-123,DieHard,129.99,2\n', 'OIL-555,Mobil,8.99,40\n'))
+    counts = convert_file(source, tmp_path / 'delta.csv', delta=index)
+    assert (counts['rows_new'], counts['rows_changed'], counts['rows_deleted']) == (1, 1, 1)
+    
+    output = pd.read_csv(tmp_path / 'delta.csv')
+    assert dict(zip(output['product-id'], output['update-delete'])) == {
+        'FLT-234': 'Update', 'OIL-555': 'Update', 'BAT-123': 'Delete'
+    }
+    assert output.loc[output['product-id'] == 'FLT-234', 'standard-price'].item() == 17.99
+
+
+def test_pyarrow_engine_matches_default():
+    """Test that the Arrow engine produces the same output as the C engine"""
+    with open('sample_autozone.csv', 'rb') as f:
+        contents = f.read()
+    
+    df = AutoPartsParser(engine='pyarrow').parse(contents)
+    assert isinstance(df['part_number'].dtype, pd.StringDtype)
+    
+    expected = AmazonTransformer().transform(AutoPartsParser().parse(contents))
+    assert AmazonTransformer().transform(df).to_csv(index=False) == expected.to_csv(index=False)
+    
+    # Chunks are read a block at a time and concatenate to the whole file
+    chunks = list(AutoPartsParser(engine='pyarrow').parse_chunks(contents, chunksize=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 3, 1]
+    pd.testing.assert_frame_equal(pd.concat(chunks).astype(df.dtypes), df)
+
+
+def test_declared_schema():
+    """Test that identifiers stay text and repeated fields are categorical"""
+    df = AutoPartsParser().parse(
+        b'Part Number,UPC,Brand,Year,Condition,Quantity,Length\n'
+        b'0042,012345678901,Bosch,2020,used,5,10\n'
+        b'0043,,Bosch,,Pre-Owned,,\n'
+    )
+    
+    assert df['part_number'].tolist() == ['0042', '0043']
+    assert df['upc'].tolist() == ['012345678901', '']
+    assert isinstance(df['brand'].dtype, pd.CategoricalDtype)
+    assert df['year'].tolist() == ['2020', '']
+    assert str(df['quantity'].dtype) == 'int32' and str(df['length'].dtype) == 'float64'
+    
+    amazon_df = AmazonTransformer().transform(df)
+    assert amazon_df['product-id'].tolist() == ['012345678901', '0043']
+    assert amazon_df['condition-type'].tolist() == ['Used', 'Used']
+    assert amazon_df['fitment-year'].tolist() == ['2020', '']
+    
+    # Whole-number measurements are written as the source gave them
+    output = io.StringIO()
+    with CSVOutputWriter(output) as writer:
+        writer.write(amazon_df.assign(**{'item-width': [10.5, 8.0]}))
+    written = pd.read_csv(io.StringIO(output.getvalue()), dtype=str, keep_default_na=False)
+    assert written['item-length'].tolist() == ['10', '']
+    assert written['item-width'].tolist() == ['10.5', '8']
+    # Also when the transformed frame is written directly
+    written = pd.read_csv(io.StringIO(amazon_df.to_csv(index=False)), dtype=str, keep_default_na=False)
+    assert written['item-length'].tolist() == ['10', '']
+
+
+def test_price_and_weight_parsing():
+    """Test currency formatting, weight units and null markers in cleaning"""
+    df = AutoPartsParser().parse(
+        b'Price,Weight,Notes\n'
+        b'"$1,299.99",3.5 lbs, fragile \n'
+        b'-$5,12 oz,null\n'
+        b'call,2kg,\n'
+    )
+    
+    assert df['price'].tolist()[:2] == [1299.99, -5.0] and pd.isna(df['price'][2])
+    assert df['weight'].tolist() == [3.5, 0.75, 4.41]
+    assert df['notes'].tolist() == ['fragile', '', '']
+
+
+def test_price_parsing_matches_to_numeric():
+    """Test that prices parse as stripping '$' and ',' and calling pd.to_numeric did"""
+    prices = [
+        '$1,299.99', '-$5', '$-5', '+5', '5$', '$ 5', ' 12.50 ', '.5', '5.', '-.5', '1e3', '007',
+        '$$5', '1,2,3', 'call', '- 5', '(5)', '5-', '',
+    ]
+    source = pd.DataFrame({'Part Number': [f'P{i}' for i in range(len(prices))], 'Price': prices})
+    expected = pd.to_numeric(source['Price'].str.replace('$', '').str.replace(',', '').str.strip(), errors='coerce')
+    
+    for engine in ('c', 'pyarrow'):
+        df = AutoPartsParser(engine=engine).parse(source.to_csv(index=False).encode())
+        pd.testing.assert_series_equal(df['price'], expected, check_names=False)
+
+
+def test_condition_lookup():
+    """Test that source conditions map to Amazon's condition-type values"""
+    conditions = ['Brand-New', 'Used - Like New', 'used_very_good', 'Rebuilt', 'Refurb', 'Pre-Owned', 'mint', None]
+    df = pd.DataFrame({'part_number': [f'P-{i}' for i in range(len(conditions))], 'condition': conditions})
+    
+    amazon_df = AmazonTransformer().transform(df)
+    
+    assert amazon_df['condition-type'].tolist() == [
+        'New', 'UsedLikeNew', 'UsedVeryGood', 'Remanufactured', 'Refurbished', 'Used', 'New', 'New'
+    ]
+
+
+def test_benchmark_catalog():
+    """Test that the synthetic benchmark catalog is reproducible and parses"""
+    from benchmarks.catalog import COLUMNS, generate_catalog
+    from benchmarks.run import compare
+    
+    catalog = generate_catalog(2000, seed=7)
+    
+    assert list(catalog.columns) == COLUMNS
+    assert catalog.equals(generate_catalog(2000, seed=7))
+    assert not catalog.equals(generate_catalog(2000, seed=8))
+    assert (catalog['UPC'] == '').any() and (catalog['Part Number'] == '').any()
+    assert (catalog['Year'] == '').any() and catalog['Price'].str.startswith('$').any()
+    
+    df = AutoPartsParser().parse(catalog.to_csv(index=False).encode('utf-8'))
+    assert len(AmazonTransformer().transform(df)) == 2000
+    
+    baseline = {'results': {'2000': {'parse': {'rows_per_second': 1000.0}}}}
+    assert compare({'results': {'2000': {'parse': {'rows_per_second': 900.0}}}}, baseline, 0.2) == []
+    assert len(compare({'results': {'2000': {'parse': {'rows_per_second': 700.0}}}}, baseline, 0.2)) == 1
+
+
+def test_stage_timings_and_metrics(tmp_path):
+    """Test per-stage timing hooks and the Prometheus metrics output"""
+    from adapter.metrics import ConversionMetrics, StageTimings
+    
+    counts = convert_file('sample_autozone.csv', tmp_path / 'output.csv', 4, timings=StageTimings())
+    timings = counts['timings']
+    assert set(timings.seconds) == {'parse', 'standardize_columns', 'clean_data', 'transform', 'write'}
+    assert timings.to_dict()['total'] > 0
+    assert 'timings' not in convert_file('sample_autozone.csv', tmp_path / 'output.csv', 4)
+    
+    metrics = ConversionMetrics()
+    with metrics.track():
+        metrics.observe(timings, counts['rows_processed'], 1000, 2000)
+    try:
+        with metrics.track():
+            with StageTimings().stage('clean_data'):
+                raise ValueError('bad row')
+    except ValueError:
+        pass
+    
+    text = metrics.render()
+    assert 'amazon_adapter_conversion_duration_seconds_count 1' in text
+    assert 'amazon_adapter_stage_duration_seconds_count{stage="transform"} 1' in text
+    assert 'amazon_adapter_conversion_input_bytes_bucket{le="1024"} 1' in text
+    assert 'amazon_adapter_conversion_errors_total{stage="clean_data"} 1' in text
+    assert 'amazon_adapter_conversions_in_flight 0' in text
+
+
+def test_compressed_output(tmp_path):
+    """Test that gzip and zstd outputs decompress to the plain CSV output"""
+    from adapter.output_writer import compression_of, iter_decompressed
+    
+    convert_file('sample_autozone.csv', tmp_path / 'plain.csv', 4)
+    expected = (tmp_path / 'plain.csv').read_bytes()
+    
+    for name in ('out.csv.gz', 'out.csv.zst'):
+        path = tmp_path / name
+        convert_file('sample_autozone.csv', path, 4, compression=compression_of(path))
+        assert path.stat().st_size < len(expected)
+        assert b''.join(iter_decompressed(path, compression_of(path), block_size=100)) == expected
+
+
+def test_output_formats(tmp_path):
+    """Test that flat file, Parquet and Feather outputs hold the CSV output's rows"""
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+    
+    convert_file('sample_autozone.csv', tmp_path / 'out.csv', 4)
+    expected = pd.read_csv(tmp_path / 'out.csv', dtype=str, keep_default_na=False)
+    
+    convert_file('sample_autozone.csv', tmp_path / 'out.txt', 4, output_format='flatfile')
+    lines = (tmp_path / 'out.txt').read_text().splitlines()
+    assert lines[0].startswith('TemplateType=')
+    assert lines[2].split('\t') == list(expected.columns)
+    assert len(lines) == 3 + len(expected)
+    
+    for name, read in (('out.parquet', pq.read_table), ('out.feather', feather.read_table)):
+        convert_file('sample_autozone.csv', tmp_path / name, 4, output_format=name.split('.')[1])
+        table = read(tmp_path / name)
+        assert table.column_names == list(expected.columns)
+        assert table.column('product-id').to_pylist() == expected['product-id'].tolist()
+
+
+def test_excel_input(tmp_path):
+    """Test that an .xlsx worksheet converts like the same data as CSV"""
+    workbook = tmp_path / 'catalog.xlsx'
+    with pd.ExcelWriter(workbook) as excel:
+        pd.DataFrame({'Notes': ['not a catalog']}).to_excel(excel, sheet_name='Readme', index=False)
+        # UPCs as text cells, and as the number cells Excel stores typed-in UPCs as (012345678901 -> 12345678901)
+        pd.read_csv('sample_autozone.csv', dtype={'UPC': str}).to_excel(excel, sheet_name='Parts', index=False)
+        pd.read_csv('sample_autozone.csv').to_excel(excel, sheet_name='Numbers', index=False)
+    
+    convert_file('sample_autozone.csv', tmp_path / 'from_csv.csv', 4)
+    for sheet in ('Parts', 1, 'Numbers'):
+        convert_file(workbook, tmp_path / 'from_xlsx.csv', 4, sheet=sheet)
+        assert (tmp_path / 'from_xlsx.csv').read_text() == (tmp_path / 'from_csv.csv').read_text()
+    
+    parser = AutoPartsParser(sheet='Parts')
+    assert len(parser.parse(workbook.read_bytes())) == len(parser.parse(workbook))
+    
+    try:
+        AutoPartsParser(sheet='Missing').parse(workbook)
+        assert False, "expected an unknown sheet to be rejected"
+    except ValueError as e:
+        assert 'Readme, Parts' in str(e)
+
+
+def test_merge_files(tmp_path):
+    """Test that merging converted files drops repeated product ids across files"""
+    from adapter.pipeline import merge_files
+    
+    source = pd.read_csv('sample_autozone.csv', dtype=str)
+    overlap = source.iloc[:4].copy()
+    overlap['Part Number'] = ['BRK-001', 'NEW-001', None, None]
+    overlap['UPC'] = [source['UPC'][0], None, None, None]
+    source.to_csv(tmp_path / 'north.csv', index=False)
+    overlap.to_csv(tmp_path / 'south.csv', index=False)
+    
+    parts = []
+    for name in ('north', 'south'):
+        parts.append(tmp_path / f'{name}.parquet')
+        convert_file(tmp_path / f'{name}.csv', parts[-1], 4, output_format='parquet')
+    
+    counts = merge_files(parts, tmp_path / 'merged.csv', chunksize=3)
+    merged = pd.read_csv(tmp_path / 'merged.csv', dtype=str)
+    
+    assert counts['rows_duplicate'] == 1
+    assert counts['parts'] == [{'rows_output': 10, 'rows_duplicate': 0}, {'rows_output': 3, 'rows_duplicate': 1}]
+    assert len(merged) == counts['rows_output'] == 13
+    assert merged['product-id'].is_unique
+    assert merged['product-id'].tolist()[-3:] == ['NEW-001', 'AUTO-PART-000011', 'AUTO-PART-000012']
+
+
+def test_dedupe_policies(tmp_path):
+    """Test that each dedupe policy keeps one row per product id"""
+    source = pd.read_csv('sample_autozone.csv', dtype=str).iloc[:3]
+    repeated = source.iloc[[0, 0]].copy()
+    repeated['Price'] = ['5.00', '99.00']
+    repeated['Quantity'] = ['1', '2']
+    pd.concat([source, repeated]).to_csv(tmp_path / 'input.csv', index=False)
+    first = source.iloc[0]
+    
+    # Records the files beside the output each time a chunk has been parsed
+    staged = set()
     
+    class Progress:
+        def __setattr__(self, name, value):
+            staged.update(path.name for path in tmp_path.iterdir())
+    
+    expected = {
+        'first': (first['Price'], first['Quantity']),
+        'last': ('99.00', '2'),
+        'sum_quantity': (first['Price'], str(int(first['Quantity']) + 3)),
+        'min_price': ('5.00', '1'),
+    }
+    for policy, (price, quantity) in expected.items():
+        output = tmp_path / f'{policy}.csv'
+        counts = convert_file(tmp_path / 'input.csv', output, 2, Progress(), dedupe=policy)
+        result = pd.read_csv(output, dtype=str).set_index('product-id')
+        
+        assert counts['rows_output'] == len(result) == 3
+        assert counts['duplicates']['duplicates'] == [{'product-id': first['UPC'], 'rows': 3}]
+        assert float(result.loc[first['UPC'], 'standard-price']) == float(price), policy
+        assert result.loc[first['UPC'], 'quantity'] == quantity, policy
+    
+    # The intermediate part is never written to the output directory
+    assert staged and not any('.parquet' in name for name in staged)
+
+
+def test_fitment_expansion(tmp_path):
+    """Test that year ranges and vehicle lists expand to one fitment row per vehicle"""
+    source = pd.read_csv('sample_autozone.csv', dtype=str).iloc[:3]
+    source['Year'] = ['2015-2017', '2019-20', '2012']
+    source['Make'] = ['Toyota', 'Ford | Lincoln', 'Mercedes-Benz']
+    source['Model'] = ['Camry; Corolla', 'F-150 | Navigator', 'E350 Sedan, 4MATIC']
+    source.to_csv(tmp_path / 'input.csv', index=False)
+    
+    counts = convert_file(tmp_path / 'input.csv', tmp_path / 'fitment.csv', 1, fitment=True)
+    fitment = pd.read_csv(tmp_path / 'fitment.csv', dtype=str)
+    
+    assert counts['rows_output'] == len(fitment) == counts['vehicles'] == 11
+    assert list(fitment.columns) == ['product-id', 'fitment-year', 'fitment-make', 'fitment-model']
+    first = fitment[fitment['product-id'] == source['UPC'][0]]
+    assert sorted(first['fitment-year'] + ' ' + first['fitment-model']) == [
+        f'{year} {model}' for year in ('2015', '2016', '2017') for model in ('Camry', 'Corolla')
+    ]
+    second = fitment[fitment['product-id'] == source['UPC'][1]]
+    assert list(second['fitment-year'] + ' ' + second['fitment-make'] + ' ' + second['fitment-model']) == [
+        '2019 Ford F-150', '2020 Ford F-150', '2019 Lincoln Navigator', '2020 Lincoln Navigator'
+    ]
+    # Commas belong to the model name
+    third = fitment[fitment['product-id'] == source['UPC'][2]]
+    assert list(third['fitment-model']) == ['E350 Sedan, 4MATIC']
+
+
+def test_cli(tmp_path):
+    """Test that the command-line converter converts the catalogs of a directory"""
+    from adapter.cli import main
+    
+    exports = tmp_path / 'exports'
+    (exports / 'south').mkdir(parents=True)
+    source = pd.read_csv('sample_autozone.csv', dtype=str)
+    source.to_csv(exports / 'north.csv', index=False)
+    source.iloc[:4].to_excel(exports / 'south' / 'stock.xlsx', index=False)
+    (exports / 'notes.txt').write_text('not a catalog')
+    
+    assert main([str(exports), '--recursive', '-o', str(tmp_path / 'out'), '--workers', '2', '--quiet']) == 0
+    
+    outputs = sorted(path.relative_to(tmp_path / 'out').as_posix() for path in (tmp_path / 'out').rglob('*.csv'))
+    assert outputs == ['amazon_north.csv', 'south/amazon_stock.csv']
+    north = pd.read_csv(tmp_path / 'out' / 'amazon_north.csv', dtype=str)
+    assert len(north) == len(source)
+    assert len(pd.read_csv(tmp_path / 'out' / 'south' / 'amazon_stock.csv')) == 4
+    
+    # A failing file is reported without stopping the others
+    (exports / 'broken.xlsx').write_bytes(b'PK\x03\x04 not a workbook')
+    assert main([str(exports), '-o', str(tmp_path / 'out2'), '--quiet']) == 1
+    assert (tmp_path / 'out2' / 'amazon_north.csv').exists()
+
+
+def test_storage_janitor(tmp_path):
+    """Test TTL and size eviction, and that a failed write leaves no partial file"""
+    import os
+    from adapter.storage import StorageJanitor
+    
+    modified = {'.writing.tmp': 500, 'old.csv': 600, 'middle.csv': 700, 'new.csv': 900, 'expired.csv': 100}
+    for name, mtime in modified.items():
+        path = tmp_path / name
+        path.write_bytes(b'x' * 100)
+        os.utime(path, (mtime, mtime))
+    (tmp_path / 'cache').mkdir()
+    
+    # expired.csv outlived the TTL; old.csv is kept by name; .writing.tmp is never size-evicted
+    janitor = StorageJanitor(tmp_path, ttl=600, max_bytes=250)
+    assert janitor.sweep(keep=[tmp_path / 'old.csv'], now=1000) == {'files_removed': 2, 'bytes_removed': 200}
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['.writing.tmp', 'cache', 'new.csv', 'old.csv']
+    assert janitor.usage() == {'files': 3, 'bytes': 300, 'ttl_seconds': 600, 'max_bytes': 250}
+    
+    output = tmp_path / 'out' / 'amazon.csv'
+    output.parent.mkdir()
+    try:
+        with CSVOutputWriter(output) as writer:
+            writer.write(pd.DataFrame({'sku': ['A1']}))
+            assert not output.exists()
+            raise RuntimeError('conversion failed')
+    except RuntimeError:
+        pass
+    assert list(output.parent.iterdir()) == []
+    
+    with CSVOutputWriter(output) as writer:
+        writer.write(pd.DataFrame({'sku': ['A1']}))
+    assert [path.name for path in output.parent.iterdir()] == ['amazon.csv']
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """TestClient of the web app, with its uploads, outputs and feeds under tmp_path"""
+    from fastapi.testclient import TestClient
+    from adapter.jobs import JobQueue
+    
+    # main keeps its directories relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    for directory in ('uploads', 'outputs/cache', 'deltas'):
+        (tmp_path / directory).mkdir(parents=True, exist_ok=True)
+    import main
+    monkeypatch.setattr(main, 'CONVERT_WORKERS', 1)
+    monkeypatch.setattr(main, 'JANITOR_INTERVAL_SECONDS', 0)
+    monkeypatch.setattr(main, 'job_queue', JobQueue(main.run_job))
+    with TestClient(main.app) as client:
+        yield client
+
+
+def test_upload_size_limit(api, tmp_path, monkeypatch):
+    """Test that an upload over MAX_UPLOAD_MB is refused with 413 and its spooled part deleted"""
+    import main
+    monkeypatch.setattr(main, 'MAX_UPLOAD_BYTES', 1024 * 1024)
+    
+    response = api.post('/convert', files={'file': ('big.csv', b'x' * (1024 * 1024 + 1))})
+    assert response.status_code == 413
+    assert response.json()['detail'] == 'File exceeds the maximum upload size of 1 MB'
+    assert list((tmp_path / 'uploads').iterdir()) == []
+    
+    response = api.post('/convert', files={'file': ('small.csv', SAMPLE_CATALOG.read_bytes())})
+    assert response.status_code == 200
+    assert list((tmp_path / 'uploads').iterdir()) == []
+
+
+def test_failed_conversion_removes_upload(api, tmp_path):
+    """Test that an upload that fails to convert leaves no spooled or partial file behind"""
+    response = api.post('/convert', files={'file': ('broken.csv', b'Part Number,Price\nA1,1\nB2,2,3,4\n')})
+    assert response.status_code == 500
+    assert response.json()['detail'].startswith('Error processing file')
+    assert list((tmp_path / 'uploads').iterdir()) == []
+    assert [path.name for path in (tmp_path / 'outputs').iterdir()] == ['cache']
+
+
+def poll_job(client, job_id: str, states=('completed', 'failed')) -> dict:
+    """Poll GET /jobs/{job_id} until the job reaches one of the given states"""
+    for _ in range(1000):
+        status = client.get(f'/jobs/{job_id}').json()
+        if status['state'] in states:
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f'job {job_id} is still {status["state"]}')
+
+
+def test_conversion_jobs(api, tmp_path):
+    """Test submitting a job, polling it and downloading its output"""
+    response = api.post('/jobs', files={'file': ('catalog.csv', SAMPLE_CATALOG.read_bytes())})
+    assert response.status_code == 202
+    job_id = response.json()['job_id']
+    assert response.json()['status_url'] == f'/jobs/{job_id}'
+    
+    status = poll_job(api, job_id)
+    assert status['state'] == 'completed'
+    assert status['rows_processed'] == status['rows_output'] == 10
+    assert status['finished_at'] >= status['started_at'] >= status['created_at']
+    assert status['download_url'] == f"/download/{status['output_file']}"
+    
+    convert_file(SAMPLE_CATALOG, tmp_path / 'expected.csv')
+    assert api.get(status['download_url']).content == (tmp_path / 'expected.csv').read_bytes()
+    assert list((tmp_path / 'uploads').iterdir()) == []
+    
+    # A job that fails reports its error
+    response = api.post('/jobs', files={'file': ('broken.csv', b'Part Number,Price\nA1,1\nB2,2,3,4\n')})
+    status = poll_job(api, response.json()['job_id'])
+    assert status['state'] == 'failed' and 'Expected 2 fields' in status['error']
+    assert 'download_url' not in status
+    
+    assert api.get('/jobs/unknown').status_code == 404
+
+
+def test_job_queue_full(api, tmp_path, monkeypatch):
+    """Test the job states and live progress, and the 503 once the queue is full"""
+    import main
+    from types import SimpleNamespace
+    from adapter.jobs import JobQueue
+    
+    async def run_forever(job):
+        job.progress = SimpleNamespace(value=7)
+        await asyncio.sleep(3600)
+    
+    monkeypatch.setattr(main, 'job_queue', JobQueue(run_forever, max_concurrent=1, max_queued=1))
+    upload = {'file': ('catalog.csv', SAMPLE_CATALOG.read_bytes())}
+    
+    running = api.post('/jobs', files=upload).json()['job_id']
+    status = poll_job(api, running, states=('running',))
+    assert status['rows_processed'] == 7 and status['elapsed_seconds'] is not None
+    
+    queued = api.post('/jobs', files=upload).json()['job_id']
+    status = api.get(f'/jobs/{queued}').json()
+    assert status['state'] == 'queued' and status['rows_processed'] == 0 and status['elapsed_seconds'] is None
+    
+    response = api.post('/jobs', files=upload)
+    assert response.status_code == 503
+    assert response.json()['detail'] == 'Job queue is full (1 jobs waiting)'
+    # Only the two accepted jobs keep their uploads
+    assert len(list((tmp_path / 'uploads').iterdir())) == 2
+
+
+def test_job_queue_evicts_finished_jobs():
+    """Test that only the last 1000 finished jobs are kept for polling"""
+    from adapter.jobs import ConversionJob, JobQueue
+    
+    async def run(job):
+        return {'rows_processed': 1, 'rows_output': 1}
+    
+    async def run_all():
+        queue = JobQueue(run, max_queued=2000)
+        jobs = [queue.submit(ConversionJob('catalog.csv', Path('in.csv'), Path('out.csv'))) for _ in range(1002)]
+        while queue.unfinished():
+            await asyncio.sleep(0)
+        await queue.stop()
+        return queue, jobs
+    
+    queue, jobs = asyncio.run(run_all())
+    assert [queue.get(job.id) for job in jobs[:3]] == [None, None, jobs[2]]
+    assert queue.get(jobs[-1].id).state == 'completed'
+
+
+def test_result_cache_hit(api, tmp_path, monkeypatch):
+    """Test that a repeated upload is served from the result cache as a hard link"""
+    import main
+    upload = {'file': ('catalog.csv', SAMPLE_CATALOG.read_bytes())}
+    
+    first = api.post('/convert', files=upload).json()
+    second = api.post('/convert', files=upload).json()
+    assert first['cached'] is False and second['cached'] is True
+    assert second['rows_processed'] == second['rows_output'] == first['rows_output'] == 10
+    
+    outputs = tmp_path / 'outputs'
+    assert (outputs / second['output_file']).read_bytes() == (outputs / first['output_file']).read_bytes()
+    # Both outputs and the cache entry are one file
+    assert (outputs / second['output_file']).stat().st_nlink == 3
+    
+    # Fitment files are cached apart from the listings
+    fitment = api.post('/convert?fitment=true', files=upload).json()
+    assert fitment['cached'] is False and fitment['vehicles'] > 0
+    again = api.post('/convert?fitment=true', files=upload).json()
+    assert again['cached'] is True
+    assert (again['rows_output'], again['vehicles']) == (fitment['rows_output'], fitment['vehicles'])
+    written = [(outputs / result['output_file']).read_bytes() for result in (fitment, again)]
+    assert written[0] == written[1] and written[0].startswith(b'product-id,fitment-year')
+    
+    # Other options, or another parser engine, miss
+    assert api.post('/convert?format=parquet', files=upload).json()['cached'] is False
+    monkeypatch.setattr(main, 'PARSER_ENGINE', 'pyarrow')
+    assert api.post('/convert', files=upload).json()['cached'] is False
+
+
+def test_streamed_conversion_uses_result_cache(api, tmp_path, monkeypatch):
+    """Test that a streamed conversion is served from the result of an earlier /convert"""
+    import main
+    upload = {'file': ('catalog.csv', SAMPLE_CATALOG.read_bytes())}
+    output_file = api.post('/convert', files=upload).json()['output_file']
+    
+    def convert_again(*args):
+        raise AssertionError('the upload was converted again')
+    
+    monkeypatch.setattr(main, 'stream_conversion', convert_again)
+    response = api.post('/convert?stream=true', files=upload)
+    assert response.status_code == 200
+    assert response.content == (tmp_path / 'outputs' / output_file).read_bytes()
+
+
+def test_result_cache_eviction(tmp_path, monkeypatch):
+    """Test that the least recently used entries are evicted past max_bytes"""
+    import os
+    from adapter.result_cache import ResultCache, conversion_version
+    
+    cache = ResultCache(tmp_path / 'cache', max_bytes=250, version='test')
+    keys = [cache.key(f'upload{i}', format='csv') for i in range(3)]
+    for i, key in enumerate(keys):
+        output = tmp_path / f'output{i}.csv'
+        output.write_bytes(b'x' * 100)
+        cache.put(key, output, {'rows_output': i})
+        os.utime(output, (1000 + i, 1000 + i))
+        if i == 1:
+            # Reading the first entry makes the second the least recently used
+            assert cache.get(keys[0])[1] == {'rows_output': 0}
+    
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+    
+    # Upgrading pyarrow invalidates the cache
+    version = conversion_version()
+    monkeypatch.setattr(pa, '__version__', '0.0.0')
+    assert conversion_version() != version
+
+
+def test_download(api, tmp_path):
+    """Test ETags, range requests and Content-Encoding negotiation of /download"""
+    from adapter.output_writer import iter_decompressed
+    
+    convert_file(SAMPLE_CATALOG, tmp_path / 'expected.csv')
+    expected = (tmp_path / 'expected.csv').read_bytes()
+    upload = {'file': ('catalog.csv', SAMPLE_CATALOG.read_bytes())}
+    
+    name = api.post('/convert', files=upload).json()['output_file']
+    response = api.get(f'/download/{name}')
+    assert response.status_code == 200 and response.content == expected
+    assert response.headers['accept-ranges'] == 'bytes'
+    etag = response.headers['etag']
+    
+    # Conditional requests
+    assert api.get(f'/download/{name}', headers={'If-None-Match': etag}).status_code == 304
+    assert api.get(f'/download/{name}', headers={'If-None-Match': f'"other", W/{etag}'}).status_code == 304
+    assert api.get(f'/download/{name}', headers={'If-None-Match': '"other"'}).status_code == 200
+    
+    # Range and If-Range requests
+    response = api.get(f'/download/{name}', headers={'Range': 'bytes=0-9'})
+    assert response.status_code == 206 and response.content == expected[:10]
+    assert response.headers['content-range'] == f'bytes 0-9/{len(expected)}'
+    response = api.get(f'/download/{name}', headers={'Range': 'bytes=10-', 'If-Range': etag})
+    assert response.status_code == 206 and response.content == expected[10:]
+    response = api.get(f'/download/{name}', headers={'Range': 'bytes=10-', 'If-Range': '"stale"'})
+    assert response.status_code == 200 and response.content == expected
+    
+    for compression in ('gzip', 'zstd'):
+        name = api.post(f'/convert?compression={compression}', files=upload).json()['output_file']
+        stored = (tmp_path / 'outputs' / name).read_bytes()
+        assert b''.join(iter_decompressed(tmp_path / 'outputs' / name, compression)) == expected
+        plain_name = name.rsplit('.', 1)[0]
+        
+        # Under its own name the compressed file is served as it is
+        with api.stream('GET', f'/download/{name}') as response:
+            assert b''.join(response.iter_raw()) == stored
+            assert 'content-encoding' not in response.headers
+        
+        # Under the plain name, clients that accept the codec get it as a Content-Encoding
+        with api.stream('GET', f'/download/{plain_name}', headers={'Accept-Encoding': compression}) as response:
+            assert b''.join(response.iter_raw()) == stored
+            assert response.headers['content-encoding'] == compression
+            assert 'Accept-Encoding' in response.headers['vary']
+        
+        # and clients that refuse it get it decompressed
+        with api.stream('GET', f'/download/{plain_name}', headers={'Accept-Encoding': f'{compression};q=0'}) as response:
+            assert b''.join(response.iter_raw()) == expected
+            assert 'content-encoding' not in response.headers
+            assert response.headers['content-type'].startswith('text/csv')
+            assert 'Accept-Encoding' in response.headers['vary']
+    
+    assert api.get('/download/missing.csv').status_code == 404
+    assert api.get(f'/download/.{name}').status_code == 404
+
+
+def test_convert_batch(api, tmp_path, monkeypatch):
+    """Test batch conversion of files and zip archives, and its error reporting"""
+    import zipfile
+    import main
+    
+    convert_file(SAMPLE_CATALOG, tmp_path / 'expected.csv')
+    catalog = SAMPLE_CATALOG.read_bytes()
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('stores/north.csv', catalog)
+        zf.writestr('stores/readme.txt', 'not a catalog')
+        zf.writestr('__MACOSX/stores/._north.csv', 'resource fork')
+        zf.writestr('stores/notes.csv', 'hello world\nfoo bar\n')
+    files = [('files', ('south.csv', catalog)), ('files', ('stores.zip', archive.getvalue()))]
+    
+    response = api.post('/convert/batch', files=files)
+    assert response.status_code == 200
+    result = response.json()
+    assert (result['files_converted'], result['files_failed'], result['rows_output']) == (2, 1, 20)
+    assert result['skipped'] == ['stores/readme.txt']
+    assert [summary['filename'] for summary in result['files']] == ['south.csv', 'stores/north.csv', 'stores/notes.csv']
+    for summary in result['files'][:2]:
+        assert (tmp_path / 'outputs' / summary['output_file']).read_bytes() == (tmp_path / 'expected.csv').read_bytes()
+    # A file that is not a catalog is an error rather than an empty output
+    assert 'not a parts catalog' in result['files'][2]['error'].lower()
+    assert list((tmp_path / 'uploads').iterdir()) == []
+    
+    # Merged, every product id is listed once
+    result = api.post('/convert/batch?merge=true', files=files).json()
+    merged = pd.read_csv(tmp_path / 'outputs' / result['output_file'], dtype=str)
+    assert result['rows_processed'] == 20 and result['rows_output'] == len(merged) == 10
+    assert result['rows_duplicate'] == 10
+    
+    # No file converts
+    response = api.post('/convert/batch', files=[('files', ('notes.csv', b'hello world\nfoo bar\n'))])
+    assert response.status_code == 422
+    assert response.json()['files_converted'] == 0
+    
+    # An archive member over the upload limit, however well it compresses
+    monkeypatch.setattr(main, 'MAX_UPLOAD_BYTES', 1024 * 1024)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('stores/north.csv', catalog)
+        zf.writestr('stores/huge.csv', catalog + b'\n' * (1024 * 1024))
+    response = api.post('/convert/batch', files=[('files', ('stores.zip', archive.getvalue()))])
+    assert response.status_code == 413
+    assert response.json()['detail'] == 'stores/huge.csv exceeds the maximum upload size of 1 MB'
+    assert list((tmp_path / 'uploads').iterdir()) == []
+    
+    assert api.post('/convert/batch', files=[('files', ('stores.zip', b'not a zip'))]).status_code == 400
+    monkeypatch.setattr(main, 'BATCH_MAX_FILES', 1)
+    assert api.post('/convert/batch', files=files[:1] * 2).status_code == 400
+
 
 if __name__ == "__main__":
     test_conversion()
-